@@ -13,6 +13,7 @@ from django.conf import settings
 
 from .models import User, OTPCode, Address
 from .forms import PhoneForm, OTPVerifyForm, RegistrationForm, AddressForm
+from apps.cart.models import Cart
 
 
 class LoginView(View):
@@ -75,29 +76,6 @@ class VerifyOTPView(View):
     template_name = 'accounts/verify_otp.html'
     template_name_register = 'accounts/register.html'
     
-    def _merge_guest_cart(self, guest_session_key, user):
-        """انتقال سبد خرید مهمان به کاربر"""
-        from apps.cart.models import Cart
-        
-        try:
-            guest_cart = Cart.objects.get(
-                session_key=guest_session_key,
-                user__isnull=True
-            )
-            
-            # دریافت یا ایجاد سبد کاربر
-            user_cart, created = Cart.objects.get_or_create(user=user)
-            
-            # انتقال آیتم‌ها
-            for item in guest_cart.items.all():
-                user_cart.add_item(item.product, item.quantity)
-            
-            # حذف سبد مهمان
-            guest_cart.delete()
-            
-        except Cart.DoesNotExist:
-            pass
-    
     def get(self, request):
         phone = request.session.get('auth_phone')
         if not phone:
@@ -151,7 +129,7 @@ class VerifyOTPView(View):
                     
                     # انتقال سبد خرید مهمان به کاربر
                     if guest_session_key:
-                        self._merge_guest_cart(guest_session_key, user)
+                        Cart.merge_guest_cart(user, guest_session_key)
                     
                     # پاک کردن session
                     if 'auth_phone' in request.session:
@@ -215,7 +193,7 @@ class VerifyOTPView(View):
                     
                     # انتقال سبد خرید مهمان به کاربر جدید
                     if guest_session_key:
-                        self._merge_guest_cart(guest_session_key, user)
+                        Cart.merge_guest_cart(user, guest_session_key)
                     
                     # پاک کردن session
                     if 'auth_phone' in request.session:
@@ -5,3 +5,7 @@ class CartConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.cart'
     verbose_name = 'سبد خرید'
+
+    def ready(self):
+        """رجیستر کردن سیگنال‌ها"""
+        import apps.cart.signals  # noqa: F401
@@ -1,32 +1,20 @@
 """
 Context processor برای سبد خرید
 """
-from .models import Cart
+from django.utils.functional import SimpleLazyObject
+
+from .middleware import get_request_cart
 
 
 def cart_context(request):
-    """اضافه کردن سبد خرید به تمام تمپلیت‌ها"""
-    
-    cart = None
-    cart_count = 0
-    cart_total = 0
-    
-    try:
-        if request.user.is_authenticated:
-            cart = Cart.objects.filter(user=request.user).first()
-        else:
-            session_key = request.session.session_key
-            if session_key:
-                cart = Cart.objects.filter(session_key=session_key).first()
-        
-        if cart:
-            cart_count = cart.items_count
-            cart_total = cart.total
-    except Exception:
-        pass
+    """
+    اضافه کردن سبد خرید به تمام تمپلیت‌ها
+    مقادیر تنبل هستند و فقط در صورت استفاده در تمپلیت محاسبه می‌شوند.
+    """
+    request_cart = get_request_cart(request)
     
     return {
-        'cart': cart,
-        'cart_count': cart_count,
-        'cart_total': cart_total,
+        'cart': SimpleLazyObject(lambda: request_cart.instance),
+        'cart_count': SimpleLazyObject(lambda: request_cart.count),
+        'cart_total': SimpleLazyObject(lambda: request_cart.total),
     }
@@ -0,0 +1,90 @@
+"""
+Middleware برای دسترسی تنبل به سبد خرید جاری
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.utils.functional import cached_property
+
+from .models import Cart
+
+# مدت نگهداری تعداد/جمع سبد در کش (ثانیه)
+CART_SUMMARY_TIMEOUT = 60 * 10
+
+
+class RequestCart:
+    """
+    سبد خرید درخواست جاری؛ جستجوی سبد حداکثر یک بار و فقط در صورت
+    نیاز انجام می‌شود. تعداد و جمع سبد از کش خوانده می‌شوند و با تغییر
+    سبد (Cart.invalidate_summary) باطل می‌شوند.
+    """
+    
+    def __init__(self, request):
+        self.request = request
+    
+    def _owner(self):
+        user = getattr(self.request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.pk, None
+        session = getattr(self.request, 'session', None)
+        session_key = session.session_key if session is not None else None
+        return None, session_key
+    
+    @cached_property
+    def instance(self):
+        """سبد جاری یا None (بدون ایجاد سبد جدید)"""
+        user_id, session_key = self._owner()
+        if user_id:
+            return Cart.objects.filter(user_id=user_id).first()
+        if session_key:
+            return Cart.objects.filter(session_key=session_key).first()
+        return None
+    
+    @cached_property
+    def summary(self):
+        user_id, session_key = self._owner()
+        if not user_id and not session_key:
+            # مهمان بدون نشست، سبدی ندارد
+            return {'count': 0, 'total': Decimal('0')}
+        
+        key = Cart.summary_cache_key(user_id, session_key)
+        summary = cache.get(key)
+        if summary is None:
+            cart = self.instance
+            if cart:
+                summary = {'count': cart.items_count, 'total': cart.total}
+            else:
+                summary = {'count': 0, 'total': Decimal('0')}
+            cache.set(key, summary, CART_SUMMARY_TIMEOUT)
+        return summary
+    
+    @property
+    def count(self):
+        """تعداد اقلام سبد"""
+        return self.summary['count']
+    
+    @property
+    def total(self):
+        """جمع نهایی سبد"""
+        return self.summary['total']
+
+
+def get_request_cart(request):
+    """RequestCart متصل به درخواست (در صورت نبود middleware ساخته می‌شود)"""
+    request_cart = getattr(request, 'cart', None)
+    if not isinstance(request_cart, RequestCart):
+        request_cart = RequestCart(request)
+        request.cart = request_cart
+    return request_cart
+
+
+class CartMiddleware:
+    """
+    Middleware برای افزودن request.cart
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.cart = RequestCart(request)
+        return self.get_response(request)
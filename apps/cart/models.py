@@ -2,8 +2,10 @@
 مدل‌های اپ cart
 سبد خرید و کد تخفیف
 """
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import DecimalField, F, Q, Sum
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from decimal import Decimal
 
@@ -194,29 +196,142 @@ class Cart(models.Model):
             return f'سبد {self.user.phone}'
         return f'سبد مهمان {self.session_key[:8]}'
     
+    def get_summary(self):
+        """
+        خلاصه سبد (تعداد، جمع، تخفیف، جمع نهایی) با یک کوئری تجمیعی؛
+        نتیجه روی نمونه نگه داشته و با تغییر آیتم‌ها/کد تخفیف باطل می‌شود.
+        """
+        summary = getattr(self, '_summary', None)
+        if summary is not None:
+            return summary
+        
+        totals = self.items.aggregate(
+            items_count=Sum('quantity'),
+            subtotal=Sum(
+                F('quantity') * F('product__price'),
+                output_field=DecimalField(max_digits=14, decimal_places=0)
+            ),
+        )
+        subtotal = totals['subtotal'] or Decimal('0')
+        discount = Decimal('0')
+        if self.coupon_id:
+            is_valid, _ = self.coupon.is_valid(self.user, subtotal)
+            if is_valid:
+                discount = self.coupon.calculate_discount(subtotal)
+        
+        self._summary = summary = {
+            'items_count': totals['items_count'] or 0,
+            'subtotal': subtotal,
+            'discount_amount': discount,
+            'total': subtotal - discount,
+        }
+        return summary
+    
+    def invalidate_summary(self):
+        """باطل کردن خلاصه محاسبه‌شده (روی نمونه و در کش هدر)"""
+        self._summary = None
+        cache.delete(self.summary_cache_key(self.user_id, self.session_key))
+    
+    @staticmethod
+    def summary_cache_key(user_id=None, session_key=None):
+        """کلید کش تعداد/جمع سبد برای کاربر یا نشست مهمان"""
+        if user_id:
+            return f'cart:summary:user:{user_id}'
+        return f'cart:summary:session:{session_key}'
+    
     @property
     def subtotal(self):
         """جمع کل بدون تخفیف"""
-        return sum(item.total_price for item in self.items.all())
+        return self.get_summary()['subtotal']
     
     @property
     def discount_amount(self):
         """مبلغ تخفیف"""
-        if self.coupon:
-            is_valid, _ = self.coupon.is_valid(self.user, self.subtotal)
-            if is_valid:
-                return self.coupon.calculate_discount(self.subtotal)
-        return Decimal('0')
+        return self.get_summary()['discount_amount']
     
     @property
     def total(self):
         """جمع کل با تخفیف"""
-        return self.subtotal - self.discount_amount
+        return self.get_summary()['total']
     
     @property
     def items_count(self):
         """تعداد آیتم‌ها"""
-        return sum(item.quantity for item in self.items.all())
+        return self.get_summary()['items_count']
+    
+    @classmethod
+    def merge_guest_cart(cls, user, session_key):
+        """
+        انتقال سبد مهمان به کاربر هنگام ورود.
+        آیتم‌های هر دو سبد یک‌جا خوانده و تعداد در پایتون محدود می‌شود؛
+        نتیجه با یک bulk_create (upsert) نوشته می‌شود.
+        """
+        if not session_key:
+            return None
+        
+        with transaction.atomic():
+            carts = list(cls.objects.filter(
+                Q(user=user) | Q(session_key=session_key, user__isnull=True)
+            ))
+            guest_cart = next((cart for cart in carts if not cart.user_id), None)
+            user_cart = next((cart for cart in carts if cart.user_id), None)
+            if guest_cart is None:
+                return user_cart
+            
+            if user_cart is None:
+                # کاربر سبدی ندارد: همان سبد مهمان به او منتقل می‌شود
+                guest_cart.user = user
+                guest_cart.session_key = None
+                guest_cart.save(update_fields=['user', 'session_key', 'updated_at'])
+                user_cart = guest_cart
+            else:
+                items = CartItem.objects.filter(
+                    cart__in=[guest_cart, user_cart]
+                ).select_related('product')
+                user_items = {}
+                guest_items = []
+                for item in items:
+                    if item.cart_id == user_cart.pk:
+                        user_items[item.product_id] = item
+                    else:
+                        guest_items.append(item)
+                
+                merged = []
+                for item in guest_items:
+                    product = item.product
+                    existing = user_items.get(item.product_id)
+                    if existing:
+                        # مشابه add_item: جمع تعداد تا سقف موجودی/حداکثر خرید
+                        max_qty = min(product.stock_quantity, product.max_purchase_per_user)
+                        quantity = min(existing.quantity + item.quantity, max_qty)
+                        price_snapshot = existing.price_snapshot
+                    else:
+                        quantity = item.quantity
+                        price_snapshot = product.price
+                    merged.append(CartItem(
+                        cart=user_cart,
+                        product=product,
+                        quantity=quantity,
+                        price_snapshot=price_snapshot,
+                    ))
+                
+                if merged:
+                    # MySQL هدف تداخل را نمی‌پذیرد و از کلید یکتای (cart, product) استفاده می‌کند
+                    unique_fields = None
+                    if connection.features.supports_update_conflicts_with_target:
+                        unique_fields = ['cart', 'product']
+                    CartItem.objects.bulk_create(
+                        merged,
+                        update_conflicts=True,
+                        unique_fields=unique_fields,
+                        update_fields=['quantity', 'updated_at'],
+                    )
+                guest_cart.delete()
+                user_cart.save(update_fields=['updated_at'])
+        
+        cache.delete(cls.summary_cache_key(session_key=session_key))
+        user_cart.invalidate_summary()
+        return user_cart
     
     def add_item(self, product, quantity=1):
         """افزودن آیتم به سبد"""
@@ -241,11 +356,13 @@ class Cart(models.Model):
             item.quantity = new_quantity
             item.save()
         
+        self.invalidate_summary()
         return item
     
     def remove_item(self, product):
         """حذف آیتم از سبد"""
         CartItem.objects.filter(cart=self, product=product).delete()
+        self.invalidate_summary()
     
     def update_item_quantity(self, product, quantity):
         """بروزرسانی تعداد آیتم"""
@@ -260,12 +377,14 @@ class Cart(models.Model):
                 item.save()
         except CartItem.DoesNotExist:
             pass
+        self.invalidate_summary()
     
     def clear(self):
         """خالی کردن سبد"""
         self.items.all().delete()
         self.coupon = None
         self.save()
+        self.invalidate_summary()
     
     def apply_coupon(self, code, user=None):
         """اعمال کد تخفیف"""
@@ -276,6 +395,7 @@ class Cart(models.Model):
             if is_valid:
                 self.coupon = coupon
                 self.save()
+                self.invalidate_summary()
                 return True, message
             return False, message
         except Coupon.DoesNotExist:
@@ -285,6 +405,7 @@ class Cart(models.Model):
         """حذف کد تخفیف"""
         self.coupon = None
         self.save()
+        self.invalidate_summary()
 
 
 class CartItem(models.Model):
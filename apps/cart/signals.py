@@ -0,0 +1,30 @@
+"""
+سیگنال‌های سبد خرید
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+
+def _invalidate_on_commit(cache_key):
+    # پس از commit تا درخواست هم‌زمان سبد حذف‌نشده را دوباره در کش ننویسد
+    transaction.on_commit(lambda: cache.delete(cache_key))
+
+
+@receiver(post_delete, sender='cart.Cart')
+def cart_deleted_invalidate_summary(sender, instance, **kwargs):
+    """
+    باطل کردن خلاصه هدر پس از حذف سبد (مثلاً حذف queryset پس از پرداخت)
+    """
+    _invalidate_on_commit(sender.summary_cache_key(instance.user_id, instance.session_key))
+
+
+@receiver(post_delete, sender='cart.CartItem')
+def cart_item_deleted_invalidate_summary(sender, instance, **kwargs):
+    """باطل کردن خلاصه هدر پس از حذف آیتم سبد"""
+    from .models import Cart
+    
+    owner = Cart.objects.filter(pk=instance.cart_id).values_list('user_id', 'session_key').first()
+    if owner:
+        _invalidate_on_commit(Cart.summary_cache_key(*owner))
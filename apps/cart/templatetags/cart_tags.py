@@ -1,5 +1,7 @@
 from django import template
 
+from apps.cart.middleware import get_request_cart
+
 register = template.Library()
 
 
@@ -9,21 +11,7 @@ def get_cart_count(context):
     request = context.get('request')
     if not request:
         return 0
-    
-    # Try to get cart from session or user
-    from apps.cart.models import Cart
-    
-    if request.user.is_authenticated:
-        cart = Cart.objects.filter(user=request.user).first()
-    else:
-        session_key = request.session.session_key
-        if not session_key:
-            return 0
-        cart = Cart.objects.filter(session_key=session_key).first()
-    
-    if cart:
-        return cart.items.count()
-    return 0
+    return get_request_cart(request).count
 
 
 @register.simple_tag(takes_context=True)
@@ -32,20 +20,7 @@ def get_cart_total(context):
     request = context.get('request')
     if not request:
         return 0
-    
-    from apps.cart.models import Cart
-    
-    if request.user.is_authenticated:
-        cart = Cart.objects.filter(user=request.user).first()
-    else:
-        session_key = request.session.session_key
-        if not session_key:
-            return 0
-        cart = Cart.objects.filter(session_key=session_key).first()
-    
-    if cart:
-        return cart.get_total()
-    return 0
+    return get_request_cart(request).total
 
 
 @register.simple_tag(takes_context=True)
@@ -54,16 +29,7 @@ def get_cart(context):
     request = context.get('request')
     if not request:
         return None
-    
-    from apps.cart.models import Cart
-    
-    if request.user.is_authenticated:
-        return Cart.objects.filter(user=request.user).first()
-    else:
-        session_key = request.session.session_key
-        if not session_key:
-            return None
-        return Cart.objects.filter(session_key=session_key).first()
+    return get_request_cart(request).instance
 
 
 @register.filter
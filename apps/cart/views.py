@@ -9,6 +9,7 @@ from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
 
 from .models import Cart, CartItem, Coupon
+from .middleware import get_request_cart
 from apps.catalog.models import Product
 
 
@@ -16,24 +17,17 @@ class CartMixin:
     """میکسین برای دسترسی به سبد خرید"""
     
     def get_cart(self, request):
-        """دریافت یا ایجاد سبد خرید"""
+        """
+        دریافت یا ایجاد سبد خرید
+        سبد مهمان فقط یک بار هنگام ورود ادغام می‌شود (Cart.merge_guest_cart).
+        """
+        request_cart = get_request_cart(request)
+        cart = request_cart.instance
+        if cart is not None:
+            return cart
+        
         if request.user.is_authenticated:
             cart, created = Cart.objects.get_or_create(user=request.user)
-            
-            # ادغام سبد مهمان با سبد کاربر
-            session_key = request.session.session_key
-            if session_key:
-                try:
-                    guest_cart = Cart.objects.get(
-                        session_key=session_key,
-                        user__isnull=True
-                    )
-                    # انتقال آیتم‌ها
-                    for item in guest_cart.items.all():
-                        cart.add_item(item.product, item.quantity)
-                    guest_cart.delete()
-                except Cart.DoesNotExist:
-                    pass
         else:
             if not request.session.session_key:
                 request.session.create()
@@ -41,6 +35,7 @@ class CartMixin:
             session_key = request.session.session_key
             cart, created = Cart.objects.get_or_create(session_key=session_key)
         
+        request_cart.instance = cart
         return cart
 
 
@@ -91,8 +91,9 @@ class CategoryAdmin(DraggableMPTTAdmin):
     )
     
     def product_count(self, obj):
-        return obj.products.count()
+        return obj.active_product_count
     product_count.short_description = 'تعداد محصول'
+    product_count.admin_order_field = 'active_product_count'
     
     def created_at_jalali(self, obj):
         return jalali_date(obj.created_at)
@@ -203,6 +204,9 @@ class ProductAdmin(admin.ModelAdmin):
     
     readonly_fields = ['view_count', 'sales_count']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_main_image()
+    
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
@@ -282,8 +286,8 @@ class ProductAdmin(admin.ModelAdmin):
 class ProductAttributeAdmin(admin.ModelAdmin):
     """مدیریت ویژگی‌ها"""
     
-    list_display = ['name', 'value_count']
-    search_fields = ['name']
+    list_display = ['name', 'slug', 'value_count']
+    search_fields = ['name', 'slug']
     
     def value_count(self, obj):
         return obj.values.count()
@@ -5,3 +5,7 @@ class CatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.catalog'
     verbose_name = 'کاتالوگ محصولات'
+
+    def ready(self):
+        """رجیستر کردن سیگنال‌ها"""
+        import apps.catalog.signals  # noqa: F401
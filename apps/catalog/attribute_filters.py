@@ -0,0 +1,272 @@
+"""
+فیلتر محصولات بر اساس ویژگی‌ها (?attr=form:capsule&attr=dose:1000mg)
+
+مقادیر ویژگی هر محصول در جدول ProductAttributeIndex با کد ویژگی و کد مقدار
+denormalize می‌شوند. از این جدول یک ایندکس معکوس (کد ویژگی، کد مقدار) ->
+مجموعه شناسه محصولات ساخته و در کش (و در حافظه پردازه) نگه داشته می‌شود؛
+چند شرط با اشتراک مجموعه‌ها (و چند مقدار یک ویژگی با اجتماع) حل می‌شوند
+و کوئری محصولات فقط یک pk__in می‌گیرد، نه یک join برای هر ویژگی.
+"""
+import threading
+
+from django.core.cache import cache
+from django.utils.text import slugify
+
+ATTRIBUTE_INDEX_CACHE_KEY = 'catalog:attribute_index'
+ATTRIBUTE_VERSION_CACHE_KEY = 'catalog:attribute_index_version'
+ATTRIBUTE_INDEX_TIMEOUT = 60 * 60 * 24
+ATTRIBUTE_FACETS_CACHE_KEY = 'catalog:attribute_facets:{version}:{facets_version}:{signature}'
+ATTRIBUTE_FACETS_TIMEOUT = 60 * 10
+
+
+def value_slug(value: str) -> str:
+    return slugify(value or '', allow_unicode=True)
+
+
+def parse_attribute_filters(values) -> dict:
+    """['form:capsule', 'form:tablet', 'dose:1000mg'] -> {'form': {'capsule', 'tablet'}, ...}"""
+    constraints = {}
+    for raw in values:
+        attribute, sep, value = (raw or '').partition(':')
+        attribute, value = slugify(attribute, allow_unicode=True), value_slug(value)
+        if sep and attribute and value:
+            constraints.setdefault(attribute, set()).add(value)
+    return constraints
+
+
+# --- نگهداری جدول denormalize شده ---
+
+def index_attribute_value(attribute_value):
+    """ثبت/بروزرسانی ردیف ایندکس یک ProductAttributeValue"""
+    from .models import ProductAttributeIndex, ProductAttributeValue
+
+    # ردیف ویژگی قبلی همین مقدار (اگر ویژگی آن عوض شده باشد)
+    ProductAttributeIndex.objects.filter(product_id=attribute_value.product_id).exclude(
+        attribute_slug__in=ProductAttributeValue.objects.filter(
+            product_id=attribute_value.product_id
+        ).values('attribute__slug')
+    ).delete()
+    ProductAttributeIndex.objects.update_or_create(
+        product_id=attribute_value.product_id,
+        attribute_slug=attribute_value.attribute.slug,
+        defaults={
+            'value_slug': value_slug(attribute_value.value),
+            'value': attribute_value.value,
+        },
+    )
+
+
+def remove_attribute_value(attribute_value):
+    from .models import ProductAttribute, ProductAttributeIndex
+
+    attribute_slug = ProductAttribute.objects.filter(
+        pk=attribute_value.attribute_id
+    ).values_list('slug', flat=True).first()
+    if attribute_slug:
+        ProductAttributeIndex.objects.filter(
+            product_id=attribute_value.product_id, attribute_slug=attribute_slug
+        ).delete()
+
+
+def rebuild_attribute_index(attribute_ids=None) -> int:
+    """
+    ساخت مجدد ردیف‌های ایندکس (همه یا ویژگی‌های داده‌شده).
+    خروجی: تعداد ردیف‌ها.
+    """
+    from .models import ProductAttribute, ProductAttributeIndex, ProductAttributeValue
+
+    values = ProductAttributeValue.objects.select_related('attribute')
+    stale = ProductAttributeIndex.objects.all()
+    if attribute_ids is not None:
+        values = values.filter(attribute_id__in=attribute_ids)
+        slugs = ProductAttribute.objects.filter(pk__in=attribute_ids).values('slug')
+        stale = stale.filter(attribute_slug__in=slugs)
+        # ردیف‌های کد قبلی ویژگی (پس از تغییر کد یا حذف ویژگی)
+        ProductAttributeIndex.objects.exclude(
+            attribute_slug__in=ProductAttribute.objects.values('slug')
+        ).delete()
+    stale.delete()
+
+    rows = [
+        ProductAttributeIndex(
+            product_id=item.product_id,
+            attribute_slug=item.attribute.slug,
+            value_slug=value_slug(item.value),
+            value=item.value,
+        )
+        for item in values.iterator(chunk_size=2000)
+        if item.attribute.slug
+    ]
+    ProductAttributeIndex.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return len(rows)
+
+
+# --- ایندکس معکوس ---
+
+class AttributeIndex:
+    """(کد ویژگی، کد مقدار) -> frozenset شناسه محصولات، به‌همراه عنوان‌ها"""
+
+    def __init__(self, postings: dict, attribute_names: dict, value_labels: dict):
+        self.postings = postings
+        self.attribute_names = attribute_names
+        self.value_labels = value_labels
+
+    @classmethod
+    def build(cls):
+        from .models import ProductAttribute, ProductAttributeIndex
+
+        postings = {}
+        value_labels = {}
+        rows = ProductAttributeIndex.objects.values_list(
+            'attribute_slug', 'value_slug', 'value', 'product_id'
+        ).iterator(chunk_size=5000)
+        for attribute_slug, slug, value, product_id in rows:
+            key = (attribute_slug, slug)
+            postings.setdefault(key, set()).add(product_id)
+            value_labels.setdefault(key, value)
+        return cls(
+            {key: frozenset(ids) for key, ids in postings.items()},
+            dict(ProductAttribute.objects.values_list('slug', 'name')),
+            value_labels,
+        )
+
+    def match(self, constraints: dict, exclude_attribute=None):
+        """
+        شناسه محصولات منطبق با همه شرط‌ها (اجتماع مقادیر هر ویژگی، اشتراک
+        ویژگی‌ها)؛ None یعنی شرطی اعمال نشده است.
+        """
+        result = None
+        # شرط کوچک‌تر اول تا مجموعه‌های میانی کوچک بمانند
+        groups = []
+        for attribute, values in constraints.items():
+            if attribute == exclude_attribute:
+                continue
+            ids = frozenset().union(
+                *[self.postings.get((attribute, value), frozenset()) for value in values]
+            )
+            groups.append(ids)
+        for ids in sorted(groups, key=len):
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result
+
+    def facets(self, base_ids: set, constraints: dict) -> list[dict]:
+        """تعداد محصولات هر مقدار، با اعمال شرط سایر ویژگی‌ها (نه خود ویژگی)"""
+        by_attribute = {}
+        for (attribute, slug), ids in self.postings.items():
+            by_attribute.setdefault(attribute, []).append((slug, ids))
+
+        facets = []
+        for attribute, values in sorted(by_attribute.items()):
+            others = self.match(constraints, exclude_attribute=attribute)
+            scope = base_ids if others is None else base_ids & others
+            selected = constraints.get(attribute, set())
+            options = [
+                {
+                    'slug': slug,
+                    'label': self.value_labels[(attribute, slug)],
+                    'count': len(ids & scope),
+                    'selected': slug in selected,
+                }
+                for slug, ids in values
+            ]
+            options = [option for option in options if option['count'] or option['selected']]
+            if options:
+                options.sort(key=lambda option: option['label'])
+                facets.append({
+                    'slug': attribute,
+                    'name': self.attribute_names.get(attribute, attribute),
+                    'values': options,
+                })
+        return facets
+
+    def to_payload(self) -> dict:
+        return {
+            'postings': [(key, sorted(ids)) for key, ids in self.postings.items()],
+            'attribute_names': self.attribute_names,
+            'value_labels': list(self.value_labels.items()),
+        }
+
+    @classmethod
+    def from_payload(cls, payload: dict):
+        return cls(
+            {tuple(key): frozenset(ids) for key, ids in payload['postings']},
+            payload['attribute_names'],
+            {tuple(key): label for key, label in payload['value_labels']},
+        )
+
+
+_local_lock = threading.Lock()
+_local_index: AttributeIndex | None = None
+_local_version = None
+
+
+def _current_version() -> int:
+    version = cache.get(ATTRIBUTE_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(ATTRIBUTE_VERSION_CACHE_KEY, 1, None)
+        version = cache.get(ATTRIBUTE_VERSION_CACHE_KEY, 1)
+    return version
+
+
+def get_attribute_index() -> AttributeIndex:
+    """ایندکس جاری (نسخه درون‌پردازه‌ای تا تغییر نسخه کش)"""
+    global _local_index, _local_version
+
+    version = _current_version()
+    if _local_index is not None and version == _local_version:
+        return _local_index
+
+    with _local_lock:
+        cache_key = f'{ATTRIBUTE_INDEX_CACHE_KEY}:{version}'
+        payload = cache.get(cache_key)
+        if payload is not None:
+            index = AttributeIndex.from_payload(payload)
+        else:
+            index = AttributeIndex.build()
+            cache.set(cache_key, index.to_payload(), ATTRIBUTE_INDEX_TIMEOUT)
+        _local_index = index
+        _local_version = version
+    return index
+
+
+def invalidate_attribute_index():
+    try:
+        cache.incr(ATTRIBUTE_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(ATTRIBUTE_VERSION_CACHE_KEY, 2, None)
+
+
+def filter_by_attributes(queryset, constraints: dict):
+    """اعمال شرط‌های ویژگی با یک pk__in (بدون join)"""
+    if not constraints:
+        return queryset
+    ids = get_attribute_index().match(constraints)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids)
+
+
+def get_attribute_facets(queryset, constraints: dict, filters: dict) -> list[dict]:
+    """
+    شمارش مقادیر ویژگی‌ها برای نتایج جاری.
+    queryset: محصولات با همه فیلترها به‌جز ویژگی‌ها.
+    """
+    from .facets import facets_version, filter_signature
+
+    cache_key = ATTRIBUTE_FACETS_CACHE_KEY.format(
+        version=_current_version(),
+        facets_version=facets_version(),
+        signature=filter_signature(filters),
+    )
+    facets = cache.get(cache_key)
+    if facets is None:
+        index = get_attribute_index()
+        if not index.postings:
+            facets = []
+        else:
+            base_ids = set(queryset.order_by().values_list('pk', flat=True))
+            facets = index.facets(base_ids, constraints)
+        cache.set(cache_key, facets, ATTRIBUTE_FACETS_TIMEOUT)
+    return facets
@@ -0,0 +1,158 @@
+"""
+ایندکس پیشوندی برای پیشنهاد جستجو (autocomplete)
+
+برای هر محصول فعال، نام نرمال‌شده (از ابتدای هر کلمه) و SKU در یک آرایه
+مرتب نگهداری می‌شود و پاسخ هر درخواست با bisect و بدون ORM ساخته می‌شود.
+داده‌های نمایشی (نام، آدرس، تصویر، قیمت) از قبل محاسبه شده‌اند. ایندکس در
+کش مشترک ذخیره و با سیگنال‌های محصول باطل می‌شود.
+"""
+import heapq
+import logging
+import threading
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from apps.catalog.search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_INDEX_CACHE_KEY = 'catalog:suggest_index'
+SUGGEST_VERSION_CACHE_KEY = 'catalog:suggest_index_version'
+SUGGEST_INDEX_TIMEOUT = 60 * 60 * 24
+
+
+def normalize_suggest_text(text: str) -> str:
+    """نرمال‌سازی متن و یکسان‌سازی فاصله‌ها."""
+    return ' '.join(tokenize(text))
+
+
+def _image_url(product) -> str:
+    image = product.main_image
+    if not image or not image.image:
+        return ''
+    try:
+        return image.image.url
+    except ValueError:
+        return ''
+
+
+class SuggestIndex:
+    """
+    آرایه مرتب کلیدها؛ هر کلید به (موقعیت کلمه، ردیف محصول) اشاره دارد.
+    موقعیت ۰ یعنی نام محصول با عبارت جستجو شروع می‌شود.
+    """
+
+    def __init__(self, keys: list[str], refs: list[tuple[int, int]], entries: list[dict]):
+        self.keys = keys
+        self.refs = refs
+        self.entries = entries
+
+    @classmethod
+    def build(cls):
+        """ساخت ایندکس از دیتابیس (تنها جایی که ORM استفاده می‌شود)."""
+        from apps.catalog.models import Product
+
+        products = Product.objects.filter(
+            is_active=True
+        ).only(
+            'pk', 'name', 'slug', 'price', 'sku', 'sales_count'
+        ).with_main_image().order_by('-sales_count', '-pk')
+
+        pairs = []
+        entries = []
+        for row, product in enumerate(products):
+            entries.append({
+                'name': product.name,
+                'url': product.get_absolute_url(),
+                'image': _image_url(product),
+                'price': str(product.price),
+            })
+            words = tokenize(product.name)
+            for position in range(len(words)):
+                pairs.append((' '.join(words[position:]), position, row))
+            sku = ''.join(tokenize(product.sku or ''))
+            if sku:
+                pairs.append((sku, 0, row))
+
+        pairs.sort()
+        return cls(
+            keys=[key for key, _position, _row in pairs],
+            refs=[(position, row) for _key, position, row in pairs],
+            entries=entries,
+        )
+
+    def suggest(self, query: str, limit: int = 5) -> list[dict]:
+        prefix = normalize_suggest_text(query)
+        if not prefix:
+            return []
+        # کلید SKU بدون فاصله ذخیره شده است («SKU-1» → sku1)
+        prefixes = {prefix, prefix.replace(' ', '')}
+        best: dict[int, int] = {}
+        for prefix in prefixes:
+            i = bisect_left(self.keys, prefix)
+            while i < len(self.keys) and self.keys[i].startswith(prefix):
+                position, row = self.refs[i]
+                if position < best.get(row, position + 1):
+                    best[row] = position
+                i += 1
+        # نام‌هایی که با عبارت شروع می‌شوند اول؛ سپس پرفروش‌ترها (ترتیب ردیف)
+        rows = heapq.nsmallest(limit, best, key=lambda row: (best[row] > 0, row))
+        return [self.entries[row] for row in rows]
+
+    def to_payload(self) -> dict:
+        return {'keys': self.keys, 'refs': self.refs, 'entries': self.entries}
+
+    @classmethod
+    def from_payload(cls, payload: dict):
+        return cls(payload['keys'], [tuple(ref) for ref in payload['refs']], payload['entries'])
+
+
+_local_lock = threading.Lock()
+_local_index: SuggestIndex | None = None
+_local_version = None
+
+
+def _current_version() -> int:
+    version = cache.get(SUGGEST_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(SUGGEST_VERSION_CACHE_KEY, 1, None)
+        version = cache.get(SUGGEST_VERSION_CACHE_KEY, 1)
+    return version
+
+
+def get_suggest_index() -> SuggestIndex:
+    """
+    ایندکس جاری: نسخه درون‌پردازه‌ای تا زمانی که نسخه کش تغییر نکرده
+    استفاده می‌شود؛ در غیر این صورت از کش خوانده یا از نو ساخته می‌شود.
+    """
+    global _local_index, _local_version
+
+    version = _current_version()
+    if _local_index is not None and version == _local_version:
+        return _local_index
+
+    with _local_lock:
+        cache_key = f'{SUGGEST_INDEX_CACHE_KEY}:{version}'
+        payload = cache.get(cache_key)
+        if payload is not None:
+            index = SuggestIndex.from_payload(payload)
+        else:
+            index = SuggestIndex.build()
+            cache.set(cache_key, index.to_payload(), SUGGEST_INDEX_TIMEOUT)
+        _local_index = index
+        _local_version = version
+    return index
+
+
+def invalidate_suggest_index():
+    """باطل کردن ایندکس؛ درخواست بعدی نسخه جدید را می‌سازد."""
+    try:
+        cache.incr(SUGGEST_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(SUGGEST_VERSION_CACHE_KEY, 2, None)
+
+
+def suggest_products(query: str, limit: int = 5) -> list[dict]:
+    """پیشنهادهای جستجو بدون دسترسی به دیتابیس (در حالت گرم)."""
+    return get_suggest_index().suggest(query, limit=limit)
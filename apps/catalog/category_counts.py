@@ -0,0 +1,70 @@
+"""
+شمارنده ذخیره‌شده محصولات فعال هر دسته (شامل زیردسته‌ها)
+
+به جای get_descendants + COUNT(*) برای هر دسته، Category.active_product_count
+با سیگنال‌های Product به‌صورت افزایشی (یک UPDATE روی زنجیره اجداد) بروز
+می‌شود و پس از جابجایی دسته‌ها، درخت‌های درگیر از نو محاسبه می‌شوند.
+"""
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+
+
+def adjust_category_count(category_id, delta: int):
+    """افزودن delta به شمارنده دسته و همه اجداد آن."""
+    from apps.catalog.models import Category
+
+    if not category_id or not delta:
+        return
+    node = Category.objects.filter(pk=category_id).values('tree_id', 'lft', 'rght').first()
+    if node is None:
+        return
+    Category.objects.filter(
+        tree_id=node['tree_id'],
+        lft__lte=node['lft'],
+        rght__gte=node['rght'],
+    ).update(
+        active_product_count=Greatest(F('active_product_count') + delta, Value(0))
+    )
+
+
+def compute_category_counts(categories, direct_counts: dict) -> dict:
+    """
+    جمع شمارش مستقیم هر دسته با زیردسته‌ها.
+    categories: [(pk, parent_id, level)]
+    """
+    totals = {pk: direct_counts.get(pk, 0) for pk, _parent, _level in categories}
+    for pk, parent_id, _level in sorted(categories, key=lambda row: -row[2]):
+        if parent_id in totals:
+            totals[parent_id] += totals[pk]
+    return totals
+
+
+def rebuild_category_counts(tree_ids=None) -> int:
+    """
+    محاسبه مجدد شمارنده‌ها با یک کوئری گروهی؛ فقط ردیف‌های تغییرکرده
+    ذخیره می‌شوند. خروجی: تعداد دسته‌های بروزشده.
+    """
+    from apps.catalog.models import Category, Product
+
+    categories = Category.objects.all()
+    if tree_ids is not None:
+        categories = categories.filter(tree_id__in=tree_ids)
+    rows = list(categories.values_list('pk', 'parent_id', 'level', 'active_product_count'))
+    if not rows:
+        return 0
+
+    products = Product.objects.filter(is_active=True, category__isnull=False)
+    if tree_ids is not None:
+        products = products.filter(category__tree_id__in=tree_ids)
+    direct_counts = dict(
+        products.order_by().values('category').annotate(n=Count('pk')).values_list('category', 'n')
+    )
+
+    totals = compute_category_counts([row[:3] for row in rows], direct_counts)
+    changed = [
+        Category(pk=pk, active_product_count=totals[pk])
+        for pk, _parent, _level, current in rows
+        if totals[pk] != current
+    ]
+    Category.objects.bulk_update(changed, ['active_product_count'], batch_size=500)
+    return len(changed)
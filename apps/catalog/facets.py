@@ -0,0 +1,208 @@
+"""
+شمارش فیلترها (facet) در فروشگاه
+
+تعداد محصولات هر برند، هر دسته (شامل زیردسته‌ها)، هر بازه قیمت و وضعیت
+موجودی برای نتایج جاری با یک کوئری گروهی روی (برند، دسته، موجودی، بازه
+قیمت) محاسبه می‌شود. کوئری فقط جستجو و محدوده قیمت را اعمال می‌کند؛ فیلترهای
+برند/دسته/موجودی روی ردیف‌های گروه‌بندی‌شده در پایتون اعمال می‌شوند تا
+تعداد هر گزینه بدون فیلتر خودش (مثلاً سایر برندها با برند انتخاب‌شده) هم
+معلوم باشد. نتیجه با امضای نرمال‌شده فیلترها در کش نگه داشته و با
+سیگنال‌های محصول، برند و دسته باطل می‌شود.
+"""
+import hashlib
+import json
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from .category_counts import compute_category_counts
+
+FACET_VERSION_CACHE_KEY = 'catalog:facets_version'
+FACET_CACHE_KEY = 'catalog:facets:{version}:{signature}'
+FACET_DIMENSIONS_CACHE_KEY = 'catalog:facet_dimensions:{version}'
+# تغییر موجودی با UPDATE (رزرو سفارش) سیگنال ندارد و پس از این مدت دیده می‌شود
+FACET_CACHE_TIMEOUT = 60 * 10
+
+# بازه‌های قیمت (تومان): [از، تا)؛ None یعنی بدون سقف
+PRICE_BUCKETS = [
+    (0, 100_000),
+    (100_000, 300_000),
+    (300_000, 700_000),
+    (700_000, 1_500_000),
+    (1_500_000, None),
+]
+
+FILTER_PARAMS = ('q', 'category', 'brand', 'min_price', 'max_price', 'in_stock')
+
+
+def normalize_filters(params) -> dict:
+    """پارامترهای فیلتر فروشگاه به شکل یکسان (برای امضای کش)"""
+    filters = {}
+    for name in FILTER_PARAMS:
+        value = (params.get(name) or '').strip()
+        if name in ('min_price', 'max_price'):
+            value = value if value.isdigit() else ''
+            value = str(int(value)) if value else ''
+        elif name == 'in_stock':
+            value = '1' if value == '1' else ''
+        elif name == 'q':
+            value = ' '.join(value.lower().split())
+        if value:
+            filters[name] = value
+    # فیلتر ویژگی‌ها (?attr=form:capsule) چندمقداری است
+    getlist = getattr(params, 'getlist', None)
+    attrs = sorted({value.strip() for value in getlist('attr') if value.strip()}) if getlist else []
+    if attrs:
+        filters['attr'] = attrs
+    return filters
+
+
+def filter_signature(filters: dict) -> str:
+    payload = json.dumps(filters, sort_keys=True, ensure_ascii=False)
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def _current_version() -> int:
+    version = cache.get(FACET_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(FACET_VERSION_CACHE_KEY, 1, None)
+        version = cache.get(FACET_VERSION_CACHE_KEY, 1)
+    return version
+
+
+def facets_version() -> int:
+    """نسخه جاری شمارش‌ها (برای کلید کش‌های وابسته)"""
+    return _current_version()
+
+
+def invalidate_facets():
+    """باطل کردن شمارش‌ها و جدول برند/دسته ذخیره‌شده"""
+    try:
+        cache.incr(FACET_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(FACET_VERSION_CACHE_KEY, 2, None)
+
+
+def get_facet_dimensions(version=None) -> dict:
+    """
+    برندها و دسته‌ها (شناسه -> اطلاعات لازم) برای تبدیل اسلاگ به شناسه و
+    جمع زیردسته‌ها بدون کوئری.
+    """
+    from .models import Brand, Category
+
+    version = version if version is not None else _current_version()
+    cache_key = FACET_DIMENSIONS_CACHE_KEY.format(version=version)
+    dimensions = cache.get(cache_key)
+    if dimensions is None:
+        dimensions = {
+            'brands': {
+                pk: {'name': name, 'slug': slug, 'is_active': is_active}
+                for pk, name, slug, is_active in Brand.objects.values_list(
+                    'pk', 'name', 'slug', 'is_active'
+                )
+            },
+            'categories': {
+                row[0]: row[1:]
+                for row in Category.objects.values_list(
+                    'pk', 'parent_id', 'level', 'tree_id', 'lft', 'rght', 'slug'
+                )
+            },
+        }
+        cache.set(cache_key, dimensions, FACET_CACHE_TIMEOUT)
+    return dimensions
+
+
+def _price_bucket():
+    whens = []
+    for index, (low, high) in enumerate(PRICE_BUCKETS):
+        lookup = {'price__gte': low}
+        if high is not None:
+            lookup['price__lt'] = high
+        whens.append(When(then=Value(index), **lookup))
+    return Case(*whens, default=Value(len(PRICE_BUCKETS) - 1), output_field=IntegerField())
+
+
+def facet_rows(queryset) -> list[tuple]:
+    """یک کوئری گروهی: [(برند، دسته، موجود، بازه قیمت، تعداد)]"""
+    return list(
+        queryset.order_by().prefetch_related(None).select_related(None)
+        .annotate(price_bucket=_price_bucket())
+        .values('brand_id', 'category_id', 'is_in_stock', 'price_bucket')
+        .annotate(n=Count('pk'))
+        .values_list('brand_id', 'category_id', 'is_in_stock', 'price_bucket', 'n')
+    )
+
+
+def _subtree_ids(categories: dict, slug: str):
+    """شناسه دسته با اسلاگ داده‌شده و همه زیردسته‌هایش (None اگر نبود)"""
+    for pk, (_parent, _level, tree_id, lft, rght, category_slug) in categories.items():
+        if category_slug == slug:
+            return {
+                other_pk
+                for other_pk, (_p, _l, other_tree, other_lft, other_rght, _s) in categories.items()
+                if other_tree == tree_id and lft <= other_lft and other_rght <= rght
+            }
+    return None
+
+
+def count_facets(rows, dimensions: dict, filters: dict) -> dict:
+    """
+    شمارش هر facet با اعمال سایر فیلترها (نه فیلتر خودش) روی ردیف‌ها.
+    """
+    brand_id = None
+    if filters.get('brand'):
+        brand_id = next(
+            (pk for pk, brand in dimensions['brands'].items() if brand['slug'] == filters['brand']),
+            0,
+        )
+    category_ids = None
+    if filters.get('category'):
+        category_ids = _subtree_ids(dimensions['categories'], filters['category']) or set()
+    in_stock_only = bool(filters.get('in_stock'))
+
+    brands = Counter()
+    direct_categories = Counter()
+    stock = Counter()
+    prices = Counter()
+    total = 0
+    for row_brand, row_category, row_in_stock, bucket, n in rows:
+        brand_ok = brand_id is None or row_brand == brand_id
+        category_ok = category_ids is None or row_category in category_ids
+        stock_ok = not in_stock_only or row_in_stock
+
+        if category_ok and stock_ok and row_brand:
+            brands[row_brand] += n
+        if brand_ok and stock_ok and row_category:
+            direct_categories[row_category] += n
+        if brand_ok and category_ok:
+            stock['in_stock' if row_in_stock else 'out_of_stock'] += n
+        if brand_ok and category_ok and stock_ok:
+            prices[bucket] += n
+            total += n
+
+    categories = compute_category_counts(
+        [(pk, row[0], row[1]) for pk, row in dimensions['categories'].items()],
+        direct_categories,
+    )
+    return {
+        'total': total,
+        'brands': dict(brands),
+        'categories': {pk: n for pk, n in categories.items() if n},
+        'price_buckets': [prices.get(index, 0) for index in range(len(PRICE_BUCKETS))],
+        'stock': dict(stock),
+    }
+
+
+def get_facets(queryset, filters: dict) -> dict:
+    """
+    شمارش facet ها برای فیلترهای نرمال‌شده.
+    queryset: محصولات فعال با فیلتر جستجو و محدوده قیمت (بدون برند/دسته/موجودی).
+    """
+    version = _current_version()
+    cache_key = FACET_CACHE_KEY.format(version=version, signature=filter_signature(filters))
+    facets = cache.get(cache_key)
+    if facets is None:
+        facets = count_facets(facet_rows(queryset), get_facet_dimensions(version), filters)
+        cache.set(cache_key, facets, FACET_CACHE_TIMEOUT)
+    return facets
@@ -1,5 +1,5 @@
 """Image crawler utilities."""
 from apps.catalog.image_crawler.browser import IsolatedBrowser
-from apps.catalog.image_crawler.rate_limit import CrawlRateLimiter
+from apps.catalog.image_crawler.rate_limit import HostRateLimiter
 
-__all__ = ['IsolatedBrowser', 'CrawlRateLimiter']
+__all__ = ['IsolatedBrowser', 'HostRateLimiter']
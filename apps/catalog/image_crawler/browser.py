@@ -8,8 +8,10 @@ logger = logging.getLogger(__name__)
 class IsolatedBrowser:
     """هر عملیات جستجو = context + page جدید (بدون state مشترک)."""
 
-    def __init__(self, headless: bool = True):
+    def __init__(self, headless: bool = True, limiter=None):
         self.headless = headless
+        # HostRateLimiter مشترک بین workerها (هر navigation یک توکن میزبان)
+        self.limiter = limiter
         self._playwright = None
         self._browser = None
 
@@ -51,6 +53,8 @@ class IsolatedBrowser:
             context.close()
 
     def goto_stable(self, page, url: str, wait_selector: str | None = None):
+        if self.limiter is not None:
+            self.limiter.acquire(url)
         page.goto(url, wait_until='domcontentloaded')
         if wait_selector:
             try:
@@ -0,0 +1,144 @@
+"""
+Append-only crawl manifest (JSONL) with an in-memory index.
+
+Every upsert appends one line (`{"k": key, "v": entry}`) and flushes it, so
+recording a product is O(1) I/O and a crash can at most lose the line being
+written (a torn, unterminated last line is truncated on the next load; other
+unreadable lines, e.g. merge markers, are skipped). The latest line per key
+wins; `compact()` rewrites the log with one line per key. The log itself is
+the tracked seed, so crawl results can be committed back with git.
+"""
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 4
+# فشرده‌سازی خودکار هنگام بارگذاری وقتی ردیف‌های تکراری از این حد بیشتر باشند
+AUTO_COMPACT_MIN_STALE = 1000
+
+
+class ManifestStore:
+    """Thread-safe key -> entry store backed by a JSONL log."""
+
+    def __init__(self, path: Path, fsync: bool = True):
+        self.path = Path(path)
+        self.fsync = fsync
+        self.entries: dict[str, dict] = {}
+        self._lines = 0
+        self._lock = threading.RLock()
+        self._fh = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    # --- load ---
+
+    def _load(self):
+        if not self.path.exists():
+            return
+
+        size = 0
+        torn_at = None
+        unterminated = False
+        with open(self.path, 'rb') as fh:
+            for line_number, raw in enumerate(fh, 1):
+                offset, size = size, size + len(raw)
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    if not raw.endswith(b'\n'):
+                        # only an unterminated last line can be a torn write
+                        torn_at = offset
+                    else:
+                        logger.warning('Manifest %s: skipping unreadable line %d', self.path, line_number)
+                    continue
+                if not isinstance(record, dict):
+                    logger.warning('Manifest %s: skipping unreadable line %d', self.path, line_number)
+                    continue
+                self._apply(record)
+                unterminated = not raw.endswith(b'\n')
+        if torn_at is not None:
+            logger.warning('Manifest %s has a torn tail; truncating to %d bytes', self.path, torn_at)
+            with open(self.path, 'r+b') as fh:
+                fh.truncate(torn_at)
+        elif unterminated:
+            # complete last record without a newline (hand edit): terminate it
+            with open(self.path, 'ab') as fh:
+                fh.write(b'\n')
+
+        if self.stale_lines >= max(AUTO_COMPACT_MIN_STALE, len(self.entries)):
+            self.compact()
+
+    def _apply(self, record: dict):
+        self._lines += 1
+        key = record.get('k')
+        if key is None:
+            return
+        if record.get('deleted'):
+            self.entries.pop(key, None)
+        else:
+            self.entries[key] = record.get('v') or {}
+
+    # --- read / write ---
+
+    def get(self, key: str) -> dict | None:
+        return self.entries.get(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def stale_lines(self) -> int:
+        """Superseded lines in the log (what compaction would drop)."""
+        return max(self._lines - len(self.entries) - 1, 0)
+
+    def _append(self, record: dict):
+        if self._fh is None:
+            self._fh = open(self.path, 'a', encoding='utf-8')
+        self._fh.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self._fh.flush()
+        if self.fsync:
+            os.fsync(self._fh.fileno())
+        self._lines += 1
+
+    def put(self, key: str, entry: dict):
+        """Atomic per-entry upsert (one appended line)."""
+        with self._lock:
+            self._append({'k': key, 'v': entry})
+            self.entries[key] = entry
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self.entries:
+                self._append({'k': key, 'deleted': True})
+                del self.entries[key]
+
+    # --- maintenance ---
+
+    def compact(self) -> int:
+        """Rewrite the log with only the latest entry per key; returns lines dropped."""
+        with self._lock:
+            self.close()
+            dropped = self.stale_lines
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                fh.write(json.dumps({'version': MANIFEST_VERSION}) + '\n')
+                for key, entry in self.entries.items():
+                    fh.write(json.dumps({'k': key, 'v': entry}, ensure_ascii=False, separators=(',', ':')) + '\n')
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_path, self.path)
+            self._lines = len(self.entries) + 1
+            return dropped
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
@@ -0,0 +1,176 @@
+"""
+Parallel crawl engine: N workers, each with its own browser, sharing one fetcher.
+
+Playwright's sync API is bound to the thread that started it, so every worker
+starts its own IsolatedBrowser. Politeness is per host (HostRateLimiter shared
+through the fetcher): workers on different sources/products run concurrently
+while each host still sees spaced-out requests. The queue is rebuilt from the
+manifest on start, so an interrupted crawl resumes where it stopped.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+
+from apps.catalog.image_crawler.browser import IsolatedBrowser
+
+logger = logging.getLogger(__name__)
+
+# وضعیت‌هایی که با --resume دوباره تلاش نمی‌شوند (تصویر یافت نشد هم نهایی است)
+FINAL_STATUSES = ('ok', 'not_found', 'no_translation')
+
+
+class BrowserStartError(RuntimeError):
+    """No crawler worker could start a browser."""
+
+
+def build_queue(fetcher, items, force: bool = False, resume: bool = False) -> tuple[list, int]:
+    """
+    آیتم‌های باقی‌مانده. بدون force، محصولات دارای تصویر (ok) و با resume
+    همه محصولات با وضعیت نهایی در manifest رد می‌شوند.
+    خروجی: (آیتم‌ها، تعداد ردشده)
+    """
+    skip_statuses = FINAL_STATUSES if resume else ('ok',)
+    pending, skipped = [], 0
+    for item in items:
+        cached = None if force else fetcher.get_cached_entry(item['name_fa'])
+        if cached and cached.get('status') in skip_statuses and (
+            cached.get('status') != 'ok' or fetcher.resolve_image_path(cached)
+        ):
+            skipped += 1
+            continue
+        pending.append(item)
+    return pending, skipped
+
+
+class CrawlStats:
+    """Thread-safe progress/throughput counters."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.statuses = Counter()
+        self.sources = Counter()
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, result: dict):
+        with self._lock:
+            self.statuses[result.get('status', 'error')] += 1
+            if result.get('status') == 'ok':
+                self.sources[result.get('source') or '?'] += 1
+
+    @property
+    def done(self) -> int:
+        return sum(self.statuses.values())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            done = sum(self.statuses.values())
+            elapsed = time.monotonic() - self.started
+            per_minute = done / elapsed * 60 if elapsed > 0 else 0.0
+            remaining = self.total - done
+            return {
+                'done': done,
+                'total': self.total,
+                'elapsed': elapsed,
+                'per_minute': per_minute,
+                'eta': remaining / per_minute * 60 if per_minute else None,
+                'statuses': dict(self.statuses),
+                'sources': dict(self.sources),
+            }
+
+
+class CrawlPool:
+    """
+    اجرای fetcher.fetch_product_image برای آیتم‌ها با workers مرورگر موازی.
+
+    on_result(item, result, stats) پس از هر محصول و on_progress(snapshot,
+    host_stats) هر report_every ثانیه (در نخ اصلی) صدا زده می‌شوند.
+    """
+
+    def __init__(
+        self,
+        fetcher,
+        workers: int = 4,
+        headless: bool = True,
+        force: bool = False,
+        on_result=None,
+        on_progress=None,
+        report_every: float = 30.0,
+    ):
+        self.fetcher = fetcher
+        self.workers = max(1, workers)
+        self.headless = headless
+        self.force = force
+        self.on_result = on_result
+        self.on_progress = on_progress
+        self.report_every = report_every
+        self.stop_event = threading.Event()
+        self._queue: queue.Queue = queue.Queue()
+        self._callback_lock = threading.Lock()
+        self.browser_errors: list[str] = []
+
+    def _worker(self, stats: CrawlStats):
+        try:
+            browser = IsolatedBrowser(headless=self.headless, limiter=self.fetcher.limiter)
+            browser.__enter__()
+        except Exception as exc:
+            logger.error('Crawler worker could not start a browser: %s', exc)
+            with self._callback_lock:
+                self.browser_errors.append(str(exc)[:200])
+            return
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    result = self.fetcher.fetch_product_image(
+                        item['name_fa'],
+                        name_en=item.get('name_en'),
+                        force=self.force,
+                        browser=browser,
+                    )
+                except Exception as exc:
+                    logger.exception('Crawl failed for %r', item['name_fa'][:40])
+                    result = {'status': 'error', 'error': str(exc)[:200]}
+                stats.record(result)
+                if self.on_result:
+                    with self._callback_lock:
+                        self.on_result(item, result, stats)
+        finally:
+            browser.__exit__(None, None, None)
+
+    def run(self, items) -> CrawlStats:
+        stats = CrawlStats(len(items))
+        for item in items:
+            self._queue.put(item)
+
+        threads = [
+            threading.Thread(target=self._worker, args=(stats,), name=f'crawler-{n}', daemon=True)
+            for n in range(min(self.workers, len(items)))
+        ]
+        for thread in threads:
+            thread.start()
+
+        last_report = time.monotonic()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1.0)
+                if self.on_progress and time.monotonic() - last_report >= self.report_every:
+                    last_report = time.monotonic()
+                    self.on_progress(stats.snapshot(), self.fetcher.limiter.stats())
+        except KeyboardInterrupt:
+            # هر worker محصول جاری را تمام و ذخیره می‌کند؛ اجرای بعدی از همین‌جا ادامه می‌دهد
+            self.stop_event.set()
+            logger.warning('Crawl interrupted; waiting for workers to finish current items')
+            for thread in threads:
+                thread.join()
+        if threads and len(self.browser_errors) == len(threads):
+            raise BrowserStartError(
+                f'No crawler worker could start a browser: {self.browser_errors[0]}'
+            )
+        return stats
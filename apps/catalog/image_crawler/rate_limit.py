@@ -1,25 +1,90 @@
-"""Throttling with jitter for crawler requests."""
+"""Per-host request budgets (token buckets with jitter) for crawler requests."""
 import random
+import threading
 import time
+from urllib.parse import urlparse
 
 
-class CrawlRateLimiter:
+class TokenBucket:
+    """Token bucket: `rate` tokens per second, at most `burst` stored."""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.not_before = 0.0
+
+    def reserve(self, now: float) -> float:
+        """Take one token; returns how long the caller must wait before using it."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.not_before - now)
+
+
+class HostRateLimiter:
+    """
+    Per-host politeness budget shared by all crawler workers (thread-safe).
+
+    Requests to different hosts never wait on each other; requests to the same
+    host are spaced by its token bucket (plus jitter), and a host that errors
+    can be backed off without pausing the rest of the crawl.
+    """
+
     def __init__(
         self,
-        min_delay: float = 2.0,
-        max_delay: float = 5.0,
-        batch_size: int = 15,
-        batch_pause: float = 60.0,
+        rate: float = 0.3,
+        burst: float = 2.0,
+        jitter: float = 0.5,
+        overrides: dict[str, tuple[float, float]] | None = None,
     ):
-        self.min_delay = min_delay
-        self.max_delay = max_delay
-        self.batch_size = batch_size
-        self.batch_pause = batch_pause
-
-    def throttle(self, multiplier: float = 1.0):
-        delay = random.uniform(self.min_delay, self.max_delay) * multiplier
-        time.sleep(delay)
-
-    def maybe_batch_pause(self, item_index: int):
-        if self.batch_size > 0 and item_index > 0 and item_index % self.batch_size == 0:
-            time.sleep(self.batch_pause)
+        self.rate = rate
+        self.burst = burst
+        self.jitter = jitter
+        self.overrides = overrides or {}
+        self._buckets: dict[str, TokenBucket] = {}
+        self._requests: dict[str, int] = {}
+        self._waited: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url_or_host: str) -> str:
+        host = urlparse(url_or_host).hostname if '://' in url_or_host else url_or_host
+        host = (host or '').lower()
+        return host[4:] if host.startswith('www.') else host
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate, burst = self.overrides.get(host, (self.rate, self.burst))
+            bucket = self._buckets[host] = TokenBucket(rate, burst)
+        return bucket
+
+    def acquire(self, url_or_host: str) -> float:
+        """Block until the host allows one more request; returns seconds waited."""
+        host = self.host_of(url_or_host)
+        with self._lock:
+            wait = self._bucket(host).reserve(time.monotonic())
+            if wait > 0 and self.jitter:
+                wait += random.uniform(0, self.jitter)
+            self._requests[host] = self._requests.get(host, 0) + 1
+            self._waited[host] = self._waited.get(host, 0.0) + wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def backoff(self, url_or_host: str, seconds: float):
+        """Hold further requests to the host for `seconds` (after errors / blocks)."""
+        host = self.host_of(url_or_host)
+        with self._lock:
+            bucket = self._bucket(host)
+            bucket.not_before = max(bucket.not_before, time.monotonic() + seconds)
+
+    def stats(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                host: {'requests': count, 'waited': round(self._waited.get(host, 0.0), 1)}
+                for host, count in sorted(self._requests.items())
+            }
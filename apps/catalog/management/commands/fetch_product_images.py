@@ -1,20 +1,23 @@
 """
-دانلود تصویر واقعی محصول — crawler با queue و throttling
+دانلود تصویر واقعی محصول — crawler موازی با صف قابل ادامه و محدودیت هر میزبان
 
 پیش‌نیاز:
     python manage.py translate_site_products
 
 استفاده:
     python manage.py fetch_product_images
-    python manage.py fetch_product_images --limit 20 --batch-size 10 --batch-pause 90
-    python manage.py fetch_product_images --enable-ddg   # اختیاری، آخرین fallback
+    python manage.py fetch_product_images --workers 6 --host-rate 0.5 --host-burst 2
+    python manage.py fetch_product_images --resume          # ادامه اجرای قطع‌شده
+    python manage.py fetch_product_images --dry-run --compact-manifest   # فقط فشرده‌سازی manifest
+    python manage.py fetch_product_images --enable-ddg      # اختیاری، آخرین fallback
 """
 from pathlib import Path
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 
-from apps.catalog.image_crawler.rate_limit import CrawlRateLimiter
+from apps.catalog.image_crawler.pool import BrowserStartError, CrawlPool, build_queue
+from apps.catalog.image_crawler.rate_limit import HostRateLimiter
 from apps.catalog.product_image_fetcher import DEFAULT_MANIFEST_PATH, ProductImageFetcher
 from apps.catalog.product_translations import (
     DEFAULT_TRANSLATIONS_PATH,
@@ -36,12 +39,15 @@ class Command(BaseCommand):
         )
         parser.add_argument('--limit', type=int, default=0)
         parser.add_argument('--force', action='store_true')
+        parser.add_argument('--resume', action='store_true', help='رد کردن همه محصولات با وضعیت نهایی در manifest')
         parser.add_argument('--dry-run', action='store_true')
         parser.add_argument('--enable-ddg', action='store_true', help='DDG فقط fallback (rate-limit prone)')
-        parser.add_argument('--batch-size', type=int, default=15, help='توقف بین batchها')
-        parser.add_argument('--batch-pause', type=float, default=60.0, help='ثانیه استراحت بین batch')
-        parser.add_argument('--min-delay', type=float, default=2.0)
-        parser.add_argument('--max-delay', type=float, default=5.0)
+        parser.add_argument('--workers', type=int, default=4, help='تعداد مرورگرهای موازی')
+        parser.add_argument('--host-rate', type=float, default=0.3, help='درخواست در ثانیه برای هر میزبان')
+        parser.add_argument('--host-burst', type=float, default=2.0, help='حداکثر درخواست پشت‌سرهم هر میزبان')
+        parser.add_argument('--report-every', type=float, default=30.0, help='فاصله گزارش سرعت (ثانیه)')
+        parser.add_argument('--headed', action='store_true', help='نمایش مرورگر')
+        parser.add_argument('--compact-manifest', action='store_true', help='حذف ردیف‌های قدیمی لاگ manifest')
 
     def handle(self, *args, **options):
         translations = load_translations()
@@ -54,65 +60,79 @@ class Command(BaseCommand):
         items = self._load_items(options, translations)
         if options['limit']:
             items = items[: options['limit']]
+        no_tr = sum(1 for item in items if not item['name_en'])
+        items = [item for item in items if item['name_en']]
 
-        self.stdout.write(
-            f'محصولات: {len(items)} | batch={options["batch_size"]} | '
-            f'pause={options["batch_pause"]}s | delay={options["min_delay"]}-{options["max_delay"]}s'
-        )
+        limiter = HostRateLimiter(rate=options['host_rate'], burst=options['host_burst'])
+        fetcher = ProductImageFetcher(enable_ddg=options['enable_ddg'], limiter=limiter)
+        try:
+            pending, skip = build_queue(fetcher, items, force=options['force'], resume=options['resume'])
 
-        if options['dry_run']:
-            for item in items[:10]:
-                self.stdout.write(f'{item["name_fa"][:45]} → {item["name_en"]}')
-            return
+            self.stdout.write(
+                f'محصولات: {len(items)} | در صف: {len(pending)} | کش: {skip} | '
+                f'workers={options["workers"]} | هر میزبان: {options["host_rate"]}/s (burst {options["host_burst"]})'
+            )
 
-        limiter = CrawlRateLimiter(
-            min_delay=options['min_delay'],
-            max_delay=options['max_delay'],
-            batch_size=options['batch_size'],
-            batch_pause=options['batch_pause'],
+            if options['dry_run']:
+                for item in pending[:10]:
+                    self.stdout.write(f'{item["name_fa"][:45]} → {item["name_en"]}')
+                self._compact(fetcher, options)
+                return
+
+            pool = CrawlPool(
+                fetcher,
+                workers=options['workers'],
+                headless=not options['headed'],
+                force=options['force'],
+                on_result=self._report_item,
+                on_progress=self._report_progress,
+                report_every=options['report_every'],
+            )
+            try:
+                stats = pool.run(pending)
+            except BrowserStartError as exc:
+                raise CommandError(str(exc))
+
+            snapshot = stats.snapshot()
+            self._report_progress(snapshot, limiter.stats())
+            ok = snapshot['statuses'].get('ok', 0)
+            self.stdout.write(self.style.SUCCESS(
+                f'\nموفق: {ok} | ناموفق: {snapshot["done"] - ok} | کش: {skip} | بدون ترجمه: {no_tr} | '
+                f'باقی‌مانده: {snapshot["total"] - snapshot["done"]}\n'
+                f'Manifest: {DEFAULT_MANIFEST_PATH}'
+            ))
+            self._compact(fetcher, options)
+        finally:
+            # بستن فایل لاگ manifest
+            fetcher.store.close()
+
+    def _compact(self, fetcher, options):
+        if options['compact_manifest']:
+            dropped = fetcher.compact_manifest()
+            self.stdout.write(f'Manifest فشرده شد: {dropped} ردیف قدیمی حذف شد ({len(fetcher.store)} محصول)')
+
+    def _report_item(self, item, result, stats):
+        prefix = f'[{stats.done}/{stats.total}]'
+        if result['status'] == 'ok':
+            self.stdout.write(self.style.SUCCESS(
+                f'{prefix} ✓ {result["source"]} | '
+                f'{item["name_fa"][:35]} | score={result.get("match_score", 0):.2f}'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'{prefix} ✗ {result["status"]} | {item["name_fa"][:40]}'
+            ))
+
+    def _report_progress(self, snapshot, host_stats):
+        line = (
+            f'— {snapshot["done"]}/{snapshot["total"]} در {snapshot["elapsed"] / 60:.1f} دقیقه | '
+            f'{snapshot["per_minute"]:.1f} محصول/دقیقه'
         )
-
-        ok = fail = skip = no_tr = 0
-
-        with ProductImageFetcher(
-            enable_ddg=options['enable_ddg'],
-            limiter=limiter,
-        ) as fetcher:
-            for idx, item in enumerate(items, start=1):
-                name_fa, name_en = item['name_fa'], item['name_en']
-                if not name_en:
-                    no_tr += 1
-                    continue
-
-                cached = fetcher.get_cached_entry(name_fa)
-                if cached and cached.get('status') == 'ok' and not options['force']:
-                    skip += 1
-                    if idx % 25 == 0:
-                        self.stdout.write(f'[{idx}/{len(items)}] … (cached)')
-                    continue
-
-                result = fetcher.fetch_product_image(
-                    name_fa,
-                    name_en=name_en,
-                    force=options['force'],
-                    item_index=idx,
-                )
-                if result['status'] == 'ok':
-                    ok += 1
-                    self.stdout.write(self.style.SUCCESS(
-                        f'[{idx}/{len(items)}] ✓ {result["source"]} | '
-                        f'{name_fa[:35]} | score={result.get("match_score", 0):.2f}'
-                    ))
-                else:
-                    fail += 1
-                    self.stdout.write(self.style.WARNING(
-                        f'[{idx}/{len(items)}] ✗ {result["status"]} | {name_fa[:40]}'
-                    ))
-
-        self.stdout.write(self.style.SUCCESS(
-            f'\nموفق: {ok} | ناموفق: {fail} | کش: {skip} | بدون ترجمه: {no_tr}\n'
-            f'Manifest: {DEFAULT_MANIFEST_PATH}'
-        ))
+        if snapshot['eta'] is not None:
+            line += f' | باقی‌مانده ≈ {snapshot["eta"] / 60:.0f} دقیقه'
+        self.stdout.write(line)
+        for host, host_stat in host_stats.items():
+            self.stdout.write(f'    {host}: {host_stat["requests"]} درخواست، {host_stat["waited"]}s انتظار')
 
     def _load_items(self, options, translations) -> list[dict]:
         if options['from_db']:
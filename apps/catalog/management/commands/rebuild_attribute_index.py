@@ -0,0 +1,20 @@
+"""
+ساخت مجدد جدول ایندکس ویژگی‌ها برای فیلتر فروشگاه (?attr=...)
+
+استفاده:
+    python manage.py rebuild_attribute_index
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.catalog.attribute_filters import invalidate_attribute_index, rebuild_attribute_index
+
+
+class Command(BaseCommand):
+    help = 'ساخت مجدد ProductAttributeIndex از مقادیر ویژگی محصولات'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = rebuild_attribute_index()
+        invalidate_attribute_index()
+        self.stdout.write(self.style.SUCCESS(f'{rows} ردیف ایندکس ویژگی ساخته شد'))
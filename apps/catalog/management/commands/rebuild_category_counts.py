@@ -0,0 +1,17 @@
+"""
+محاسبه مجدد تعداد محصولات فعال هر دسته (شامل زیردسته‌ها)
+
+استفاده:
+    python manage.py rebuild_category_counts
+"""
+from django.core.management.base import BaseCommand
+
+from apps.catalog.category_counts import rebuild_category_counts
+
+
+class Command(BaseCommand):
+    help = 'محاسبه مجدد Category.active_product_count با یک کوئری گروهی'
+
+    def handle(self, *args, **options):
+        updated = rebuild_category_counts()
+        self.stdout.write(self.style.SUCCESS(f'شمارنده {updated} دسته بروزرسانی شد'))
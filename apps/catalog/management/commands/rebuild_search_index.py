@@ -0,0 +1,21 @@
+"""
+ساخت مجدد ایندکس جستجوی محصولات
+
+استفاده:
+    python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+
+from apps.catalog.search_index import get_search_index
+
+
+class Command(BaseCommand):
+    help = 'ساخت مجدد ایندکس معکوس جستجوی محصولات از دیتابیس'
+
+    def handle(self, *args, **options):
+        index = get_search_index()
+        count = index.build()
+        self.stdout.write(self.style.SUCCESS(
+            f'ایندکس جستجو ساخته شد: {count} محصول | {len(index.postings)} توکن\n'
+            f'مسیر: {index.path}'
+        ))
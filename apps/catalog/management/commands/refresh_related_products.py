@@ -0,0 +1,20 @@
+"""
+محاسبه مجدد محصولات مرتبط (همان تسک شبانه refresh_related_products)
+
+استفاده:
+    python manage.py refresh_related_products
+"""
+from django.core.management.base import BaseCommand
+
+from apps.catalog.related import RELATED_LIMIT, refresh_related_products
+
+
+class Command(BaseCommand):
+    help = 'محاسبه و ذخیره محصولات مرتبط همه محصولات فعال'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=RELATED_LIMIT, help='تعداد محصول مرتبط برای هر محصول')
+
+    def handle(self, *args, **options):
+        rows = refresh_related_products(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'{rows} ردیف محصول مرتبط ذخیره شد'))
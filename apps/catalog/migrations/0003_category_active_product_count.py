@@ -0,0 +1,43 @@
+from django.db import migrations, models
+
+
+def populate_active_product_count(apps, schema_editor):
+    Category = apps.get_model('catalog', 'Category')
+    Product = apps.get_model('catalog', 'Product')
+
+    direct_counts = {}
+    for category_id in Product.objects.filter(
+        is_active=True, category__isnull=False
+    ).values_list('category_id', flat=True):
+        direct_counts[category_id] = direct_counts.get(category_id, 0) + 1
+
+    rows = list(Category.objects.values_list('pk', 'parent_id', 'level'))
+    totals = {pk: direct_counts.get(pk, 0) for pk, _parent, _level in rows}
+    for pk, parent_id, _level in sorted(rows, key=lambda row: -row[2]):
+        if parent_id in totals:
+            totals[parent_id] += totals[pk]
+
+    for pk, total in totals.items():
+        if total:
+            Category.objects.filter(pk=pk).update(active_product_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_alter_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='active_product_count',
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text='شامل زیردسته‌ها؛ با سیگنال‌های محصول بروز می‌شود',
+                verbose_name='تعداد محصولات فعال',
+            ),
+        ),
+        migrations.RunPython(populate_active_product_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.text import slugify
+
+
+def populate_attribute_slugs(apps, schema_editor):
+    ProductAttribute = apps.get_model('catalog', 'ProductAttribute')
+
+    used = set()
+    for attribute in ProductAttribute.objects.order_by('pk'):
+        base = slugify(attribute.name, allow_unicode=True) or f'attr-{attribute.pk}'
+        slug, n = base, 2
+        while slug in used:
+            slug, n = f'{base}-{n}', n + 1
+        used.add(slug)
+        ProductAttribute.objects.filter(pk=attribute.pk).update(slug=slug)
+
+
+def populate_attribute_index(apps, schema_editor):
+    ProductAttributeValue = apps.get_model('catalog', 'ProductAttributeValue')
+    ProductAttributeIndex = apps.get_model('catalog', 'ProductAttributeIndex')
+
+    rows = [
+        ProductAttributeIndex(
+            product_id=product_id,
+            attribute_slug=attribute_slug,
+            value_slug=slugify(value or '', allow_unicode=True),
+            value=value,
+        )
+        for product_id, attribute_slug, value in ProductAttributeValue.objects.values_list(
+            'product_id', 'attribute__slug', 'value'
+        )
+    ]
+    ProductAttributeIndex.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productattribute',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, blank=True, default='', max_length=100, verbose_name='کد'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_attribute_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='productattribute',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, blank=True, help_text='در فیلتر فروشگاه استفاده می‌شود (مثلاً ?attr=form:capsule)', max_length=100, unique=True, verbose_name='کد'),
+        ),
+        migrations.CreateModel(
+            name='ProductAttributeIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attribute_slug', models.CharField(max_length=100, verbose_name='کد ویژگی')),
+                ('value_slug', models.CharField(max_length=255, verbose_name='کد مقدار')),
+                ('value', models.CharField(max_length=255, verbose_name='مقدار')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attribute_index', to='catalog.product', verbose_name='محصول')),
+            ],
+            options={
+                'verbose_name': 'ایندکس ویژگی',
+                'verbose_name_plural': 'ایندکس ویژگی‌ها',
+                'indexes': [models.Index(fields=['attribute_slug', 'value_slug'], name='catalog_attr_index_value_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productattributeindex',
+            constraint=models.UniqueConstraint(fields=('product', 'attribute_slug'), name='catalog_attr_index_product_attribute_uniq'),
+        ),
+        migrations.RunPython(populate_attribute_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_product_attribute_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0, verbose_name='امتیاز شباهت')),
+                ('rank', models.PositiveSmallIntegerField(default=0, verbose_name='رتبه')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='catalog.product', verbose_name='محصول')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.product', verbose_name='محصول مرتبط')),
+            ],
+            options={
+                'verbose_name': 'محصول مرتبط',
+                'verbose_name_plural': 'محصولات مرتبط',
+                'ordering': ['product', 'rank'],
+                'indexes': [models.Index(fields=['product', 'rank'], name='catalog_related_rank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='relatedproduct',
+            constraint=models.UniqueConstraint(fields=('product', 'related'), name='catalog_related_product_uniq'),
+        ),
+    ]
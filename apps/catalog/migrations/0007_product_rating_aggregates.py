@@ -0,0 +1,86 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_product_ratings(apps, schema_editor):
+    Product = apps.get_model('catalog', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+
+    histograms = {}
+    rows = Review.objects.filter(status='approved').order_by().values(
+        'product_id', 'rating'
+    ).annotate(n=Count('pk')).values_list('product_id', 'rating', 'n')
+    for product_id, rating, n in rows:
+        if 1 <= rating <= 5:
+            histograms.setdefault(product_id, [0] * 5)[rating - 1] = n
+
+    products = []
+    for product_id, histogram in histograms.items():
+        count = sum(histogram)
+        total = sum(n * value for value, n in enumerate(histogram, start=1))
+        product = Product(
+            pk=product_id,
+            rating_count=count,
+            rating_avg=(Decimal(total) / count).quantize(Decimal('0.01')),
+        )
+        for value, n in enumerate(histogram, start=1):
+            setattr(product, f'rating_{value}', n)
+        products.append(product)
+    Product.objects.bulk_update(
+        products,
+        ['rating_count', 'rating_avg', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_relatedproduct'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=3, verbose_name='میانگین امتیاز'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد امتیاز'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد امتیاز ۱'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد امتیاز ۲'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد امتیاز ۳'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد امتیاز ۴'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد امتیاز ۵'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'rating_avg', 'id'], name='catalog_pro_keyset_rating_idx'),
+        ),
+        migrations.RunPython(populate_product_ratings, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,8 @@
 مدل‌های اپ catalog
 دسته‌بندی درختی با MPTT، محصولات، برند، ویژگی‌ها
 """
+from decimal import Decimal
+
 from django.db import models
 from django.urls import reverse
 from django.core.validators import MinValueValidator
@@ -36,6 +38,12 @@ class Category(MPTTModel):
     description = models.TextField(blank=True, verbose_name='توضیحات')
     is_active = models.BooleanField(default=True, verbose_name='فعال')
     sort_order = models.PositiveIntegerField(default=0, verbose_name='ترتیب نمایش')
+    active_product_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='تعداد محصولات فعال',
+        help_text='شامل زیردسته‌ها؛ با سیگنال‌های محصول بروز می‌شود'
+    )
     
     # SEO fields
     meta_title = models.CharField(
@@ -62,9 +70,23 @@ class Category(MPTTModel):
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # والد هنگام بارگذاری، برای تشخیص جابجایی دسته
+        instance._loaded_parent_id = instance.__dict__.get('parent_id')
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name, allow_unicode=True)
+        if self.pk:
+            # شمارنده با UPDATE اتمیک تغییر می‌کند؛ مقدار قدیمی حافظه بازنویسی نشود
+            current = Category.objects.filter(pk=self.pk).values_list(
+                'active_product_count', flat=True
+            ).first()
+            if current is not None:
+                self.active_product_count = current
         super().save(*args, **kwargs)
     
     def get_absolute_url(self):
@@ -126,6 +148,14 @@ class ProductAttribute(models.Model):
     """ویژگی‌های محصول (حجم، دوز، شکل دارویی و ...)"""
     
     name = models.CharField(max_length=100, verbose_name='نام ویژگی')
+    slug = models.SlugField(
+        max_length=100,
+        unique=True,
+        allow_unicode=True,
+        blank=True,
+        verbose_name='کد',
+        help_text='در فیلتر فروشگاه استفاده می‌شود (مثلاً ?attr=form:capsule)'
+    )
     
     class Meta:
         verbose_name = 'ویژگی محصول'
@@ -134,6 +164,24 @@ class ProductAttribute(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = slugify(self.name, allow_unicode=True)
+        super().save(*args, **kwargs)
+
+
+class ProductQuerySet(models.QuerySet):
+    """کوئری‌ست محصولات"""
+    
+    def with_main_image(self):
+        """پیش‌بارگذاری تصاویر با اولویت تصویر اصلی (بدون کوئری اضافه برای main_image)"""
+        return self.prefetch_related(
+            models.Prefetch(
+                'images',
+                queryset=ProductImage.objects.order_by('-is_main', 'sort_order', 'pk')
+            )
+        )
 
 
 class Product(models.Model):
@@ -241,9 +289,25 @@ class Product(models.Model):
         verbose_name='تعداد فروش'
     )
     
+    # خلاصه امتیاز نظرات تاییدشده (reviews/ratings.py)
+    rating_avg = models.DecimalField(
+        max_digits=3,
+        decimal_places=2,
+        default=0,
+        verbose_name='میانگین امتیاز'
+    )
+    rating_count = models.PositiveIntegerField(default=0, verbose_name='تعداد امتیاز')
+    rating_1 = models.PositiveIntegerField(default=0, verbose_name='تعداد امتیاز ۱')
+    rating_2 = models.PositiveIntegerField(default=0, verbose_name='تعداد امتیاز ۲')
+    rating_3 = models.PositiveIntegerField(default=0, verbose_name='تعداد امتیاز ۳')
+    rating_4 = models.PositiveIntegerField(default=0, verbose_name='تعداد امتیاز ۴')
+    rating_5 = models.PositiveIntegerField(default=0, verbose_name='تعداد امتیاز ۵')
+    
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')
     
+    objects = ProductQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'محصول'
         verbose_name_plural = 'محصولات'
@@ -253,11 +317,25 @@ class Product(models.Model):
             models.Index(fields=['sku']),
             models.Index(fields=['is_active', 'is_in_stock']),
             models.Index(fields=['price']),
+            # صفحه‌بندی keyset (catalog/pagination.py): فیلتر is_active + ترتیب + pk
+            models.Index(fields=['is_active', 'created_at', 'id'], name='catalog_pro_keyset_created_idx'),
+            models.Index(fields=['is_active', 'price', 'id'], name='catalog_pro_keyset_price_idx'),
+            models.Index(fields=['is_active', 'sales_count', 'id'], name='catalog_pro_keyset_sales_idx'),
+            models.Index(fields=['is_active', 'view_count', 'id'], name='catalog_pro_keyset_views_idx'),
+            models.Index(fields=['is_active', 'rating_avg', 'id'], name='catalog_pro_keyset_rating_idx'),
         ]
     
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # وضعیت شمارش در دسته‌بندی هنگام بارگذاری (دسته، فعال بودن)
+        if 'category_id' in instance.__dict__ and 'is_active' in instance.__dict__:
+            instance._loaded_count_state = (instance.category_id, instance.is_active)
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name, allow_unicode=True)
@@ -272,11 +350,15 @@ class Product(models.Model):
     
     @property
     def main_image(self):
-        """تصویر اصلی محصول"""
-        image = self.images.filter(is_main=True).first()
-        if not image:
-            image = self.images.first()
-        return image
+        """تصویر اصلی محصول (در صورت وجود، از تصاویر پیش‌بارگذاری‌شده)"""
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).get('images')
+        if prefetched is not None:
+            images = list(prefetched)
+            for image in images:
+                if image.is_main:
+                    return image
+            return images[0] if images else None
+        return self.images.order_by('-is_main', 'sort_order', 'pk').first()
     
     @property
     def discount_percent(self):
@@ -286,12 +368,93 @@ class Product(models.Model):
             return int(discount)
         return 0
     
+    def compute_rating_avg(self):
+        """میانگین امتیاز از روی توزیع rating_1..rating_5"""
+        if not self.rating_count:
+            return Decimal('0')
+        total = sum(getattr(self, f'rating_{value}') * value for value in range(1, 6))
+        return (Decimal(total) / self.rating_count).quantize(Decimal('0.01'))
+    
+    @property
+    def average_rating(self):
+        return self.rating_avg if self.rating_count else None
+    
+    @property
+    def reviews_count(self):
+        return self.rating_count
+    
     def get_related_products(self, limit=4):
-        """محصولات مرتبط"""
+        """
+        محصولات مرتبط از جدول RelatedProduct (catalog/related.py)؛
+        اگر هنوز محاسبه نشده باشد، محصولات هم‌دسته.
+        """
+        links = getattr(self, '_prefetched_objects_cache', {}).get('related_links')
+        if links is None:
+            links = RelatedProduct.objects.filter(
+                product=self
+            ).related_for_display()[:limit]
+        related = [link.related for link in links if link.related.is_active][:limit]
+        if related:
+            return related
         return Product.objects.filter(
             category=self.category,
             is_active=True
-        ).exclude(pk=self.pk)[:limit]
+        ).exclude(pk=self.pk).with_main_image()[:limit]
+
+
+class RelatedProductQuerySet(models.QuerySet):
+    """کوئری‌ست محصولات مرتبط"""
+    
+    def related_for_display(self):
+        """محصول مرتبط با برند، دسته و تصاویر، به ترتیب رتبه"""
+        return self.filter(
+            related__is_active=True
+        ).select_related(
+            'related__category', 'related__brand'
+        ).prefetch_related(
+            models.Prefetch(
+                'related__images',
+                queryset=ProductImage.objects.order_by('-is_main', 'sort_order', 'pk')
+            )
+        ).order_by('rank')
+
+
+class RelatedProduct(models.Model):
+    """محصولات مرتبط از پیش محاسبه‌شده (با تسک refresh_related_products)"""
+    
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='related_links',
+        verbose_name='محصول'
+    )
+    related = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='محصول مرتبط'
+    )
+    score = models.FloatField(default=0, verbose_name='امتیاز شباهت')
+    rank = models.PositiveSmallIntegerField(default=0, verbose_name='رتبه')
+    
+    objects = RelatedProductQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = 'محصول مرتبط'
+        verbose_name_plural = 'محصولات مرتبط'
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'related'],
+                name='catalog_related_product_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'rank'], name='catalog_related_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.product_id} -> {self.related_id} ({self.score})'
 
 
 class ProductImage(models.Model):
@@ -367,6 +530,39 @@ class ProductAttributeValue(models.Model):
         return f'{self.product.name} - {self.attribute.name}: {self.value}'
 
 
+class ProductAttributeIndex(models.Model):
+    """
+    جدول denormalize شده مقادیر ویژگی برای فیلتر فروشگاه
+    (با سیگنال‌های ProductAttributeValue بروز می‌شود؛ catalog/attribute_filters.py)
+    """
+    
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='attribute_index',
+        verbose_name='محصول'
+    )
+    attribute_slug = models.CharField(max_length=100, verbose_name='کد ویژگی')
+    value_slug = models.CharField(max_length=255, verbose_name='کد مقدار')
+    value = models.CharField(max_length=255, verbose_name='مقدار')
+    
+    class Meta:
+        verbose_name = 'ایندکس ویژگی'
+        verbose_name_plural = 'ایندکس ویژگی‌ها'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'attribute_slug'],
+                name='catalog_attr_index_product_attribute_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['attribute_slug', 'value_slug'], name='catalog_attr_index_value_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.attribute_slug}:{self.value_slug} ({self.product_id})'
+
+
 class Wishlist(models.Model):
     """لیست علاقه‌مندی‌ها"""
     
@@ -0,0 +1,195 @@
+"""
+صفحه‌بندی keyset (cursor) لیست محصولات
+
+به جای COUNT(*) کامل و OFFSET، هر صفحه با شرط «بعد از آخرین ردیف صفحه قبل»
+روی ستون مرتب‌سازی + pk (با ایندکس ترکیبی) خوانده می‌شود؛ هزینه صفحه‌های
+عمیق با صفحه اول برابر است. cursor یک توکن امضاشده و غیرقابل تغییر است.
+تعداد کل برای نمایش تقریبی است: تا سقف COUNT_CAP شمرده و در کش نگه داشته
+می‌شود. مرتب‌سازی‌های بدون ستون keyset (مثل رتبه جستجو) با Paginator
+معمولی صفحه‌بندی می‌شوند.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+# sort -> ترتیب کامل (آخرین ستون همیشه pk است تا ترتیب یکتا باشد)
+KEYSET_ORDERINGS = {
+    'newest': ('-created_at', '-pk'),
+    'price_low': ('price', 'pk'),
+    'price_high': ('-price', '-pk'),
+    'popular': ('-sales_count', '-pk'),
+    'views': ('-view_count', '-pk'),
+    'top_rated': ('-rating_avg', '-pk'),
+}
+
+CURSOR_SALT = 'catalog.pagination.cursor'
+
+# شمارش تقریبی: حداکثر این تعداد ردیف شمرده می‌شود
+COUNT_CAP = 1000
+COUNT_CACHE_TIMEOUT = 60 * 5
+
+
+def keyset_enabled(request, sort) -> bool:
+    """حالت keyset: با تنظیم CATALOG_KEYSET_PAGINATION یا وجود cursor در آدرس"""
+    if sort not in KEYSET_ORDERINGS:
+        return False
+    return bool(
+        getattr(settings, 'CATALOG_KEYSET_PAGINATION', False)
+        or request.GET.get('cursor')
+    )
+
+
+def approximate_count(queryset, cap: int = COUNT_CAP) -> tuple[int, bool]:
+    """
+    تعداد ردیف‌ها تا سقف cap، با کش بر اساس متن کوئری.
+    خروجی: (تعداد، دقیق است؟)
+    """
+    queryset = queryset.order_by()
+    sql, params = queryset.query.sql_with_params()
+    cache_key = 'catalog:approx_count:' + hashlib.md5(
+        f'{cap}:{sql}:{params!r}'.encode()
+    ).hexdigest()
+    count = cache.get(cache_key)
+    if count is None:
+        count = queryset[:cap + 1].count()
+        cache.set(cache_key, count, COUNT_CACHE_TIMEOUT)
+    return min(count, cap), count <= cap
+
+
+def _flip(field: str) -> str:
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+class KeysetPage:
+    """یک صفحه keyset؛ رابط آن برای تمپلیت شبیه Page جنگو است"""
+
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """صفحه‌بندی queryset محصولات بر اساس یکی از KEYSET_ORDERINGS"""
+
+    def __init__(self, queryset, per_page: int, sort: str):
+        self.ordering = KEYSET_ORDERINGS[sort]
+        self.queryset = queryset.order_by(*self.ordering)
+        self.per_page = per_page
+        self.field = self.ordering[0].lstrip('-')
+        self.descending = self.ordering[0].startswith('-')
+        self._count = None
+        self._count_is_exact = True
+
+    # --- cursor ---
+
+    def _encode(self, obj, direction: str) -> str:
+        value = getattr(obj, self.field)
+        return signing.dumps(
+            [direction, str(value), obj.pk], salt=CURSOR_SALT, compress=True
+        )
+
+    def _decode(self, token):
+        """(جهت، مقدار، pk) یا None برای cursor نامعتبر"""
+        if not token:
+            return None
+        try:
+            direction, raw_value, pk = signing.loads(token, salt=CURSOR_SALT)
+            field = self.queryset.model._meta.get_field(self.field)
+            value = field.to_python(raw_value)
+            if direction not in ('n', 'p'):
+                return None
+            return direction, value, int(pk)
+        except (signing.BadSignature, ValidationError, TypeError, ValueError):
+            return None
+
+    def _after(self, value, pk, descending: bool) -> Q:
+        lookup = 'lt' if descending else 'gt'
+        return (
+            Q(**{f'{self.field}__{lookup}': value})
+            | Q(**{self.field: value, f'pk__{lookup}': pk})
+        )
+
+    # --- page ---
+
+    @property
+    def count(self) -> int:
+        if self._count is None:
+            self._count, self._count_is_exact = approximate_count(self.queryset)
+        return self._count
+
+    @property
+    def count_is_exact(self) -> bool:
+        self.count
+        return self._count_is_exact
+
+    def get_page(self, cursor=None) -> KeysetPage:
+        decoded = self._decode(cursor)
+        size = self.per_page
+
+        if decoded is None:
+            rows = list(self.queryset[:size + 1])
+            has_more = len(rows) > size
+            rows = rows[:size]
+            return KeysetPage(
+                rows, self,
+                next_cursor=self._encode(rows[-1], 'n') if has_more else None,
+                previous_cursor=None,
+            )
+
+        direction, value, pk = decoded
+        if direction == 'n':
+            rows = list(
+                self.queryset.filter(self._after(value, pk, self.descending))[:size + 1]
+            )
+            has_more = len(rows) > size
+            rows = rows[:size]
+            return KeysetPage(
+                rows, self,
+                next_cursor=self._encode(rows[-1], 'n') if has_more else None,
+                previous_cursor=self._encode(rows[0], 'p') if rows else None,
+            )
+
+        # صفحه قبل: با ترتیب معکوس خوانده و برگردانده می‌شود
+        rows = list(
+            self.queryset.filter(
+                self._after(value, pk, not self.descending)
+            ).order_by(*[_flip(field) for field in self.ordering])[:size + 1]
+        )
+        has_more = len(rows) > size
+        rows = rows[:size][::-1]
+        return KeysetPage(
+            rows, self,
+            next_cursor=self._encode(rows[-1], 'n') if rows else None,
+            previous_cursor=self._encode(rows[0], 'p') if has_more else None,
+        )
+
+
+def get_product_page(request, queryset, sort, per_page: int = 12):
+    """صفحه جاری لیست محصولات؛ keyset در صورت فعال بودن، وگرنه Paginator"""
+    if keyset_enabled(request, sort):
+        return KeysetPaginator(queryset, per_page, sort).get_page(request.GET.get('cursor'))
+    return Paginator(queryset, per_page).get_page(request.GET.get('page', 1))
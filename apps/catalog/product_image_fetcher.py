@@ -7,8 +7,11 @@ Crawler production-grade برای تصویر واقعی محصول.
   3. DDG (فقط با --enable-ddg)
 
 بدون Google Images scraping. بدون fallback عکس چرت.
+
+این کلاس thread-safe است: چند worker (image_crawler/pool.py) هر کدام با
+مرورگر خود از یک fetcher مشترک استفاده می‌کنند و فاصله درخواست‌ها با
+HostRateLimiter برای هر میزبان جداگانه رعایت می‌شود.
 """
-import json
 import logging
 from io import BytesIO
 from pathlib import Path
@@ -19,7 +22,8 @@ from django.conf import settings
 from PIL import Image
 
 from apps.catalog.image_crawler.browser import IsolatedBrowser
-from apps.catalog.image_crawler.rate_limit import CrawlRateLimiter
+from apps.catalog.image_crawler.manifest import MANIFEST_VERSION, ManifestStore
+from apps.catalog.image_crawler.rate_limit import HostRateLimiter
 from apps.catalog.image_crawler.sources import DdgSource, DigikalaSource, IHerbSource, TorobSource, is_product_image_url
 from apps.catalog.product_translations import (
     build_search_queries_from_english,
@@ -30,7 +34,17 @@ from apps.catalog.product_translations import (
 logger = logging.getLogger(__name__)
 
 DEFAULT_CACHE_DIR = Path(settings.BASE_DIR) / 'data' / 'seed' / 'product_images'
-DEFAULT_MANIFEST_PATH = Path(settings.BASE_DIR) / 'data' / 'seed' / 'product_image_manifest.json'
+DEFAULT_MANIFEST_PATH = Path(settings.BASE_DIR) / 'data' / 'seed' / 'product_image_manifest.jsonl'
+
+# میزبان هر منبع برای بودجه درخواست (HostRateLimiter)
+SOURCE_HOSTS = {
+    'torob': 'torob.com',
+    'iherb': 'de.iherb.com',
+    'digikala': 'digikala.com',
+    'ddg': 'duckduckgo.com',
+}
+# توقف میزبان پس از خطا (ثانیه، برای هر تلاش)
+ERROR_BACKOFF = 10.0
 
 
 class ProductImageFetcher:
@@ -38,7 +52,8 @@ class ProductImageFetcher:
     هر محصول:
     - cache hit → skip
     - source chain با retry
-    - manifest بعد از هر محصول ذخیره (resume-safe)
+    - نتیجه هر محصول یک خط به manifest (JSONL) اضافه می‌کند (resume-safe)
+    - مرورگر: پیش‌فرض مرورگر خود fetcher (context manager)، یا مرورگر worker
     """
 
     def __init__(
@@ -47,34 +62,31 @@ class ProductImageFetcher:
         manifest_path: Path | None = None,
         headless: bool = True,
         enable_ddg: bool = False,
-        limiter: CrawlRateLimiter | None = None,
+        limiter: HostRateLimiter | None = None,
     ):
         self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
         self.manifest_path = manifest_path or DEFAULT_MANIFEST_PATH
         self.headless = headless
         self.enable_ddg = enable_ddg
-        self.limiter = limiter or CrawlRateLimiter()
+        self.limiter = limiter or HostRateLimiter()
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
-        self.manifest = self._load_manifest()
+        self.store = ManifestStore(self.manifest_path)
         self._browser: IsolatedBrowser | None = None
         self._torob = TorobSource()
         self._digikala = DigikalaSource()
         self._iherb = IHerbSource()
         self._ddg = DdgSource()
 
-    def _load_manifest(self) -> dict[str, Any]:
-        if self.manifest_path.exists():
-            with open(self.manifest_path, encoding='utf-8') as fh:
-                return json.load(fh)
-        return {'version': 3, 'products': {}}
+    @property
+    def manifest(self) -> dict[str, Any]:
+        """نمای فقط‌خواندنی به شکل manifest قدیمی ({'version', 'products'})"""
+        return {'version': MANIFEST_VERSION, 'products': self.store.entries}
 
-    def save_manifest(self):
-        with open(self.manifest_path, 'w', encoding='utf-8') as fh:
-            json.dump(self.manifest, fh, ensure_ascii=False, indent=2)
+    def compact_manifest(self) -> int:
+        return self.store.compact()
 
     def __enter__(self):
-        self._browser = IsolatedBrowser(headless=self.headless)
+        self._browser = IsolatedBrowser(headless=self.headless, limiter=self.limiter)
         self._browser.__enter__()
         return self
 
@@ -82,6 +94,7 @@ class ProductImageFetcher:
         if self._browser:
             self._browser.__exit__(exc_type, exc_val, exc_tb)
             self._browser = None
+        self.store.close()
 
     def resolve_image_path(self, entry: dict) -> Path | None:
         """Resolve image path — manifest may contain old absolute paths from dev."""
@@ -105,7 +118,7 @@ class ProductImageFetcher:
         return None
 
     def get_cached_entry(self, name_fa: str) -> dict | None:
-        entry = self.manifest.get('products', {}).get(product_name_key(name_fa))
+        entry = self.store.get(product_name_key(name_fa))
         if not entry:
             return None
         resolved = self.resolve_image_path(entry)
@@ -118,10 +131,10 @@ class ProductImageFetcher:
         name_fa: str,
         name_en: str | None = None,
         force: bool = False,
-        item_index: int = 0,
+        browser: IsolatedBrowser | None = None,
     ) -> dict[str, Any]:
         key = product_name_key(name_fa)
-        existing = self.manifest.get('products', {}).get(key)
+        existing = self.store.get(key)
         if existing and existing.get('status') == 'ok' and not force:
             if self.resolve_image_path(existing):
                 return existing
@@ -152,8 +165,7 @@ class ProductImageFetcher:
             self._persist(key, result)
             return result
 
-        self.limiter.maybe_batch_pause(item_index)
-        hit = self._run_source_chain(name_fa, name_en, primary_query, result)
+        hit = self._run_source_chain(browser or self._browser, name_fa, name_en, primary_query, result)
         if hit:
             result.update(hit)
             result['search_query'] = hit.get('search_query', primary_query)
@@ -169,28 +181,30 @@ class ProductImageFetcher:
             result['status'] = 'not_found'
 
         self._persist(key, result)
-        self.limiter.throttle()
         return result
 
     def _run_source_chain(
         self,
+        browser: IsolatedBrowser | None,
         name_fa: str,
         name_en: str,
         primary_query: str,
         result: dict,
     ) -> dict | None:
-        if not self._browser:
-            raise RuntimeError('Fetcher must be used as context manager')
+        if not browser:
+            raise RuntimeError('Fetcher must be used as context manager (or given a browser)')
 
         chain = [
-            ('torob', lambda: self._torob.search(self._browser, name_fa, name_en)),
-            ('iherb', lambda: self._iherb.search(self._browser, primary_query, name_en)),
-            ('digikala', lambda: self._digikala.search(self._browser, name_fa, name_en)),
+            ('torob', lambda: self._torob.search(browser, name_fa, name_en)),
+            ('iherb', lambda: self._iherb.search(browser, primary_query, name_en)),
+            ('digikala', lambda: self._digikala.search(browser, name_fa, name_en)),
         ]
         if self.enable_ddg:
-            chain.append(
-                ('ddg', lambda: self._ddg.search(primary_query, name_en)),
-            )
+            # DDG از مرورگر عبور نمی‌کند؛ توکن میزبان همین‌جا گرفته می‌شود
+            def ddg_search():
+                self.limiter.acquire(SOURCE_HOSTS['ddg'])
+                return self._ddg.search(primary_query, name_en)
+            chain.append(('ddg', ddg_search))
 
         for source_name, fn in chain:
             for attempt in range(2):
@@ -212,15 +226,15 @@ class ProductImageFetcher:
                         'error': str(exc)[:200],
                     })
                     logger.warning('%s attempt %s failed: %s', source_name, attempt + 1, exc)
-                    self.limiter.throttle(multiplier=1.5 + attempt)
+                    self.limiter.backoff(SOURCE_HOSTS[source_name], ERROR_BACKOFF * (attempt + 1))
         return None
 
     def _persist(self, key: str, result: dict):
-        self.manifest.setdefault('products', {})[key] = result
-        self.save_manifest()
+        self.store.put(key, result)
 
     def _download_image(self, url: str, key: str) -> Path | None:
         try:
+            self.limiter.acquire(url)
             response = requests.get(
                 url,
                 timeout=30,
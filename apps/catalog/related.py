@@ -0,0 +1,246 @@
+"""
+محصولات مرتبط (از پیش محاسبه‌شده)
+
+برای هر محصول فعال، N محصول مشابه با امتیازی ترکیبی از این معیارها محاسبه و
+در جدول RelatedProduct ذخیره می‌شود:
+    - اجداد مشترک در درخت دسته‌ها
+    - برند یکسان
+    - ویژگی‌های مشترک (شکل دارویی، دوز، حجم ...)
+    - شباهت کلمات نام فارسی (وزن‌دهی IDF)
+    - خرید هم‌زمان در سفارش‌های پرداخت‌شده
+محاسبه با تسک دوره‌ای Celery انجام می‌شود و صفحه محصول فقط جدول را می‌خواند.
+برای پرهیز از مقایسه همه جفت‌ها، برای هر محصول فقط کاندیدها (هم‌دسته، هم‌برند،
+دارای کلمه یا ویژگی مشترک، یا خریده‌شده با هم) امتیاز می‌گیرند.
+"""
+import logging
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import combinations
+
+from django.db import transaction
+from django.utils import timezone
+
+from .search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+RELATED_LIMIT = 8
+
+WEIGHTS = {
+    'category': 3.0,
+    'brand': 1.0,
+    'attributes': 1.5,
+    'name': 2.0,
+    'copurchase': 2.5,
+}
+
+# حداکثر کاندید از هر گروه (هم‌دسته/هم‌برند/هم‌ویژگی)؛ پرفروش‌ترها انتخاب می‌شوند
+POOL_CANDIDATES = 60
+# کلمات/مقادیر پرتکرارتر از این تعداد محصول کاندید نمی‌سازند (فقط امتیاز)
+MAX_SHARED_POSTING = 300
+# سفارش‌های بازه اخیر و با تعداد آیتم معقول برای خرید هم‌زمان
+COPURCHASE_DAYS = 365
+COPURCHASE_MAX_ITEMS = 30
+COPURCHASE_STATUSES = ('paid', 'processing', 'shipped', 'delivered')
+
+WRITE_BATCH_SIZE = 500
+
+
+def _category_paths():
+    """شناسه دسته -> زنجیره اجداد از ریشه تا خود دسته"""
+    from .models import Category
+
+    parents = dict(Category.objects.values_list('pk', 'parent_id'))
+    paths = {}
+
+    def path(pk):
+        if pk not in paths:
+            parent = parents.get(pk)
+            paths[pk] = (path(parent) if parent in parents else ()) + (pk,)
+        return paths[pk]
+
+    for pk in parents:
+        path(pk)
+    return paths
+
+
+def _copurchase_counts(product_ids) -> dict:
+    """{(a, b): تعداد سفارش‌هایی که هر دو را داشته‌اند} با a < b"""
+    from apps.orders.models import OrderItem
+
+    since = timezone.now() - timedelta(days=COPURCHASE_DAYS)
+    baskets = defaultdict(set)
+    rows = OrderItem.objects.filter(
+        order__status__in=COPURCHASE_STATUSES,
+        order__created_at__gte=since,
+    ).values_list('order_id', 'product_id').order_by('order_id').iterator(chunk_size=5000)
+    for order_id, product_id in rows:
+        if product_id in product_ids:
+            baskets[order_id].add(product_id)
+
+    pairs = Counter()
+    for basket in baskets.values():
+        if 1 < len(basket) <= COPURCHASE_MAX_ITEMS:
+            pairs.update(combinations(sorted(basket), 2))
+    return pairs
+
+
+class SimilarityModel:
+    """داده‌های لازم برای امتیازدهی همه محصولات فعال (در حافظه)"""
+
+    def __init__(self):
+        from .models import Product, ProductAttributeIndex
+
+        products = list(
+            Product.objects.filter(is_active=True).values_list(
+                'pk', 'category_id', 'brand_id', 'name', 'sales_count'
+            )
+        )
+        self.ids = {row[0] for row in products}
+        self.sales = {pk: sales for pk, _c, _b, _n, sales in products}
+        paths = _category_paths()
+        self.paths = {pk: paths.get(category_id, ()) for pk, category_id, _b, _n, _s in products}
+        self.brand = {pk: brand_id for pk, _c, brand_id, _n, _s in products}
+
+        self.tokens = {pk: frozenset(tokenize(name)) for pk, _c, _b, name, _s in products}
+        self.by_token = defaultdict(set)
+        for pk, tokens in self.tokens.items():
+            for token in tokens:
+                self.by_token[token].add(pk)
+        total = max(len(products), 1)
+        self.idf = {
+            token: math.log(1 + total / len(ids)) for token, ids in self.by_token.items()
+        }
+
+        self.attributes = defaultdict(set)
+        self.by_attribute = defaultdict(set)
+        for product_id, attribute_slug, value_slug in ProductAttributeIndex.objects.filter(
+            product_id__in=self.ids
+        ).values_list('product_id', 'attribute_slug', 'value_slug').iterator(chunk_size=5000):
+            key = (attribute_slug, value_slug)
+            self.attributes[product_id].add(key)
+            self.by_attribute[key].add(product_id)
+
+        self.by_category = defaultdict(set)
+        self.by_parent = defaultdict(set)
+        self.by_brand = defaultdict(set)
+        for pk in self.ids:
+            if self.paths[pk]:
+                self.by_category[self.paths[pk][-1]].add(pk)
+            if len(self.paths[pk]) > 1:
+                self.by_parent[self.paths[pk][-2]].add(pk)
+            if self.brand[pk]:
+                self.by_brand[self.brand[pk]].add(pk)
+
+        self.copurchase = defaultdict(Counter)
+        for (a, b), n in _copurchase_counts(self.ids).items():
+            self.copurchase[a][b] = n
+            self.copurchase[b][a] = n
+        self.max_copurchase = max(
+            (n for counter in self.copurchase.values() for n in counter.values()), default=0
+        )
+        self._top_cache = {}
+
+    def _top_selling(self, ids):
+        if len(ids) <= POOL_CANDIDATES:
+            return ids
+        # هر گروه یک بار مرتب می‌شود (گروه‌ها تا پایان محاسبه ثابت‌اند)
+        top = self._top_cache.get(id(ids))
+        if top is None:
+            top = self._top_cache[id(ids)] = sorted(
+                ids, key=lambda pk: -self.sales[pk]
+            )[:POOL_CANDIDATES]
+        return top
+
+    def candidates(self, pk) -> set:
+        found = set()
+        path = self.paths[pk]
+        if path:
+            found.update(self._top_selling(self.by_category[path[-1]]))
+            if len(found) < POOL_CANDIDATES and len(path) > 1:
+                # دسته‌های هم‌والد برای دسته‌های کم‌محصول
+                found.update(self._top_selling(self.by_parent[path[-2]]))
+        if self.brand[pk]:
+            found.update(self._top_selling(self.by_brand[self.brand[pk]]))
+        for token in self.tokens[pk]:
+            ids = self.by_token[token]
+            if len(ids) <= MAX_SHARED_POSTING:
+                found.update(self._top_selling(ids))
+        for key in self.attributes[pk]:
+            ids = self.by_attribute[key]
+            if len(ids) <= MAX_SHARED_POSTING:
+                found.update(self._top_selling(ids))
+        found.update(self.copurchase[pk])
+        found.discard(pk)
+        return found
+
+    def _token_weight(self, tokens) -> float:
+        return sum(self.idf[token] for token in tokens)
+
+    def score(self, a, b) -> float:
+        score = 0.0
+
+        path_a, path_b = self.paths[a], self.paths[b]
+        if path_a and path_b:
+            shared = 0
+            for x, y in zip(path_a, path_b):
+                if x != y:
+                    break
+                shared += 1
+            score += WEIGHTS['category'] * shared / max(len(path_a), len(path_b))
+
+        if self.brand[a] and self.brand[a] == self.brand[b]:
+            score += WEIGHTS['brand']
+
+        attrs_a, attrs_b = self.attributes.get(a), self.attributes.get(b)
+        if attrs_a and attrs_b:
+            score += WEIGHTS['attributes'] * len(attrs_a & attrs_b) / len(attrs_a | attrs_b)
+
+        tokens_a, tokens_b = self.tokens[a], self.tokens[b]
+        shared_tokens = tokens_a & tokens_b
+        if shared_tokens:
+            score += WEIGHTS['name'] * self._token_weight(shared_tokens) / math.sqrt(
+                self._token_weight(tokens_a) * self._token_weight(tokens_b)
+            )
+
+        together = self.copurchase[a].get(b)
+        if together:
+            score += WEIGHTS['copurchase'] * math.log1p(together) / math.log1p(self.max_copurchase)
+
+        return score
+
+    def related(self, pk, limit: int = RELATED_LIMIT) -> list[tuple[int, float]]:
+        scored = [(self.score(pk, other), other) for other in self.candidates(pk)]
+        scored = [(score, other) for score, other in scored if score > 0]
+        # امتیاز بیشتر، سپس پرفروش‌تر
+        scored.sort(key=lambda item: (-item[0], -self.sales[item[1]], item[1]))
+        return [(other, round(score, 4)) for score, other in scored[:limit]]
+
+
+def refresh_related_products(limit: int = RELATED_LIMIT) -> int:
+    """
+    محاسبه و جایگزینی محصولات مرتبط همه محصولات فعال.
+    خروجی: تعداد ردیف‌های ذخیره‌شده.
+    """
+    from .models import RelatedProduct
+
+    model = SimilarityModel()
+    product_ids = sorted(model.ids)
+    written = 0
+    for start in range(0, len(product_ids), WRITE_BATCH_SIZE):
+        chunk = product_ids[start:start + WRITE_BATCH_SIZE]
+        rows = [
+            RelatedProduct(product_id=pk, related_id=other, score=score, rank=rank)
+            for pk in chunk
+            for rank, (other, score) in enumerate(model.related(pk, limit))
+        ]
+        with transaction.atomic():
+            RelatedProduct.objects.filter(product_id__in=chunk).delete()
+            RelatedProduct.objects.bulk_create(rows, batch_size=1000)
+        written += len(rows)
+
+    # محصولاتی که دیگر فعال نیستند
+    RelatedProduct.objects.filter(product__is_active=False).delete()
+    logger.info('Related products refreshed for %d products (%d rows)', len(product_ids), written)
+    return written
@@ -0,0 +1,378 @@
+"""
+ایندکس معکوس جستجوی محصولات با نرمال‌سازی فارسی
+
+به جای LIKE '%q%' روی همه محصولات، توکن‌های نرمال‌شده نام/برند/SKU/توضیحات
+در یک ایندکس درون‌پردازه‌ای نگهداری و روی دیسک ذخیره می‌شوند. ایندکس با
+سیگنال‌های Product به‌صورت افزایشی بروز می‌شود و پردازه‌های دیگر از طریق
+کلید نسخه در کش، نسخه جدید را از دیسک بارگذاری می‌کنند.
+"""
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, IntegerField, When
+
+from apps.catalog.product_search_query import _CHAR_MAP
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = Path(settings.BASE_DIR) / 'data' / 'search_index.json'
+INDEX_VERSION_CACHE_KEY = 'catalog:search_index:version'
+# قفل بین پردازه‌ای بارگذاری → تغییر → ذخیره فایل ایندکس
+INDEX_LOCK_CACHE_KEY = 'catalog:search_index:lock'
+INDEX_LOCK_TIMEOUT = 30
+INDEX_FORMAT_VERSION = 1
+REINDEX_CHUNK_SIZE = 1000
+
+# وزن هر فیلد در امتیازدهی
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'sku': 3.0,
+    'brand': 2.0,
+    'description': 1.0,
+}
+
+# تطبیق پیشوندی (جستجو حین تایپ) کمی امتیاز کمتری از تطبیق کامل دارد
+PREFIX_MATCH_FACTOR = 0.6
+
+# فیلدهایی که تغییرشان نیاز به ایندکس مجدد دارد
+INDEXED_FIELDS = frozenset({'name', 'description', 'sku', 'brand', 'is_active'})
+
+_SEARCH_CHAR_MAP = dict(_CHAR_MAP)
+_SEARCH_CHAR_MAP.update(str.maketrans({
+    '۰': '0', '۱': '1', '۲': '2', '۳': '3', '۴': '4',
+    '۵': '5', '۶': '6', '۷': '7', '۸': '8', '۹': '9',
+    '\u200c': ' ',  # نیم‌فاصله
+    '\u0640': '',   # کشیده
+}))
+
+_DIACRITICS_RE = re.compile(r'[\u064B-\u065F\u0670]')
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize_search_text(text: str) -> str:
+    """نرمال‌سازی متن برای ایندکس و جستجو (ی/ک، ارقام، اعراب، حروف کوچک)."""
+    text = unicodedata.normalize('NFKC', text or '')
+    text = text.translate(_SEARCH_CHAR_MAP)
+    text = _DIACRITICS_RE.sub('', text)
+    return text.lower()
+
+
+def tokenize(text: str) -> list[str]:
+    """تقسیم متن نرمال‌شده به توکن‌ها."""
+    return _TOKEN_RE.findall(normalize_search_text(text).replace('_', ' '))
+
+
+def _sku_tokens(sku: str) -> list[str]:
+    tokens = tokenize(sku)
+    compact = ''.join(tokens)
+    if compact and compact not in tokens:
+        tokens.append(compact)
+    return tokens
+
+
+class ProductSearchIndex:
+    """
+    ایندکس معکوس: توکن → {شناسه محصول: وزن}
+    فقط محصولات فعال ایندکس می‌شوند.
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = Path(path or getattr(settings, 'SEARCH_INDEX_PATH', DEFAULT_INDEX_PATH))
+        self.postings: dict[str, dict[int, float]] = {}
+        self.doc_tokens: dict[int, list[str]] = {}
+        self.version: str | None = None
+        self._vocabulary: list[str] | None = None
+        self._lock = threading.RLock()
+        self._lock_state = threading.local()
+
+    # ------------------------------------------------------------------
+    # ساخت و بروزرسانی
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def document_weights(name: str, description: str = '', sku: str = '',
+                         brand: str = '') -> dict[str, float]:
+        weights: dict[str, float] = {}
+        fields = (
+            ('name', tokenize(name)),
+            ('brand', tokenize(brand)),
+            ('sku', _sku_tokens(sku or '')),
+            ('description', tokenize(description)),
+        )
+        for field, tokens in fields:
+            for token in tokens:
+                weights[token] = weights.get(token, 0.0) + FIELD_WEIGHTS[field]
+        # اشباع فراوانی تا توضیحات طولانی بر نام غلبه نکند
+        return {token: round(1 + math.log(w), 4) for token, w in weights.items()}
+
+    def _add(self, pk: int, weights: dict[str, float]):
+        for token, weight in weights.items():
+            self.postings.setdefault(token, {})[pk] = weight
+        self.doc_tokens[pk] = list(weights)
+
+    def _remove(self, pk: int):
+        for token in self.doc_tokens.pop(pk, ()):
+            docs = self.postings.get(token)
+            if docs is None:
+                continue
+            docs.pop(pk, None)
+            if not docs:
+                del self.postings[token]
+
+    @contextmanager
+    def write_lock(self):
+        """
+        قفل بین پردازه‌ای (cache.add با TTL) تا دو پردازه هم‌زمان فایل ایندکس را
+        بازنویسی نکنند و تغییر یکدیگر را از دست ندهند. در همان نخ reentrant است.
+        """
+        if getattr(self._lock_state, 'depth', 0):
+            self._lock_state.depth += 1
+            try:
+                yield
+            finally:
+                self._lock_state.depth -= 1
+            return
+
+        token = os.urandom(8).hex()
+        deadline = time.monotonic() + INDEX_LOCK_TIMEOUT
+        while not cache.add(INDEX_LOCK_CACHE_KEY, token, INDEX_LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                logger.warning('Search index lock wait timed out, writing anyway')
+                break
+            time.sleep(0.05)
+        self._lock_state.depth = 1
+        try:
+            yield
+        finally:
+            self._lock_state.depth = 0
+            if cache.get(INDEX_LOCK_CACHE_KEY) == token:
+                cache.delete(INDEX_LOCK_CACHE_KEY)
+
+    def build(self):
+        """ساخت کامل ایندکس از دیتابیس."""
+        from apps.catalog.models import Product
+
+        with self.write_lock():
+            rows = Product.objects.filter(is_active=True).values_list(
+                'pk', 'name', 'description', 'sku', 'brand__name'
+            ).order_by().iterator(chunk_size=2000)
+
+            with self._lock:
+                self.postings = {}
+                self.doc_tokens = {}
+                for pk, name, description, sku, brand in rows:
+                    self._add(pk, self.document_weights(name, description, sku or '', brand or ''))
+                self._vocabulary = None
+            self.save()
+        return len(self.doc_tokens)
+
+    def index_product(self, product):
+        """افزودن/بروزرسانی یک محصول در ایندکس (پس از commit تراکنش جاری)."""
+        self.schedule_reindex([product.pk])
+
+    def remove_product(self, pk: int):
+        """حذف یک محصول از ایندکس (پس از commit تراکنش جاری)."""
+        self.schedule_reindex([pk])
+
+    def reindex(self, pks):
+        """بروزرسانی محصولات داده‌شده از روی وضعیت فعلی دیتابیس و ذخیره."""
+        from apps.catalog.models import Product
+
+        pks = sorted(set(pks))
+        if not pks:
+            return
+        rows = []
+        for start in range(0, len(pks), REINDEX_CHUNK_SIZE):
+            rows.extend(Product.objects.filter(
+                pk__in=pks[start:start + REINDEX_CHUNK_SIZE], is_active=True
+            ).values_list('pk', 'name', 'description', 'sku', 'brand__name'))
+
+        with self.write_lock():
+            # نسخه ذخیره‌شده پردازه‌های دیگر زیر قفل بارگذاری می‌شود
+            self.ensure_fresh()
+            with self._lock:
+                if not rows and not any(pk in self.doc_tokens for pk in pks):
+                    return
+                for pk in pks:
+                    self._remove(pk)
+                for pk, name, description, sku, brand in rows:
+                    self._add(pk, self.document_weights(name, description, sku or '', brand or ''))
+                self._vocabulary = None
+            self.save()
+
+    def schedule_reindex(self, pks):
+        """
+        ثبت محصولات برای reindex پس از commit تراکنش جاری. محصولات یک تراکنش
+        با یک کوئری و یک ذخیره روی دیسک بروز می‌شوند و چون وضعیت از دیتابیس
+        خوانده می‌شود، تغییرات تراکنش rollback‌شده به ایندکس نمی‌رسند.
+        """
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            self.reindex(pks)
+            return
+
+        batch = getattr(connection, '_search_index_batch', None)
+        # با rollback، callbackهای on_commit حذف می‌شوند؛ دسته قبلی دیگر اجرا نمی‌شود
+        if batch is None or not any(entry[1] is batch[0] for entry in connection.run_on_commit):
+            pending = set()
+            batch = (lambda: self.reindex(pending), pending)
+            connection._search_index_batch = batch
+            transaction.on_commit(batch[0])
+        batch[1].update(pks)
+
+    # ------------------------------------------------------------------
+    # ذخیره و بارگذاری
+    # ------------------------------------------------------------------
+
+    def save(self):
+        """ذخیره اتمیک روی دیسک و اعلام نسخه جدید به سایر پردازه‌ها."""
+        with self._lock:
+            self.version = os.urandom(8).hex()
+            payload = {
+                'format': INDEX_FORMAT_VERSION,
+                'version': self.version,
+                'docs': {str(pk): tokens for pk, tokens in self.doc_tokens.items()},
+                'postings': {
+                    token: {str(pk): w for pk, w in docs.items()}
+                    for token, docs in self.postings.items()
+                },
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                json.dump(payload, fh, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        cache.set(INDEX_VERSION_CACHE_KEY, self.version, None)
+
+    def load(self) -> bool:
+        if not self.path.exists():
+            return False
+        try:
+            with open(self.path, encoding='utf-8') as fh:
+                payload = json.load(fh)
+        except (OSError, ValueError) as exc:
+            logger.warning('Search index unreadable (%s), rebuilding', exc)
+            return False
+        if payload.get('format') != INDEX_FORMAT_VERSION:
+            return False
+        with self._lock:
+            self.doc_tokens = {int(pk): tokens for pk, tokens in payload['docs'].items()}
+            self.postings = {
+                token: {int(pk): w for pk, w in docs.items()}
+                for token, docs in payload['postings'].items()
+            }
+            self.version = payload.get('version')
+            self._vocabulary = None
+        return True
+
+    def ensure_fresh(self):
+        """بارگذاری از دیسک اگر پردازه دیگری ایندکس را تغییر داده باشد."""
+        current = cache.get(INDEX_VERSION_CACHE_KEY)
+        if self.version is not None and (current is None or current == self.version):
+            return
+        if not self.load():
+            self.build()
+        elif current is None:
+            cache.set(INDEX_VERSION_CACHE_KEY, self.version, None)
+
+    # ------------------------------------------------------------------
+    # جستجو
+    # ------------------------------------------------------------------
+
+    def _expand(self, token: str) -> list[str]:
+        """توکن‌های واژگان که با token شروع می‌شوند."""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocab = self._vocabulary
+        matches = []
+        i = bisect_left(vocab, token)
+        while i < len(vocab) and vocab[i].startswith(token):
+            matches.append(vocab[i])
+            i += 1
+        return matches
+
+    def search(self, query: str, limit: int | None = None) -> list[tuple[int, float]]:
+        """
+        جستجوی رتبه‌بندی‌شده. همه توکن‌های عبارت باید (کامل یا پیشوندی) تطبیق
+        داشته باشند. خروجی: [(شناسه محصول, امتیاز)] به ترتیب نزولی امتیاز.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        self.ensure_fresh()
+
+        with self._lock:
+            total_docs = len(self.doc_tokens) or 1
+            scores: dict[int, float] | None = None
+            for term in terms:
+                term_scores: dict[int, float] = {}
+                for token in self._expand(term):
+                    docs = self.postings[token]
+                    idf = math.log(1 + total_docs / len(docs))
+                    factor = 1.0 if token == term else PREFIX_MATCH_FACTOR
+                    for pk, weight in docs.items():
+                        score = weight * idf * factor
+                        if score > term_scores.get(pk, 0.0):
+                            term_scores[pk] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        pk: s + term_scores[pk]
+                        for pk, s in scores.items() if pk in term_scores
+                    }
+                if not scores:
+                    return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return ranked[:limit] if limit else ranked
+
+
+_index: ProductSearchIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> ProductSearchIndex:
+    """نمونه مشترک ایندکس در این پردازه."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ProductSearchIndex()
+    return _index
+
+
+def search_product_ids(query: str, limit: int | None = None) -> list[int]:
+    """شناسه محصولات منطبق به ترتیب رتبه (بدون limit همه نتایج)."""
+    return [pk for pk, _score in get_search_index().search(query, limit=limit)]
+
+
+def search_products(queryset, query: str):
+    """
+    فیلتر queryset با همه نتایج ایندکس و مرتب‌سازی بر اساس رتبه.
+    نتایج پیش از فیلترهای بعدی (دسته، برند، قیمت) محدود نمی‌شوند؛ فقط
+    SEARCH_RANKED_RESULTS نتیجه اول رتبه صریح (annotation `search_rank`)
+    می‌گیرند و بقیه پس از آن‌ها به ترتیب جدیدترین می‌آیند.
+    """
+    ids = search_product_ids(query)
+    if not ids:
+        return queryset.none()
+    ranked = ids[:getattr(settings, 'SEARCH_RANKED_RESULTS', 500)]
+    rank = Case(
+        *[When(pk=pk, then=position) for position, pk in enumerate(ranked)],
+        default=len(ranked),
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank).order_by('search_rank', '-pk')
@@ -0,0 +1,152 @@
+"""
+سیگنال‌های اپ catalog
+"""
+import logging
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from mptt.signals import node_moved
+
+from .attribute_filters import (
+    index_attribute_value, invalidate_attribute_index, rebuild_attribute_index,
+    remove_attribute_value,
+)
+from .autocomplete import invalidate_suggest_index
+from .category_counts import adjust_category_count, rebuild_category_counts
+from .facets import invalidate_facets
+from .models import Category, ProductAttributeIndex
+from .search_index import INDEXED_FIELDS, get_search_index
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender='catalog.Product')
+def product_saved_update_search_index(sender, instance, update_fields=None, **kwargs):
+    """بروزرسانی ایندکس جستجو پس از ذخیره محصول"""
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    try:
+        get_search_index().index_product(instance)
+    except Exception as e:
+        logger.error(f"خطا در بروزرسانی ایندکس جستجو برای محصول {instance.pk}: {e}")
+
+
+@receiver(post_delete, sender='catalog.Product')
+def product_deleted_update_search_index(sender, instance, **kwargs):
+    """حذف محصول از ایندکس جستجو"""
+    try:
+        get_search_index().remove_product(instance.pk)
+    except Exception as e:
+        logger.error(f"خطا در حذف محصول {instance.pk} از ایندکس جستجو: {e}")
+
+
+@receiver(post_save, sender='catalog.Brand')
+def brand_saved_update_search_index(sender, instance, created, **kwargs):
+    """ایندکس مجدد محصولات برند پس از تغییر نام برند"""
+    if created:
+        return
+    try:
+        get_search_index().schedule_reindex(instance.products.values_list('pk', flat=True))
+    except Exception as e:
+        logger.error(f"خطا در بروزرسانی ایندکس جستجو برای برند {instance.pk}: {e}")
+
+
+@receiver(post_save, sender='catalog.Product')
+@receiver(post_delete, sender='catalog.Product')
+@receiver(post_save, sender='catalog.ProductImage')
+@receiver(post_delete, sender='catalog.ProductImage')
+def product_changed_invalidate_suggest_index(sender, **kwargs):
+    """باطل کردن ایندکس پیشنهاد جستجو پس از تغییر محصول یا تصویر آن"""
+    transaction.on_commit(invalidate_suggest_index)
+
+
+@receiver(post_save, sender='catalog.Product')
+def product_saved_update_category_counts(sender, instance, created, update_fields=None, **kwargs):
+    """بروزرسانی شمارنده محصولات فعال دسته‌ها پس از ذخیره محصول"""
+    if update_fields is not None and not {'category', 'is_active'}.intersection(update_fields):
+        return
+    
+    new_state = (instance.category_id, instance.is_active)
+    old_state = None if created else getattr(instance, '_loaded_count_state', False)
+    instance._loaded_count_state = new_state
+    
+    if old_state is False:
+        # وضعیت قبلی نامشخص است (مثلاً فیلدهای deferred)
+        rebuild_category_counts()
+        return
+    
+    old_category = old_state[0] if old_state and old_state[1] else None
+    new_category = new_state[0] if new_state[1] else None
+    if old_category != new_category:
+        adjust_category_count(old_category, -1)
+        adjust_category_count(new_category, 1)
+
+
+@receiver(post_delete, sender='catalog.Product')
+def product_deleted_update_category_counts(sender, instance, **kwargs):
+    """کاهش شمارنده دسته پس از حذف محصول فعال"""
+    category_id, is_active = getattr(
+        instance, '_loaded_count_state', (instance.category_id, instance.is_active)
+    )
+    if is_active:
+        adjust_category_count(category_id, -1)
+
+
+@receiver(node_moved, sender=Category)
+def category_moved_rebuild_counts(sender, instance, **kwargs):
+    """محاسبه مجدد شمارنده درخت‌های مبدأ و مقصد پس از جابجایی دسته"""
+    tree_ids = {instance.tree_id}
+    old_parent_id = getattr(instance, '_loaded_parent_id', None)
+    if old_parent_id:
+        old_tree_id = Category.objects.filter(pk=old_parent_id).values_list('tree_id', flat=True).first()
+        if old_tree_id is not None:
+            tree_ids.add(old_tree_id)
+    rebuild_category_counts(tree_ids=tree_ids)
+    instance._loaded_parent_id = instance.parent_id
+
+
+@receiver(post_save, sender='catalog.Product')
+@receiver(post_delete, sender='catalog.Product')
+@receiver(post_save, sender='catalog.Brand')
+@receiver(post_delete, sender='catalog.Brand')
+@receiver(post_save, sender='catalog.Category')
+@receiver(post_delete, sender='catalog.Category')
+@receiver(node_moved, sender=Category)
+def catalog_changed_invalidate_facets(sender, **kwargs):
+    """باطل کردن شمارش فیلترهای فروشگاه پس از تغییر محصول، برند یا دسته"""
+    transaction.on_commit(invalidate_facets)
+
+
+@receiver(post_save, sender='catalog.ProductAttributeValue')
+def attribute_value_saved_update_index(sender, instance, **kwargs):
+    """بروزرسانی ایندکس فیلتر ویژگی‌ها پس از ذخیره مقدار ویژگی"""
+    index_attribute_value(instance)
+    transaction.on_commit(invalidate_attribute_index)
+
+
+@receiver(post_delete, sender='catalog.ProductAttributeValue')
+def attribute_value_deleted_update_index(sender, instance, **kwargs):
+    """حذف مقدار ویژگی از ایندکس فیلتر"""
+    remove_attribute_value(instance)
+    transaction.on_commit(invalidate_attribute_index)
+
+
+@receiver(post_save, sender='catalog.ProductAttribute')
+def attribute_saved_rebuild_index(sender, instance, created, **kwargs):
+    """ایندکس مجدد مقادیر ویژگی پس از تغییر کد یا نام آن"""
+    if not created:
+        rebuild_attribute_index(attribute_ids=[instance.pk])
+    transaction.on_commit(invalidate_attribute_index)
+
+
+@receiver(post_delete, sender='catalog.ProductAttribute')
+def attribute_deleted_update_index(sender, instance, **kwargs):
+    """حذف ردیف‌های ایندکس ویژگی حذف‌شده"""
+    ProductAttributeIndex.objects.filter(attribute_slug=instance.slug).delete()
+    transaction.on_commit(invalidate_attribute_index)
+
+
+@receiver(post_delete, sender='catalog.Product')
+def product_deleted_invalidate_attribute_index(sender, **kwargs):
+    """باطل کردن ایندکس ویژگی‌ها پس از حذف محصول (ردیف‌ها cascade می‌شوند)"""
+    transaction.on_commit(invalidate_attribute_index)
@@ -0,0 +1,34 @@
+"""
+Celery tasks برای کاتالوگ
+"""
+import logging
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_product_view_counts():
+    """
+    انتقال بازدیدهای بافرشده به Product.view_count
+    این تسک هر دقیقه اجرا می‌شود
+    """
+    from .view_counter import flush_view_counts
+
+    updated = flush_view_counts()
+    if updated:
+        logger.info(f"Flushed view counts for {updated} products")
+    return f"Flushed view counts for {updated} products"
+
+
+@shared_task
+def refresh_related_products():
+    """
+    محاسبه مجدد جدول محصولات مرتبط
+    این تسک هر شب اجرا می‌شود
+    """
+    from .related import refresh_related_products as refresh
+
+    rows = refresh()
+    logger.info(f"Refreshed {rows} related product rows")
+    return f"Refreshed {rows} related product rows"
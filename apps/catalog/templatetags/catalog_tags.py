@@ -55,12 +55,7 @@ def render_breadcrumb(obj):
 @register.simple_tag
 def category_product_count(category):
     """تعداد محصولات یک دسته (شامل زیردسته‌ها)"""
-    descendants = category.get_descendants(include_self=True)
-    from ..models import Product
-    return Product.objects.filter(
-        category__in=descendants,
-        is_active=True
-    ).count()
+    return category.active_product_count
 
 
 @register.filter
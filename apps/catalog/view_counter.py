@@ -0,0 +1,139 @@
+"""
+شمارنده بافرشده بازدید محصولات
+
+بازدیدها به جای UPDATE روی جدول محصولات در هر درخواست، در یک hash در Redis
+(HINCRBY اتمیک) جمع می‌شوند و تسک دوره‌ای Celery مجموع آن‌ها را با یک
+UPDATE ... CASE به Product.view_count اضافه می‌کند. اگر کش Redis نباشد
+(محیط توسعه)، بافر درون‌پردازه‌ای است و خود پردازه آن را دوره‌ای تخلیه می‌کند.
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.db.models import Case, F, IntegerField, Value, When
+
+logger = logging.getLogger(__name__)
+
+VIEW_BUFFER_KEY = 'catalog:view_buffer'
+VIEW_FLUSHING_KEY = 'catalog:view_buffer:flushing'
+# فقط یک تخلیه هم‌زمان (SET NX با TTL)؛ در غیر این صورت دو تخلیه هم‌پوشان
+# هر دو hash در حال تخلیه را می‌خوانند و بازدیدها دو بار شمرده می‌شوند
+VIEW_FLUSH_LOCK_KEY = 'catalog:view_buffer:flush_lock'
+VIEW_FLUSH_LOCK_TIMEOUT = 60 * 5
+
+# تخلیه بافر درون‌پردازه‌ای
+LOCAL_FLUSH_INTERVAL = 60  # ثانیه
+LOCAL_FLUSH_THRESHOLD = 500  # تعداد بازدید
+
+_local_lock = threading.Lock()
+_local_buffer: Counter = Counter()
+_local_pending = 0
+_local_last_flush = time.monotonic()
+
+
+def _redis():
+    """اتصال Redis کش پیش‌فرض، یا None اگر بک‌اند کش Redis نباشد."""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def apply_view_deltas(deltas: dict) -> int:
+    """افزودن مجموع بازدیدها به محصولات با یک UPDATE. خروجی: تعداد ردیف‌ها."""
+    from apps.catalog.models import Product
+
+    deltas = {int(pk): int(n) for pk, n in deltas.items() if int(n) > 0}
+    if not deltas:
+        return 0
+    increment = Case(
+        *[When(pk=pk, then=Value(n)) for pk, n in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return Product.objects.filter(pk__in=deltas).update(
+        view_count=F('view_count') + increment
+    )
+
+
+def _take_local_buffer() -> dict:
+    global _local_buffer, _local_pending, _local_last_flush
+    with _local_lock:
+        deltas = _local_buffer
+        _local_buffer = Counter()
+        _local_pending = 0
+        _local_last_flush = time.monotonic()
+    return deltas
+
+
+def _record_local(product_id: int):
+    global _local_pending
+    with _local_lock:
+        _local_buffer[product_id] += 1
+        _local_pending += 1
+        due = (
+            _local_pending >= LOCAL_FLUSH_THRESHOLD
+            or time.monotonic() - _local_last_flush >= LOCAL_FLUSH_INTERVAL
+        )
+    if due:
+        apply_view_deltas(_take_local_buffer())
+
+
+def record_product_view(product_id: int):
+    """ثبت یک بازدید؛ بدون نوشتن در جدول محصولات."""
+    client = _redis()
+    if client is not None:
+        try:
+            client.hincrby(VIEW_BUFFER_KEY, product_id, 1)
+            return
+        except Exception as exc:
+            logger.warning('View counter buffer unavailable (%s), using local buffer', exc)
+    _record_local(product_id)
+
+
+def flush_view_counts() -> int:
+    """
+    تخلیه بافر در دیتابیس. hash با RENAME اتمیک برداشته می‌شود تا
+    بازدیدهای هم‌زمان در hash جدید جمع شوند و چیزی گم نشود. اگر تخلیه
+    دیگری قفل را در اختیار دارد، فقط بافر درون‌پردازه‌ای اعمال می‌شود.
+    """
+    deltas = Counter(_take_local_buffer())
+    client = _redis()
+    if client is not None:
+        token = os.urandom(8).hex()
+        try:
+            locked = client.set(VIEW_FLUSH_LOCK_KEY, token, nx=True, ex=VIEW_FLUSH_LOCK_TIMEOUT)
+        except Exception as exc:
+            logger.warning('Could not lock view counter buffer: %s', exc)
+            locked = False
+        if not locked:
+            return apply_view_deltas(deltas)
+        try:
+            return _flush_redis_buffer(client, deltas)
+        finally:
+            if client.get(VIEW_FLUSH_LOCK_KEY) == token.encode():
+                client.delete(VIEW_FLUSH_LOCK_KEY)
+    return apply_view_deltas(deltas)
+
+
+def _flush_redis_buffer(client, deltas: Counter) -> int:
+    """اعمال hash در حال تخلیه (زیر قفل تخلیه)"""
+    try:
+        # باقیمانده تخلیه ناموفق قبلی اول اعمال می‌شود
+        if not client.exists(VIEW_FLUSHING_KEY):
+            client.rename(VIEW_BUFFER_KEY, VIEW_FLUSHING_KEY)
+        buffered = client.hgetall(VIEW_FLUSHING_KEY)
+    except Exception as exc:
+        # ResponseError: بافر خالی است (کلیدی برای rename وجود ندارد)
+        if 'no such key' not in str(exc).lower():
+            logger.warning('Could not read view counter buffer: %s', exc)
+        buffered = {}
+    for pk, n in buffered.items():
+        deltas[int(pk)] += int(n)
+    updated = apply_view_deltas(deltas)
+    if buffered:
+        client.delete(VIEW_FLUSHING_KEY)
+    return updated
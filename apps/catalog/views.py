@@ -9,13 +9,19 @@ from django.http import JsonResponse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Count, Avg
-from django.core.paginator import Paginator
+from django.db.models import Q, Avg, Prefetch
 from django.core.cache import cache
 from django.conf import settings
 from urllib.parse import unquote
 
-from .models import Category, Product, Brand, Wishlist
+from .models import Category, Product, Brand, RelatedProduct, Wishlist
+from .attribute_filters import filter_by_attributes, get_attribute_facets, parse_attribute_filters
+from .autocomplete import suggest_products
+from .facets import PRICE_BUCKETS, get_facet_dimensions, get_facets, normalize_filters
+from .pagination import KeysetPaginator, get_product_page, keyset_enabled
+from .search_index import search_products
+from .view_counter import record_product_view
+from apps.orders.purchases import has_purchased
 
 
 class ShopView(ListView):
@@ -31,29 +37,12 @@ class ShopView(ListView):
             is_active=True
         ).select_related(
             'category', 'brand'
-        ).prefetch_related('images')
+        ).with_main_image()
         
         # جستجو
         query = self.request.GET.get('q', '').strip()
         if query:
-            queryset = queryset.filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query) |
-                Q(sku__icontains=query) |
-                Q(brand__name__icontains=query)
-            )
-        
-        # فیلتر بر اساس دسته‌بندی
-        category_slug = self.request.GET.get('category')
-        if category_slug:
-            category = get_object_or_404(Category, slug=category_slug, is_active=True)
-            descendants = category.get_descendants(include_self=True)
-            queryset = queryset.filter(category__in=descendants)
-        
-        # فیلتر بر اساس برند
-        brand_slug = self.request.GET.get('brand')
-        if brand_slug:
-            queryset = queryset.filter(brand__slug=brand_slug)
+            queryset = search_products(queryset, query)
         
         # فیلتر قیمت
         min_price = self.request.GET.get('min_price')
@@ -63,13 +52,19 @@ class ShopView(ListView):
         if max_price:
             queryset = queryset.filter(price__lte=max_price)
         
-        # فیلتر موجودی
-        in_stock = self.request.GET.get('in_stock')
-        if in_stock == '1':
-            queryset = queryset.filter(is_in_stock=True)
+        # فیلتر ویژگی‌ها (?attr=form:capsule) با اشتراک مجموعه‌ها، بدون join
+        self.attribute_constraints = parse_attribute_filters(self.request.GET.getlist('attr'))
+        self.attribute_base_queryset = queryset
+        queryset = filter_by_attributes(queryset, self.attribute_constraints)
         
-        # مرتب‌سازی
-        sort = self.request.GET.get('sort', 'newest')
+        # پایه شمارش facet ها (برند/دسته/موجودی در facets.py اعمال می‌شوند)
+        self.facet_queryset = queryset
+        
+        queryset = self.filter_selection(queryset)
+        
+        # مرتب‌سازی (در جستجو بدون sort صریح، ترتیب بر اساس رتبه است)
+        sort = self.request.GET.get('sort', 'relevance' if query else 'newest')
+        self.sort = sort
         if sort == 'newest':
             queryset = queryset.order_by('-created_at')
         elif sort == 'price_low':
@@ -80,26 +75,85 @@ class ShopView(ListView):
             queryset = queryset.order_by('-sales_count')
         elif sort == 'views':
             queryset = queryset.order_by('-view_count')
+        elif sort == 'top_rated':
+            queryset = queryset.order_by('-rating_avg', '-pk')
         
         return queryset
     
+    def filter_selection(self, queryset):
+        """فیلترهای دسته، برند و موجودی"""
+        # فیلتر بر اساس دسته‌بندی
+        category_slug = self.request.GET.get('category')
+        if category_slug:
+            if getattr(self, '_category', None) is None:
+                self._category = get_object_or_404(Category, slug=category_slug, is_active=True)
+            descendants = self._category.get_descendants(include_self=True)
+            queryset = queryset.filter(category__in=descendants)
+        
+        # فیلتر بر اساس برند
+        brand_slug = self.request.GET.get('brand')
+        if brand_slug:
+            queryset = queryset.filter(brand__slug=brand_slug)
+        
+        # فیلتر موجودی
+        in_stock = self.request.GET.get('in_stock')
+        if in_stock == '1':
+            queryset = queryset.filter(is_in_stock=True)
+        
+        return queryset
+    
+    def paginate_queryset(self, queryset, page_size):
+        """صفحه‌بندی keyset (بدون COUNT و OFFSET) در صورت فعال بودن"""
+        if not keyset_enabled(self.request, getattr(self, 'sort', None)):
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, self.sort)
+        page = paginator.get_page(self.request.GET.get('cursor'))
+        return paginator, page, page.object_list, page.has_other_pages()
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
+        # تعداد محصولات هر گزینه فیلتر برای نتایج جاری (با کش)
+        filters = normalize_filters(self.request.GET)
+        facets = get_facets(self.facet_queryset, filters)
+        
         # دسته‌بندی‌ها با کش
-        context['categories'] = self.get_cached_categories()
+        categories = list(self.get_cached_categories())
+        for category in categories:
+            category.facet_count = facets['categories'].get(category.pk, 0)
+        context['categories'] = categories
+        
+        # برندهای دارای محصول در نتایج
+        brands = get_facet_dimensions()['brands']
+        context['brands'] = sorted(
+            (
+                {**brands[pk], 'pk': pk, 'product_count': count}
+                for pk, count in facets['brands'].items()
+                if pk in brands and brands[pk]['is_active']
+            ),
+            key=lambda brand: brand['name'],
+        )
         
-        # برندها
-        context['brands'] = Brand.objects.filter(
-            is_active=True
-        ).annotate(
-            product_count=Count('products')
-        ).filter(product_count__gt=0)
+        # بازه‌های قیمت
+        context['price_buckets'] = [
+            {'min': low, 'max': high - 1 if high else '', 'count': count}
+            for (low, high), count in zip(PRICE_BUCKETS, facets['price_buckets'])
+        ]
+        context['in_stock_count'] = facets['stock'].get('in_stock', 0)
+        
+        # مقادیر ویژگی‌ها (شکل دارویی، دوز، حجم ...)
+        context['attribute_facets'] = get_attribute_facets(
+            self.filter_selection(self.attribute_base_queryset),
+            self.attribute_constraints,
+            filters,
+        )
         
         # فیلترهای فعال
         context['current_category'] = self.request.GET.get('category', '')
         context['current_brand'] = self.request.GET.get('brand', '')
-        context['current_sort'] = self.request.GET.get('sort', 'newest')
+        context['current_sort'] = self.request.GET.get(
+            'sort', 'relevance' if self.request.GET.get('q', '').strip() else 'newest'
+        )
         context['min_price'] = self.request.GET.get('min_price', '')
         context['max_price'] = self.request.GET.get('max_price', '')
         context['in_stock'] = self.request.GET.get('in_stock', '')
@@ -127,6 +181,7 @@ class ShopView(ListView):
         """ساخت querystring بدون پارامتر صفحه برای استفاده در پیجینیشن"""
         params = self.request.GET.copy()
         params.pop('page', None)
+        params.pop('cursor', None)
         qs = params.urlencode()
         return f'&{qs}' if qs else ''
 
@@ -151,7 +206,7 @@ class CategoryDetailView(View):
         products = Product.objects.filter(
             category__in=descendants,
             is_active=True
-        ).select_related('category', 'brand').prefetch_related('images')
+        ).select_related('category', 'brand').with_main_image()
         
         # فیلتر و مرتب‌سازی
         sort = request.GET.get('sort', 'newest')
@@ -163,11 +218,11 @@ class CategoryDetailView(View):
             products = products.order_by('-price')
         elif sort == 'popular':
             products = products.order_by('-sales_count')
+        elif sort == 'top_rated':
+            products = products.order_by('-rating_avg', '-pk')
         
         # صفحه‌بندی
-        paginator = Paginator(products, 12)
-        page = request.GET.get('page', 1)
-        products = paginator.get_page(page)
+        products = get_product_page(request, products, sort, 12)
         
         # Breadcrumb
         ancestors = category.get_ancestors(include_self=True)
@@ -198,15 +253,18 @@ class ProductDetailView(View):
             ).select_related(
                 'category', 'brand'
             ).prefetch_related(
-                'images', 'attribute_values__attribute'
+                'images', 'attribute_values__attribute',
+                # محصولات مرتبط از پیش محاسبه‌شده (حداکثر RELATED_LIMIT ردیف)
+                Prefetch(
+                    'related_links',
+                    queryset=RelatedProduct.objects.related_for_display()
+                ),
             ),
             slug=decoded_slug
         )
         
         # افزایش شمارنده بازدید
-        Product.objects.filter(pk=product.pk).update(
-            view_count=product.view_count + 1
-        )
+        record_product_view(product.pk)
         
         # Breadcrumb
         ancestors = product.category.get_ancestors(include_self=True) if product.category else []
@@ -224,13 +282,15 @@ class ProductDetailView(View):
         # محصولات مرتبط
         related_products = product.get_related_products()
         
-        # بررسی علاقه‌مندی
+        # بررسی علاقه‌مندی و خرید قبلی
         is_in_wishlist = False
+        has_purchased_product = False
         if request.user.is_authenticated:
             is_in_wishlist = Wishlist.objects.filter(
                 user=request.user,
                 product=product
             ).exists()
+            has_purchased_product = has_purchased(request.user.pk, product.pk)
         
         context = {
             'product': product,
@@ -238,6 +298,8 @@ class ProductDetailView(View):
             'breadcrumb_items': breadcrumb_items,
             'related_products': related_products,
             'is_in_wishlist': is_in_wishlist,
+            'has_purchased': has_purchased_product,
+            'can_review': has_purchased_product or not settings.REVIEWS_BUYERS_ONLY,
         }
         
         return render(request, self.template_name, context)
@@ -253,18 +315,13 @@ class SearchView(View):
         products = Product.objects.none()
         
         if query:
-            products = Product.objects.filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query) |
-                Q(sku__icontains=query) |
-                Q(brand__name__icontains=query),
-                is_active=True
-            ).select_related('category', 'brand').prefetch_related('images')
+            products = search_products(
+                Product.objects.filter(is_active=True),
+                query
+            ).select_related('category', 'brand').with_main_image()
         
-        # صفحه‌بندی
-        paginator = Paginator(products, 12)
-        page = request.GET.get('page', 1)
-        products = paginator.get_page(page)
+        # صفحه‌بندی (ترتیب رتبه جستجو keyset ندارد)
+        products = get_product_page(request, products, 'relevance', 12)
         
         context = {
             'query': query,
@@ -283,23 +340,7 @@ class SearchSuggestView(View):
         if len(query) < 2:
             return JsonResponse({'results': []})
         
-        products = Product.objects.filter(
-            Q(name__icontains=query) | Q(sku__icontains=query),
-            is_active=True
-        ).select_related('brand').prefetch_related('images')[:5]
-        
-        results = []
-        for product in products:
-            image_url = ''
-            if product.main_image:
-                image_url = product.main_image.image.url
-            
-            results.append({
-                'name': product.name,
-                'url': product.get_absolute_url(),
-                'image': image_url,
-                'price': str(product.price),
-            })
+        results = suggest_products(query, limit=5)
         
         return JsonResponse({'results': results})
 
@@ -361,7 +402,7 @@ class BrandDetailView(View):
         products = Product.objects.filter(
             brand=brand,
             is_active=True
-        ).select_related('category').prefetch_related('images')
+        ).select_related('category').with_main_image()
         
         # مرتب‌سازی
         sort = request.GET.get('sort', 'newest')
@@ -373,9 +414,7 @@ class BrandDetailView(View):
             products = products.order_by('-price')
         
         # صفحه‌بندی
-        paginator = Paginator(products, 12)
-        page = request.GET.get('page', 1)
-        products = paginator.get_page(page)
+        products = get_product_page(request, products, sort, 12)
         
         context = {
             'brand': brand,
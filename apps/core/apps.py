@@ -5,3 +5,7 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
     verbose_name = 'تنظیمات و صفحات'
+
+    def ready(self):
+        """رجیستر کردن سیگنال‌ها"""
+        import apps.core.signals  # noqa: F401
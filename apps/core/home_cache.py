@@ -0,0 +1,154 @@
+"""
+کش بخش‌های صفحه اصلی
+
+هر بخش صفحه اصلی (اسلایدر، بنرها، دسته‌ها، محصولات، برندها) به‌صورت لیست
+آماده (با تصاویر پیش‌بارگذاری‌شده) زیر کلیدی شامل «نسخه محتوا» در کش ذخیره
+می‌شود. سیگنال‌های ذخیره/حذف اسلاید، بنر، محصول، برند و دسته فقط نسخه را
+افزایش می‌دهند؛ کلیدهای قدیمی دیگر خوانده نمی‌شوند و منقضی می‌شوند.
+در حالت گرم صفحه اصلی بدون هیچ کوئری ساخته می‌شود.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db.models import Count
+
+logger = logging.getLogger(__name__)
+
+HOME_VERSION_CACHE_KEY = 'core:home_version'
+HOME_SECTION_CACHE_KEY = 'core:home:{section}:{version}'
+# تغییراتی که سیگنال ندارند (مثل sales_count با UPDATE) حداکثر پس از این مدت دیده می‌شوند
+HOME_CACHE_TIMEOUT = 60 * 60
+
+
+def _sliders():
+    from .models import Slider
+
+    return Slider.objects.filter(is_active=True)
+
+
+def _banners(position):
+    from .models import Banner
+
+    return lambda: Banner.objects.filter(is_active=True, position=position)
+
+
+def _categories():
+    from apps.catalog.models import Category
+
+    return Category.objects.filter(
+        is_active=True,
+        level=0
+    ).prefetch_related('children')[:8]
+
+
+def _products():
+    from apps.catalog.models import Product
+
+    return Product.objects.filter(
+        is_active=True
+    ).select_related(
+        'category', 'brand'
+    ).with_main_image()
+
+
+def _new_products():
+    return _products().order_by('-created_at')[:12]
+
+
+def _popular_products():
+    return _products().order_by('-sales_count')[:8]
+
+
+def _sale_products():
+    return _products().filter(
+        compare_at_price__isnull=False
+    ).exclude(
+        compare_at_price=0
+    )[:8]
+
+
+def _brands():
+    from apps.catalog.models import Brand
+
+    return Brand.objects.filter(
+        is_active=True
+    ).annotate(
+        product_count=Count('products')
+    ).filter(product_count__gt=0).order_by('-product_count')[:12]
+
+
+# نام متغیر تمپلیت -> کوئری بخش
+HOME_SECTIONS = {
+    'sliders': _sliders,
+    'banners_top': _banners('home_top'),
+    'banners_middle': _banners('home_middle'),
+    'categories': _categories,
+    'new_products': _new_products,
+    'popular_products': _popular_products,
+    'sale_products': _sale_products,
+    'brands': _brands,
+}
+
+
+def _current_version() -> int:
+    version = cache.get(HOME_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(HOME_VERSION_CACHE_KEY, 1, None)
+        version = cache.get(HOME_VERSION_CACHE_KEY, 1)
+    return version
+
+
+def _section_keys(version) -> dict:
+    return {
+        HOME_SECTION_CACHE_KEY.format(section=section, version=version): section
+        for section in HOME_SECTIONS
+    }
+
+
+def build_home_sections(sections=None) -> dict:
+    """اجرای کوئری بخش‌ها (تنها جایی که ORM استفاده می‌شود)"""
+    return {
+        section: list(HOME_SECTIONS[section]())
+        for section in (sections if sections is not None else HOME_SECTIONS)
+    }
+
+
+def get_home_sections() -> dict:
+    """
+    داده همه بخش‌های صفحه اصلی برای نسخه جاری؛ بخش‌هایی که در کش نیستند
+    ساخته و ذخیره می‌شوند.
+    """
+    keys = _section_keys(_current_version())
+    cached = cache.get_many(keys)
+    sections = {keys[key]: value for key, value in cached.items()}
+
+    missing = [section for section in HOME_SECTIONS if section not in sections]
+    if missing:
+        built = build_home_sections(missing)
+        sections.update(built)
+        section_keys = {section: key for key, section in keys.items()}
+        cache.set_many(
+            {section_keys[section]: value for section, value in built.items()},
+            HOME_CACHE_TIMEOUT,
+        )
+    return sections
+
+
+def prewarm_home_cache() -> dict:
+    """ساخت و ذخیره همه بخش‌ها برای نسخه جاری. خروجی: {بخش: تعداد آیتم}"""
+    keys = _section_keys(_current_version())
+    section_keys = {section: key for key, section in keys.items()}
+    built = build_home_sections()
+    cache.set_many(
+        {section_keys[section]: value for section, value in built.items()},
+        HOME_CACHE_TIMEOUT,
+    )
+    return {section: len(value) for section, value in built.items()}
+
+
+def invalidate_home_cache():
+    """باطل کردن کش صفحه اصلی؛ درخواست بعدی بخش‌ها را از نو می‌سازد."""
+    try:
+        cache.incr(HOME_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(HOME_VERSION_CACHE_KEY, 2, None)
@@ -0,0 +1,259 @@
+"""
+لایه مشترک درخواست‌های HTTP خروجی (MsgWay، زرین‌پال)
+
+هر سرویس یک HttpClient دارد: یک requests.Session با pool اتصال‌های
+keep-alive برای هر host، timeout اتصال/خواندن قابل تنظیم، تلاش مجدد برای
+خطای اتصال و پاسخ‌های 502/503/504 (برای POST فقط 502/503)، circuit breaker
+و آمار زمان پاسخ.
+تنظیمات هر سرویس در settings.HTTP_CLIENTS قابل تغییر است.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OPTIONS = {
+    'connect_timeout': 3.05,
+    'read_timeout': 10,
+    # فقط خطای اتصال و پاسخ‌های زیر دوباره تلاش می‌شوند؛ نه timeout خواندن
+    # (درخواست ممکن است به سرور رسیده باشد و نباید تکرار شود)
+    'retries': 2,
+    'backoff_factor': 0.3,
+    'retry_statuses': (502, 503, 504),
+    # 504 یعنی مقصد ممکن است درخواست را پردازش کرده باشد؛ POST تکرار نمی‌شود
+    # (پیامک یا authority زرین‌پال تکراری)
+    'retry_statuses_post': (502, 503),
+    'pool_connections': 4,
+    'pool_maxsize': 10,
+    # پس از این تعداد خطای پیاپی، درخواست‌ها تا reset_timeout ثانیه رد می‌شوند
+    'failure_threshold': 5,
+    'reset_timeout': 30,
+}
+
+
+class MethodAwareRetry(Retry):
+    """Retry با فهرست وضعیت جدا برای درخواست‌های POST"""
+
+    def __init__(self, *args, post_status_forcelist=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.post_status_forcelist = frozenset(post_status_forcelist)
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.post_status_forcelist = self.post_status_forcelist
+        return retry
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method.upper() == 'POST' and status_code not in self.post_status_forcelist:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """سرویس مقصد موقتاً در دسترس فرض نمی‌شود (circuit باز است)"""
+
+
+class CircuitBreaker:
+    """circuit breaker ساده: closed → open → half-open (یک درخواست آزمایشی)"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # فقط یک درخواست آزمایشی؛ بقیه تا نتیجه آن منتظر دوره بعد می‌مانند
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning('HTTP circuit opened after %d failures', self.failures)
+                self.opened_at = time.monotonic()
+
+
+class LatencyStats:
+    """آمار زمان پاسخ (میلی‌ثانیه) در این پردازه"""
+
+    def __init__(self, window: int = 500):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, elapsed_ms: float, error: bool = False):
+        with self._lock:
+            self.count += 1
+            self.errors += int(error)
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            self.recent.append(elapsed_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = sorted(self.recent)
+            count, errors, total_ms, max_ms = self.count, self.errors, self.total_ms, self.max_ms
+
+        def percentile(p):
+            if not recent:
+                return 0.0
+            return round(recent[min(len(recent) - 1, int(len(recent) * p))], 1)
+
+        return {
+            'count': count,
+            'errors': errors,
+            'avg_ms': round(total_ms / count, 1) if count else 0.0,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(max_ms, 1),
+        }
+
+
+class HttpClient:
+    """کلاینت HTTP یک سرویس خارجی با pool اتصال مشترک"""
+
+    def __init__(self, name: str, **options):
+        self.name = name
+        self.options = {**DEFAULT_OPTIONS, **options}
+        self.breaker = CircuitBreaker(
+            self.options['failure_threshold'], self.options['reset_timeout']
+        )
+        self.stats = LatencyStats()
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self):
+        return (self.options['connect_timeout'], self.options['read_timeout'])
+
+    def _build_session(self) -> requests.Session:
+        retries = self.options['retries']
+        retry = MethodAwareRetry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            status_forcelist=self.options['retry_statuses'],
+            post_status_forcelist=self.options['retry_statuses_post'],
+            allowed_methods=frozenset({'GET', 'POST'}),
+            backoff_factor=self.options['backoff_factor'],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.options['pool_connections'],
+            pool_maxsize=self.options['pool_maxsize'],
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        # اتصال‌های باز بین پردازه‌های fork شده (worker های Celery) مشترک نمی‌شوند
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    self._session = self._build_session()
+                    self._pid = pid
+        return self._session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if not self.breaker.allow():
+            self.stats.record(0.0, error=True)
+            raise CircuitOpenError(f'{self.name}: circuit open, request skipped')
+
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.breaker.record_failure()
+            self.stats.record(elapsed_ms, error=True)
+            logger.warning('%s %s %s failed after %.0fms', self.name, method, url, elapsed_ms)
+            raise
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        failed = response.status_code >= 500
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self.stats.record(elapsed_ms, error=failed)
+        logger.debug(
+            '%s %s %s -> %s in %.0fms', self.name, method, url, response.status_code, elapsed_ms
+        )
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+
+
+_clients: dict[str, HttpClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name: str) -> HttpClient:
+    """کلاینت مشترک یک سرویس (تنظیمات از settings.HTTP_CLIENTS[name])"""
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                options = getattr(settings, 'HTTP_CLIENTS', {}).get(name, {})
+                client = _clients[name] = HttpClient(name, **options)
+    return client
+
+
+def get_http_metrics() -> dict:
+    """آمار زمان پاسخ و وضعیت circuit همه کلاینت‌ها در این پردازه"""
+    return {
+        name: {**client.stats.snapshot(), 'circuit': client.breaker.state}
+        for name, client in list(_clients.items())
+    }
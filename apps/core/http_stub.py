@@ -0,0 +1,74 @@
+"""
+سرور HTTP محلی برای آزمودن لایه HTTP خروجی بدون اینترنت
+
+پاسخ‌ها به ترتیب از لیست داده‌شده برگردانده می‌شوند (سپس 200) و
+اتصال‌های TCP دیده‌شده ثبت می‌شوند تا استفاده مجدد از اتصال (keep-alive)
+و تلاش مجدد قابل بررسی باشد.
+
+استفاده:
+    with StubHTTPServer(responses=[503, 200]) as stub:
+        get_client('test').post(stub.url, json={})
+        assert stub.request_count == 2
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        status = self.server.stub.next_status(self.client_address)
+        body = json.dumps({'status': 'success' if status < 400 else 'error'}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _respond
+    do_POST = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubHTTPServer:
+    """سرور محلی با پاسخ‌های از پیش تعیین‌شده"""
+
+    def __init__(self, responses=None):
+        self.responses = list(responses or [])
+        self.request_count = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def next_status(self, client_address) -> int:
+        with self._lock:
+            self.request_count += 1
+            self.connections.add(client_address)
+            return self.responses.pop(0) if self.responses else 200
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def __enter__(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
@@ -0,0 +1,75 @@
+"""
+بررسی لایه HTTP خروجی (pool اتصال، تلاش مجدد، circuit breaker) با سرور محلی
+
+استفاده:
+    python manage.py check_http_client
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.http_client import CircuitOpenError, HttpClient
+from apps.core.http_stub import StubHTTPServer
+
+
+class Command(BaseCommand):
+    help = 'بررسی آفلاین keep-alive، تلاش مجدد و circuit breaker کلاینت HTTP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='تعداد درخواست برای بررسی pool')
+
+    def assert_ok(self, ok, message):
+        if not ok:
+            raise CommandError(message)
+        self.stdout.write(self.style.SUCCESS(f'✓ {message}'))
+
+    def handle(self, *args, **options):
+        total = max(1, options['requests'])
+
+        # استفاده مجدد از اتصال
+        client = HttpClient('stub-pool')
+        with StubHTTPServer() as stub:
+            for _ in range(total):
+                client.post(stub.url, json={'ping': 1})
+            self.assert_ok(
+                len(stub.connections) == 1,
+                f'{total} درخواست روی {len(stub.connections)} اتصال TCP'
+            )
+        self.stdout.write(f'  latency: {client.stats.snapshot()}')
+
+        # تلاش مجدد برای 503
+        client = HttpClient('stub-retry', retries=2, backoff_factor=0)
+        with StubHTTPServer(responses=[503, 503]) as stub:
+            response = client.post(stub.url, json={})
+            self.assert_ok(
+                response.status_code == 200 and stub.request_count == 3,
+                f'پاسخ {response.status_code} پس از {stub.request_count} تلاش'
+            )
+
+        # پاسخ 504 برای POST تکرار نمی‌شود (ممکن است پردازش شده باشد)
+        client = HttpClient('stub-no-replay', retries=2, backoff_factor=0)
+        with StubHTTPServer(responses=[504]) as stub:
+            response = client.post(stub.url, json={})
+            self.assert_ok(
+                response.status_code == 504 and stub.request_count == 1,
+                f'POST با پاسخ 504 پس از {stub.request_count} تلاش تکرار نشد'
+            )
+        with StubHTTPServer(responses=[504]) as stub:
+            response = client.get(stub.url)
+            self.assert_ok(
+                response.status_code == 200 and stub.request_count == 2,
+                f'GET با پاسخ 504 پس از {stub.request_count} تلاش'
+            )
+
+        # circuit breaker
+        client = HttpClient('stub-breaker', retries=0, failure_threshold=3, reset_timeout=60)
+        with StubHTTPServer(responses=[500, 500, 500]) as stub:
+            for _ in range(3):
+                client.post(stub.url, json={})
+            try:
+                client.post(stub.url, json={})
+                opened = False
+            except CircuitOpenError:
+                opened = True
+            self.assert_ok(
+                opened and stub.request_count == 3,
+                f'circuit پس از ۳ خطا باز شد ({client.breaker.state})'
+            )
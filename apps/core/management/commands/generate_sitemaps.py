@@ -0,0 +1,28 @@
+"""
+تولید فایل‌های sitemap (فهرست + فایل‌های فشرده محصولات)
+
+استفاده:
+    python manage.py generate_sitemaps          # افزایشی
+    python manage.py generate_sitemaps --full   # ساخت کامل
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.sitemap_files import generate_sitemaps, sitemap_root
+
+
+class Command(BaseCommand):
+    help = 'تولید/بروزرسانی sitemap.xml و فایل‌های gzip آن در SITEMAP_ROOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='ساخت کامل همه فایل‌ها')
+
+    def handle(self, *args, **options):
+        result = generate_sitemaps(full=options['full'])
+        if result is None:
+            raise CommandError('تولید sitemap در حال اجرا است')
+        for name in result['written']:
+            self.stdout.write(name)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(result['written'])} فایل در {sitemap_root()} نوشته شد"
+            + (' (ساخت کامل)' if result['full'] else '')
+        ))
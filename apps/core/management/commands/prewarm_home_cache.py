@@ -0,0 +1,19 @@
+"""
+ساخت کش بخش‌های صفحه اصلی (پس از هر deploy)
+
+استفاده:
+    python manage.py prewarm_home_cache
+"""
+from django.core.management.base import BaseCommand
+
+from apps.core.home_cache import prewarm_home_cache
+
+
+class Command(BaseCommand):
+    help = 'ساخت و ذخیره کش بخش‌های صفحه اصلی برای نسخه جاری محتوا'
+
+    def handle(self, *args, **options):
+        counts = prewarm_home_cache()
+        for section, count in counts.items():
+            self.stdout.write(f'{section}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'کش {len(counts)} بخش صفحه اصلی ساخته شد'))
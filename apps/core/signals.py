@@ -0,0 +1,33 @@
+"""
+سیگنال‌های اپ core
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .home_cache import invalidate_home_cache
+from .site_settings_cache import invalidate_site_settings
+
+
+@receiver(post_save, sender='core.Slider')
+@receiver(post_delete, sender='core.Slider')
+@receiver(post_save, sender='core.Banner')
+@receiver(post_delete, sender='core.Banner')
+@receiver(post_save, sender='catalog.Product')
+@receiver(post_delete, sender='catalog.Product')
+@receiver(post_save, sender='catalog.ProductImage')
+@receiver(post_delete, sender='catalog.ProductImage')
+@receiver(post_save, sender='catalog.Brand')
+@receiver(post_delete, sender='catalog.Brand')
+@receiver(post_save, sender='catalog.Category')
+@receiver(post_delete, sender='catalog.Category')
+def home_content_changed_invalidate_cache(sender, **kwargs):
+    """باطل کردن کش صفحه اصلی پس از تغییر محتوای نمایش‌داده‌شده در آن"""
+    transaction.on_commit(invalidate_home_cache)
+
+
+@receiver(post_save, sender='core.SiteSettings')
+@receiver(post_delete, sender='core.SiteSettings')
+def site_settings_changed_invalidate_cache(sender, **kwargs):
+    """باطل کردن تنظیمات کش‌شده در همه پردازه‌ها"""
+    transaction.on_commit(invalidate_site_settings)
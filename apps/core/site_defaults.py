@@ -37,6 +37,17 @@ class SiteSettingsProxy:
     def __init__(self, settings):
         self._settings = settings
 
+    @classmethod
+    def current(cls):
+        """Proxy for the process-cached settings row (see site_settings_cache)."""
+        from .site_settings_cache import get_site_settings
+
+        try:
+            settings = get_site_settings()
+        except Exception:
+            settings = None
+        return cls(settings)
+
     def __getattr__(self, name):
         if name.startswith('_'):
             raise AttributeError(name)
@@ -0,0 +1,65 @@
+"""
+کش درون‌پردازه‌ای تنظیمات سایت
+
+ردیف SiteSettings در هر پردازه نگه داشته می‌شود. پس از LOCAL_TTL ثانیه فقط
+نسخه تنظیمات از کش مشترک خوانده می‌شود و تنها اگر نسخه تغییر کرده باشد
+(SiteSettings.save در هر پردازه‌ای) ردیف دوباره از دیتابیس خوانده می‌شود.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+
+SITE_SETTINGS_VERSION_CACHE_KEY = 'core:site_settings_version'
+# فاصله بررسی نسخه در کش مشترک (ثانیه)
+LOCAL_TTL = 30
+
+# RLock: ایجاد ردیف در get_settings سیگنال باطل‌سازی را در همین نخ اجرا می‌کند
+_local_lock = threading.RLock()
+_local_settings = None
+_local_version = None
+_local_checked_at = 0.0
+
+
+def _current_version() -> int:
+    version = cache.get(SITE_SETTINGS_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(SITE_SETTINGS_VERSION_CACHE_KEY, 1, None)
+        version = cache.get(SITE_SETTINGS_VERSION_CACHE_KEY, 1)
+    return version
+
+
+def get_site_settings():
+    """
+    تنظیمات سایت (یا None اگر خوانده نشد). در حالت گرم بدون کوئری و
+    بدون دسترسی به کش مشترک.
+    """
+    global _local_settings, _local_version, _local_checked_at
+    from .models import SiteSettings
+
+    if _local_settings is not None and time.monotonic() - _local_checked_at < LOCAL_TTL:
+        return _local_settings
+
+    with _local_lock:
+        if _local_settings is not None and time.monotonic() - _local_checked_at < LOCAL_TTL:
+            return _local_settings
+        version = _current_version()
+        if _local_settings is None or version != _local_version:
+            settings = SiteSettings.get_settings()
+            if settings is None:
+                return None
+            _local_settings = settings
+            _local_version = version
+        _local_checked_at = time.monotonic()
+    return _local_settings
+
+
+def invalidate_site_settings():
+    """باطل کردن تنظیمات در این پردازه و (با افزایش نسخه) در بقیه پردازه‌ها"""
+    global _local_settings
+    with _local_lock:
+        _local_settings = None
+    try:
+        cache.incr(SITE_SETTINGS_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(SITE_SETTINGS_VERSION_CACHE_KEY, 2, None)
@@ -0,0 +1,333 @@
+"""
+تولید فایل‌های sitemap (فهرست sitemap + فایل‌های gzip حداکثر ۵۰ هزار آدرسی)
+
+به جای ساخت کل XML در حافظه برای هر درخواست خزنده، فایل‌ها در SITEMAP_ROOT
+نوشته و مستقیم سرو می‌شوند. محصولات با values_list و iterator به ترتیب pk
+خوانده و در فایل‌های products-N.xml.gz با بازه pk ثابت نوشته می‌شوند.
+در اجرای افزایشی فقط فایل‌هایی بازنویسی می‌شوند که محصولی با updated_at
+بعد از watermark قبلی در بازه‌شان دارند یا تعداد محصولات فعال‌شان تغییر
+کرده است (حذف یا UPDATE بدون updated_at). محصولات جدید به آخرین فایل اضافه
+و در صورت پر شدن، فایل جدید ساخته می‌شود.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+from bisect import bisect_right
+from datetime import timedelta
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+SHARD_SIZE = 50_000
+CHUNK_SIZE = 2000
+# فاصله اطمینان watermark برای تراکنش‌هایی که پس از شروع تولید commit می‌شوند
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+INDEX_NAME = 'sitemap.xml'
+PAGES_NAME = 'pages.xml.gz'
+MANIFEST_NAME = 'manifest.json'
+PRODUCT_SHARD_NAME = 'products-{number}.xml.gz'
+SHARD_NAME_RE = re.compile(r'^(pages|products-\d+)\.xml\.gz$')
+
+LOCK_CACHE_KEY = 'core:sitemaps_lock'
+LOCK_TIMEOUT = 60 * 30
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = '</urlset>\n'
+
+
+def sitemap_root() -> Path:
+    return Path(getattr(settings, 'SITEMAP_ROOT', settings.BASE_DIR / 'data' / 'sitemaps'))
+
+
+def base_url() -> str:
+    """آدرس پایه سایت (SITEMAP_BASE_URL یا دامنه Site جاری)"""
+    configured = getattr(settings, 'SITEMAP_BASE_URL', '')
+    if configured:
+        return configured.rstrip('/')
+    from django.contrib.sites.models import Site
+    return f'https://{Site.objects.get_current().domain}'
+
+
+def _url_entry(loc, lastmod=None, changefreq=None, priority=None) -> str:
+    parts = [f'<url><loc>{escape(loc)}</loc>']
+    if lastmod:
+        parts.append(f'<lastmod>{lastmod.date().isoformat()}</lastmod>')
+    if changefreq:
+        parts.append(f'<changefreq>{changefreq}</changefreq>')
+    if priority is not None:
+        parts.append(f'<priority>{priority}</priority>')
+    parts.append('</url>\n')
+    return ''.join(parts)
+
+
+class ShardWriter:
+    """نوشتن یک فایل urlset فشرده؛ فایل قبلی فقط پس از close جایگزین می‌شود"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.tmp_path = path.with_name(path.name + '.tmp')
+        self.count = 0
+        self.lastmod = None
+        self._file = gzip.open(self.tmp_path, 'wt', encoding='utf-8')
+        self._file.write(XML_HEADER + URLSET_OPEN)
+
+    def write(self, loc, lastmod=None, changefreq=None, priority=None):
+        self._file.write(_url_entry(loc, lastmod, changefreq, priority))
+        self.count += 1
+        if lastmod and (self.lastmod is None or lastmod > self.lastmod):
+            self.lastmod = lastmod
+
+    def close(self):
+        self._file.write(URLSET_CLOSE)
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+# --- صفحات ثابت، دسته‌ها و برندها ---
+
+def _pages_entries(root_url: str) -> list[tuple]:
+    from .sitemaps import BrandSitemap, CategorySitemap, StaticViewSitemap
+
+    entries = []
+    for sitemap in (StaticViewSitemap(), CategorySitemap(), BrandSitemap()):
+        lastmod = getattr(sitemap, 'lastmod', None)
+        for item in sitemap.items():
+            entries.append((
+                root_url + sitemap.location(item),
+                lastmod(item) if lastmod else None,
+                sitemap.changefreq,
+                sitemap.priority,
+            ))
+    return entries
+
+
+def _write_pages(root: Path, root_url: str, manifest: dict) -> bool:
+    """بازنویسی pages.xml.gz در صورت تغییر محتوا. خروجی: تغییر کرد؟"""
+    entries = _pages_entries(root_url)
+    digest = hashlib.md5(repr(entries).encode()).hexdigest()
+    previous = manifest.get('pages') or {}
+    if previous.get('hash') == digest and (root / PAGES_NAME).exists():
+        return False
+    writer = ShardWriter(root / PAGES_NAME)
+    try:
+        for entry in entries:
+            writer.write(*entry)
+    except Exception:
+        writer.abort()
+        raise
+    writer.close()
+    manifest['pages'] = {
+        'name': PAGES_NAME,
+        'hash': digest,
+        'count': writer.count,
+        'lastmod': timezone.now().isoformat(),
+    }
+    return True
+
+
+# --- محصولات ---
+
+def _active_products():
+    from apps.catalog.models import Product
+    return Product.objects.filter(is_active=True)
+
+
+def _write_product_shards(root: Path, root_url: str, first_pk, last_pk, number: int,
+                          split: bool) -> list[dict]:
+    """
+    نوشتن محصولات بازه [first_pk, last_pk] (last_pk=None یعنی تا انتها) از
+    فایل شماره number؛ با split=True پس از هر SHARD_SIZE آدرس فایل بعدی شروع می‌شود.
+    """
+    from .sitemaps import ProductSitemap
+
+    changefreq, priority = ProductSitemap.changefreq, ProductSitemap.priority
+    rows = _active_products().filter(pk__gte=first_pk or 0)
+    if last_pk is not None:
+        rows = rows.filter(pk__lte=last_pk)
+    rows = rows.order_by('pk').values_list('pk', 'slug', 'updated_at').iterator(chunk_size=CHUNK_SIZE)
+
+    shards = []
+    writer = None
+    shard_first = first_pk
+
+    def finish(next_first_pk=None):
+        writer.close()
+        shards.append({
+            'name': writer.path.name,
+            'first_pk': shard_first,
+            'last_pk': next_first_pk - 1 if next_first_pk is not None else last_pk,
+            'count': writer.count,
+            'lastmod': writer.lastmod.isoformat() if writer.lastmod else None,
+        })
+
+    try:
+        for pk, slug, updated_at in rows:
+            if writer is not None and split and writer.count >= SHARD_SIZE:
+                finish(next_first_pk=pk)
+                number += 1
+                writer, shard_first = None, pk
+            if writer is None:
+                writer = ShardWriter(root / PRODUCT_SHARD_NAME.format(number=number))
+            writer.write(
+                root_url + reverse('catalog:product_detail', args=[slug]),
+                updated_at, changefreq, priority,
+            )
+        if writer is None:
+            # بازه خالی: فایل خالی تا شماره‌گذاری فایل‌ها ثابت بماند
+            writer = ShardWriter(root / PRODUCT_SHARD_NAME.format(number=number))
+        finish()
+    except Exception:
+        if writer is not None:
+            writer.abort()
+        raise
+    return shards
+
+
+def _shard_counts(shards: list[dict]) -> list[int]:
+    """تعداد محصولات فعال فعلی هر بازه با یک کوئری"""
+    aggregates = {}
+    for index, shard in enumerate(shards):
+        condition = Q(pk__gte=shard['first_pk'] or 0)
+        if shard['last_pk'] is not None:
+            condition &= Q(pk__lte=shard['last_pk'])
+        aggregates[f's{index}'] = Count('pk', filter=condition)
+    result = _active_products().aggregate(**aggregates)
+    return [result[f's{index}'] for index in range(len(shards))]
+
+
+def _dirty_shards(shards: list[dict], watermark) -> set[int]:
+    """شماره (اندیس) فایل‌هایی که باید بازنویسی شوند"""
+    from apps.catalog.models import Product
+
+    dirty = set()
+    firsts = [shard['first_pk'] or 0 for shard in shards]
+    changed = Product.objects.filter(updated_at__gt=watermark).values_list(
+        'pk', flat=True
+    ).order_by().iterator(chunk_size=CHUNK_SIZE)
+    for pk in changed:
+        # بازه‌ها پیوسته و به ترتیب pk هستند؛ آخرین بازه انتها ندارد
+        dirty.add(max(bisect_right(firsts, pk) - 1, 0))
+    for index, (shard, count) in enumerate(zip(shards, _shard_counts(shards))):
+        if count != shard['count']:
+            dirty.add(index)
+    return dirty
+
+
+# --- فهرست و manifest ---
+
+def _write_index(root: Path, root_url: str, manifest: dict):
+    prefix = root_url + reverse('sitemap_shard', args=['__name__']).replace('__name__', '')
+    lines = [XML_HEADER, '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+    for shard in [manifest['pages']] + manifest['products']:
+        lines.append(f'<sitemap><loc>{escape(prefix + shard["name"])}</loc>')
+        if shard.get('lastmod'):
+            lines.append(f'<lastmod>{shard["lastmod"]}</lastmod>')
+        lines.append('</sitemap>\n')
+    lines.append('</sitemapindex>\n')
+    tmp_path = root / (INDEX_NAME + '.tmp')
+    tmp_path.write_text(''.join(lines), encoding='utf-8')
+    os.replace(tmp_path, root / INDEX_NAME)
+
+
+def _load_manifest(root: Path):
+    try:
+        return json.loads((root / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def _save_manifest(root: Path, manifest: dict):
+    tmp_path = root / (MANIFEST_NAME + '.tmp')
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding='utf-8')
+    os.replace(tmp_path, root / MANIFEST_NAME)
+
+
+def _remove_unlisted(root: Path, manifest: dict):
+    listed = {PAGES_NAME} | {shard['name'] for shard in manifest['products']}
+    for path in root.glob('products-*.xml.gz'):
+        if path.name not in listed:
+            path.unlink(missing_ok=True)
+
+
+def generate_sitemaps(full: bool = False) -> dict:
+    """
+    تولید/بروزرسانی فایل‌های sitemap.
+    خروجی: {'full': ..., 'written': [نام فایل‌های بازنویسی‌شده]} یا None اگر
+    اجرای دیگری در جریان بود.
+    """
+    if not cache.add(LOCK_CACHE_KEY, 1, LOCK_TIMEOUT):
+        logger.info('Sitemap generation already running, skipped')
+        return None
+    try:
+        return _generate(full)
+    finally:
+        cache.delete(LOCK_CACHE_KEY)
+
+
+def _generate(full: bool) -> dict:
+    root = sitemap_root()
+    root.mkdir(parents=True, exist_ok=True)
+    root_url = base_url()
+    started = timezone.now()
+
+    manifest = None if full else _load_manifest(root)
+    watermark = parse_datetime(manifest['watermark']) if manifest and manifest.get('watermark') else None
+    if manifest is None or watermark is None or not manifest.get('products') \
+            or manifest.get('base_url') != root_url:
+        full = True
+        manifest = {'pages': {}, 'products': []}
+
+    written = []
+    if _write_pages(root, root_url, manifest):
+        written.append(PAGES_NAME)
+
+    if full:
+        manifest['products'] = _write_product_shards(root, root_url, None, None, 1, split=True)
+        written += [shard['name'] for shard in manifest['products']]
+    else:
+        shards = manifest['products']
+        for index in sorted(_dirty_shards(shards, watermark)):
+            shard = shards[index]
+            number = int(shard['name'].split('-')[1].split('.')[0])
+            is_last = index == len(shards) - 1
+            rewritten = _write_product_shards(
+                root, root_url, shard['first_pk'], shard['last_pk'], number, split=is_last
+            )
+            shards[index:index + 1] = rewritten
+            written += [item['name'] for item in rewritten]
+
+    if written or not (root / INDEX_NAME).exists():
+        _write_index(root, root_url, manifest)
+    manifest['base_url'] = root_url
+    manifest['watermark'] = (started - WATERMARK_OVERLAP).isoformat()
+    manifest['generated_at'] = started.isoformat()
+    _save_manifest(root, manifest)
+    _remove_unlisted(root, manifest)
+
+    logger.info('Sitemaps %s: %d file(s) written', 'rebuilt' if full else 'updated', len(written))
+    return {'full': full, 'written': written}
+
+
+def sitemap_file(name: str):
+    """مسیر فایل sitemap معتبر (فهرست یا یکی از فایل‌ها) یا None"""
+    if name != INDEX_NAME and not SHARD_NAME_RE.match(name):
+        return None
+    path = sitemap_root() / name
+    return path if path.is_file() else None
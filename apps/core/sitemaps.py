@@ -21,7 +21,8 @@ class ProductSitemap(Sitemap):
     priority = 0.9
 
     def items(self):
-        return Product.objects.filter(is_active=True, stock__gt=0)
+        # صفحه محصول ناموجود هم قابل ایندکس است؛ فایل‌ها با sitemap_files.py ساخته می‌شوند
+        return Product.objects.filter(is_active=True).only('slug', 'updated_at').order_by('pk')
 
     def lastmod(self, obj):
         return obj.updated_at
@@ -7,6 +7,8 @@ import requests
 from django.conf import settings
 from typing import List, Optional, Dict, Any
 
+from apps.core.http_client import get_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -111,11 +113,10 @@ class MsgWayService:
                 'Content-Type': 'application/json',
             }
             
-            response = requests.post(
+            response = get_client('msgway').post(
                 cls.BASE_URL,
                 headers=headers,
                 data=json.dumps(body),
-                timeout=10
             )
             
             result = response.json()
@@ -145,17 +146,34 @@ class MsgWayService:
                     'data': result,
                 }
                 
+        except requests.ConnectTimeout:
+            logger.error(f"Timeout اتصال در ارسال پیامک به {receptor}")
+            return {
+                'success': False,
+                'message': 'خطای Timeout در اتصال به سرویس پیامک',
+                'retryable': True,
+            }
         except requests.Timeout:
-            logger.error(f"Timeout در ارسال پیامک به {receptor}")
+            # درخواست ممکن است به MsgWay رسیده و پیامک ارسال شده باشد؛ تکرار نمی‌شود
+            logger.error(f"Timeout خواندن پاسخ در ارسال پیامک به {receptor} (وضعیت نامعلوم)")
+            return {
+                'success': False,
+                'message': 'پاسخی از سرویس پیامک دریافت نشد (وضعیت ارسال نامعلوم)',
+                'delivery_unknown': True,
+            }
+        except requests.ConnectionError as e:
+            # شامل circuit باز (CircuitOpenError)
+            logger.error(f"خطای اتصال در ارسال پیامک به {receptor}: {e}")
             return {
                 'success': False,
-                'message': 'خطای Timeout در اتصال به سرویس پیامک'
+                'message': f'خطای شبکه: {str(e)}',
+                'retryable': True,
             }
         except requests.RequestException as e:
             logger.error(f"خطای شبکه در ارسال پیامک به {receptor}: {e}")
             return {
                 'success': False,
-                'message': f'خطای شبکه: {str(e)}'
+                'message': f'خطای شبکه: {str(e)}',
             }
         except (ValueError, json.JSONDecodeError) as e:
             logger.error(f"خطا در پردازش پاسخ از MsgWay: {e}")
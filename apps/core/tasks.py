@@ -0,0 +1,21 @@
+"""
+Celery tasks برای core
+"""
+import logging
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def update_sitemaps(full=False):
+    """
+    بروزرسانی افزایشی فایل‌های sitemap (هر ۳۰ دقیقه) یا ساخت کامل (هر شب)
+    """
+    from .sitemap_files import generate_sitemaps
+
+    result = generate_sitemaps(full=full)
+    if result is None:
+        return 'Sitemap generation already running'
+    logger.info(f"Sitemaps: {len(result['written'])} file(s) written")
+    return f"Sitemaps: {len(result['written'])} file(s) written"
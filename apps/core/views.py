@@ -5,15 +5,15 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.views import View
 from django.views.generic import TemplateView, DetailView
 from django.contrib import messages
-from django.core.cache import cache
-from django.db.models import Count, Q
+from django.db.models import Q
 from django.http import Http404
 from urllib.parse import unquote, quote
 import logging
 
-from .models import Slider, Banner, Page, ContactMessage, FAQ
+from .models import Page, ContactMessage, FAQ
 from .forms import ContactForm
-from apps.catalog.models import Category, Product, Brand
+from .home_cache import get_home_sections
+from apps.catalog.models import Product
 
 logger = logging.getLogger(__name__)
 
@@ -24,60 +24,9 @@ class HomeView(View):
     template_name = 'core/home.html'
     
     def get(self, request):
-        # اسلایدر
-        sliders = Slider.objects.filter(is_active=True)
-        
-        # بنرها
-        banners_top = Banner.objects.filter(is_active=True, position='home_top')
-        banners_middle = Banner.objects.filter(is_active=True, position='home_middle')
-        
-        # دسته‌بندی‌های اصلی
-        categories = Category.objects.filter(
-            is_active=True,
-            level=0
-        ).prefetch_related('children')[:8]
-        
-        # محصولات جدید
-        new_products = Product.objects.filter(
-            is_active=True
-        ).select_related(
-            'category', 'brand'
-        ).prefetch_related('images').order_by('-created_at')[:12]
-        
-        # محصولات پرفروش
-        popular_products = Product.objects.filter(
-            is_active=True
-        ).select_related(
-            'category', 'brand'
-        ).prefetch_related('images').order_by('-sales_count')[:8]
-        
-        # محصولات تخفیف‌دار
-        sale_products = Product.objects.filter(
-            is_active=True,
-            compare_at_price__isnull=False
-        ).exclude(
-            compare_at_price=0
-        ).select_related(
-            'category', 'brand'
-        ).prefetch_related('images')[:8]
-        
-        # برندهای محبوب
-        brands = Brand.objects.filter(
-            is_active=True
-        ).annotate(
-            product_count=Count('products')
-        ).filter(product_count__gt=0).order_by('-product_count')[:12]
-        
-        context = {
-            'sliders': sliders,
-            'banners_top': banners_top,
-            'banners_middle': banners_middle,
-            'categories': categories,
-            'new_products': new_products,
-            'popular_products': popular_products,
-            'sale_products': sale_products,
-            'brands': brands,
-        }
+        # اسلایدر، بنرها، دسته‌ها، محصولات جدید/پرفروش/تخفیف‌دار و برندها
+        # از کش نسخه‌دار خوانده می‌شوند (core/home_cache.py)
+        context = get_home_sections()
         
         return render(request, self.template_name, context)
 
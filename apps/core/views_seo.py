@@ -1,8 +1,56 @@
+import logging
+
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render
 from django.views.decorators.cache import cache_page
 
+logger = logging.getLogger(__name__)
+
+SITEMAP_RETRY_AFTER = 60 * 10
+SITEMAP_QUEUED_CACHE_KEY = 'core:sitemaps_queued'
+
 
 @cache_page(60 * 60 * 24)  # Cache for 24 hours
 def robots_txt(request):
     """Serve robots.txt with dynamic sitemap URL"""
     return render(request, 'robots.txt', content_type='text/plain')
+
+
+def sitemap_index(request):
+    """
+    فهرست sitemap تولیدشده. در نبود فایل، ساخت کامل در صف Celery قرار
+    می‌گیرد و خزنده پاسخ 503 با Retry-After می‌گیرد (ساخت داخل درخواست نه).
+    """
+    from .sitemap_files import INDEX_NAME, sitemap_file
+    
+    path = sitemap_file(INDEX_NAME)
+    if path is None:
+        _queue_sitemap_build()
+        response = HttpResponse('Sitemap is being generated', status=503, content_type='text/plain')
+        response['Retry-After'] = str(SITEMAP_RETRY_AFTER)
+        return response
+    return FileResponse(open(path, 'rb'), content_type='application/xml')
+
+
+def _queue_sitemap_build():
+    """قرار دادن ساخت کامل sitemap در صف (حداکثر یک بار در هر بازه Retry-After)"""
+    from .tasks import update_sitemaps
+    
+    if not cache.add(SITEMAP_QUEUED_CACHE_KEY, 1, SITEMAP_RETRY_AFTER):
+        return
+    try:
+        update_sitemaps.delay(full=True)
+    except Exception as e:
+        cache.delete(SITEMAP_QUEUED_CACHE_KEY)
+        logger.error(f"خطا در قرار دادن ساخت sitemap در صف: {e}")
+
+
+def sitemap_shard(request, name):
+    """یکی از فایل‌های فشرده sitemap"""
+    from .sitemap_files import sitemap_file
+    
+    path = sitemap_file(name)
+    if path is None:
+        raise Http404
+    return FileResponse(open(path, 'rb'), content_type='application/x-gzip')
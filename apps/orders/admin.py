@@ -49,14 +49,14 @@ class OrderAdmin(admin.ModelAdmin):
     raw_id_fields = ['user']
     inlines = [OrderItemInline, PaymentInline]
     readonly_fields = [
-        'order_number', 'user', 'subtotal', 'shipping_cost',
+        'order_number', 'user', 'stock_status', 'subtotal', 'shipping_cost',
         'discount_amount', 'coupon_code', 'total',
         'created_at_jalali_display', 'updated_at_jalali_display', 'paid_at_jalali_display'
     ]
     
     fieldsets = (
         ('اطلاعات سفارش', {
-            'fields': ('order_number', 'user', 'status')
+            'fields': ('order_number', 'user', 'status', 'stock_status')
         }),
         ('آدرس', {
             'fields': (
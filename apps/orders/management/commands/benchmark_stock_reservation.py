@@ -0,0 +1,105 @@
+"""
+بنچمارک رزرو موجودی هم‌زمان (عدم فروش بیش از موجودی)
+
+چند thread هم‌زمان برای یک محصول موقت موجودی رزرو می‌کنند (مشابه
+callbackهای پرداخت موازی). در پایان تعداد رزروهای موفق نباید از
+موجودی اولیه بیشتر باشد. محصول و دسته موقت در پایان حذف می‌شوند.
+
+استفاده (روی MySQL/PostgreSQL؛ SQLite قفل سطری ندارد):
+    python manage.py benchmark_stock_reservation --stock 50 --workers 16 --attempts 400
+"""
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from apps.catalog.models import Category, Product
+from apps.orders.stock import InsufficientStock, reserve_stock
+
+
+class Command(BaseCommand):
+    help = 'بررسی عدم فروش بیش از موجودی با رزروهای هم‌زمان'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=50, help='موجودی اولیه محصول')
+        parser.add_argument('--workers', type=int, default=16, help='تعداد threadهای هم‌زمان')
+        parser.add_argument('--attempts', type=int, default=400, help='تعداد کل درخواست‌های رزرو')
+        parser.add_argument('--quantity', type=int, default=1, help='تعداد هر رزرو')
+
+    def handle(self, *args, **options):
+        stock = options['stock']
+        workers = max(1, options['workers'])
+        attempts = max(1, options['attempts'])
+        quantity = max(1, options['quantity'])
+
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite قفل سطری ندارد؛ نتیجه فقط روی MySQL/PostgreSQL معنادار است'
+            ))
+
+        token = uuid.uuid4().hex[:8]
+        category = Category.objects.create(name=f'benchmark-{token}', slug=f'benchmark-{token}')
+        product = Product.objects.create(
+            name=f'benchmark-{token}',
+            slug=f'benchmark-{token}',
+            sku=f'BENCH-{token}',
+            category=category,
+            price=1000,
+            stock_quantity=stock,
+            is_active=False,
+        )
+
+        counts = {'reserved': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+        remaining = [attempts]
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                    try:
+                        with transaction.atomic():
+                            reserve_stock({product.pk: quantity})
+                        outcome = 'reserved'
+                    except InsufficientStock:
+                        outcome = 'rejected'
+                    except Exception:
+                        outcome = 'errors'
+                    with lock:
+                        counts[outcome] += 1
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            threads = [threading.Thread(target=worker) for _ in range(workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            product.refresh_from_db()
+            sold = counts['reserved'] * quantity
+            oversold = sold - stock
+
+            self.stdout.write(
+                f"درخواست‌ها: {attempts} | thread: {workers} | زمان: {elapsed:.2f}s "
+                f"({attempts / elapsed:.0f} req/s)"
+            )
+            self.stdout.write(
+                f"موفق: {counts['reserved']} | رد شده: {counts['rejected']} | "
+                f"خطا: {counts['errors']} | موجودی نهایی: {product.stock_quantity} | "
+                f"موجود: {product.is_in_stock}"
+            )
+            if oversold > 0 or product.stock_quantity != stock - sold:
+                raise CommandError(f'فروش بیش از موجودی: {oversold}')
+            self.stdout.write(self.style.SUCCESS('بدون فروش بیش از موجودی'))
+        finally:
+            Product.objects.filter(pk=product.pk).delete()
+            category.delete()
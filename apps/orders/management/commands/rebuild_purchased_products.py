@@ -0,0 +1,19 @@
+"""
+ساخت مجدد ایندکس محصولات خریداری‌شده کاربران از روی سفارش‌ها
+
+استفاده:
+    python manage.py rebuild_purchased_products
+"""
+from django.core.management.base import BaseCommand
+
+from apps.orders.purchases import rebuild_purchased_products
+
+
+class Command(BaseCommand):
+    help = 'پر کردن/اصلاح جدول UserPurchasedProduct از سفارش‌های پرداخت‌شده'
+
+    def handle(self, *args, **options):
+        added, removed = rebuild_purchased_products()
+        self.stdout.write(self.style.SUCCESS(
+            f'{added} ردیف اضافه و {removed} ردیف حذف شد'
+        ))
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+def mark_committed_orders(apps, schema_editor):
+    """سفارش‌های پرداخت‌شده قبلی موجودی را در callback کسر کرده‌اند"""
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.filter(
+        status__in=['paid', 'processing', 'shipped', 'delivered']
+    ).update(stock_status='committed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_status',
+            field=models.CharField(blank=True, choices=[('', 'بدون رزرو'), ('reserved', 'رزرو شده'), ('committed', 'کسر شده'), ('released', 'آزاد شده')], default='', editable=False, max_length=10, verbose_name='وضعیت موجودی'),
+        ),
+        migrations.RunPython(mark_committed_orders, migrations.RunPython.noop),
+    ]
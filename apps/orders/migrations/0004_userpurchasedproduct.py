@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+PURCHASED_STATUSES = ('paid', 'processing', 'shipped', 'delivered')
+
+
+def populate_purchased_products(apps, schema_editor):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    UserPurchasedProduct = apps.get_model('orders', 'UserPurchasedProduct')
+
+    pairs = {}
+    rows = OrderItem.objects.filter(order__status__in=PURCHASED_STATUSES).values_list(
+        'order__user_id', 'product_id', 'order_id'
+    ).order_by('order_id').iterator(chunk_size=5000)
+    for user_id, product_id, order_id in rows:
+        pairs.setdefault((user_id, product_id), order_id)
+    UserPurchasedProduct.objects.bulk_create(
+        [
+            UserPurchasedProduct(user_id=user_id, product_id=product_id, first_order_id=order_id)
+            for (user_id, product_id), order_id in pairs.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0007_product_rating_aggregates'),
+        ('orders', '0003_order_status_created_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserPurchasedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ثبت')),
+                ('first_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='orders.order', verbose_name='اولین سفارش')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.product', verbose_name='محصول')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchased_products', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'محصول خریداری‌شده',
+                'verbose_name_plural': 'محصولات خریداری‌شده',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='userpurchasedproduct',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='orders_user_purchased_product_uniq'),
+        ),
+        migrations.RunPython(populate_purchased_products, migrations.RunPython.noop),
+    ]
@@ -2,13 +2,48 @@
 مدل‌های اپ orders
 سفارش، آیتم سفارش، پرداخت
 """
-from django.db import models
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings
 from django.urls import reverse
 from django.utils import timezone
 import uuid
 
 
+class OrderQuerySet(models.QuerySet):
+    
+    def transition_status(self, new_status, from_status, **fields):
+        """
+        تغییر گروهی وضعیت سفارش‌های این queryset که در وضعیت from_status هستند
+        با یک UPDATE؛ رویداد status_changed برای همه آن‌ها ارسال می‌شود.
+        خروجی: لیست شناسه سفارش‌های تغییرکرده.
+        """
+        from .signals import status_changed
+        
+        order_ids = list(self.filter(status=from_status).values_list('pk', flat=True))
+        if not order_ids:
+            return []
+        
+        updated_ids = order_ids
+        count = self.model.objects.filter(pk__in=order_ids, status=from_status).update(
+            status=new_status, updated_at=timezone.now(), **fields
+        )
+        if count != len(order_ids):
+            # بخشی از سفارش‌ها هم‌زمان تغییر کرده‌اند
+            updated_ids = list(self.model.objects.filter(
+                pk__in=order_ids, status=new_status
+            ).values_list('pk', flat=True))
+        
+        status_changed.send(
+            sender=self.model,
+            order_ids=updated_ids,
+            old_status=from_status,
+            new_status=new_status,
+        )
+        return updated_ids
+
+
 class Order(models.Model):
     """سفارش"""
     
@@ -22,6 +57,17 @@ class Order(models.Model):
         ('returned', 'مرجوع شده'),
     ]
     
+    STOCK_NONE = ''
+    STOCK_RESERVED = 'reserved'
+    STOCK_COMMITTED = 'committed'
+    STOCK_RELEASED = 'released'
+    STOCK_STATUS_CHOICES = [
+        (STOCK_NONE, 'بدون رزرو'),
+        (STOCK_RESERVED, 'رزرو شده'),
+        (STOCK_COMMITTED, 'کسر شده'),
+        (STOCK_RELEASED, 'آزاد شده'),
+    ]
+    
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.PROTECT,
@@ -40,6 +86,14 @@ class Order(models.Model):
         default='pending',
         verbose_name='وضعیت'
     )
+    stock_status = models.CharField(
+        max_length=10,
+        choices=STOCK_STATUS_CHOICES,
+        default=STOCK_NONE,
+        blank=True,
+        editable=False,
+        verbose_name='وضعیت موجودی'
+    )
     
     # اطلاعات آدرس (کپی از آدرس انتخابی)
     address_title = models.CharField(max_length=50, verbose_name='عنوان آدرس')
@@ -106,14 +160,150 @@ class Order(models.Model):
         verbose_name = 'سفارش'
         verbose_name_plural = 'سفارشات'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
     
     def __str__(self):
         return f'سفارش {self.order_number}'
     
+    objects = OrderQuerySet.as_manager()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # وضعیت بارگذاری‌شده برای تشخیص تغییر وضعیت بدون کوئری اضافه
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+        return instance
+    
+    def get_loaded_status(self):
+        """وضعیت ذخیره‌شده در دیتابیس (در صورت نبود مقدار بارگذاری‌شده، یک کوئری)"""
+        if self.pk is None:
+            return None
+        if not hasattr(self, '_loaded_status'):
+            self._loaded_status = type(self).objects.filter(
+                pk=self.pk
+            ).values_list('status', flat=True).first()
+        return self._loaded_status
+    
     def save(self, *args, **kwargs):
         if not self.order_number:
             self.order_number = self.generate_order_number()
         super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'status' in update_fields:
+            self._loaded_status = self.status
+    
+    def transition_status(self, new_status, from_statuses=None, **fields):
+        """
+        تغییر وضعیت با UPDATE شرطی روی وضعیت فعلی (بدون save کامل)
+        و ارسال رویداد status_changed. با from_statuses فقط از همین وضعیت‌ها
+        تغییر انجام می‌شود. خروجی: آیا وضعیت تغییر کرد.
+        """
+        from .signals import status_changed
+        
+        old_status = self.get_loaded_status()
+        if old_status == new_status:
+            return False
+        if from_statuses is not None and old_status not in from_statuses:
+            return False
+        
+        now = timezone.now()
+        updated = type(self).objects.filter(pk=self.pk, status=old_status).update(
+            status=new_status, updated_at=now, **fields
+        )
+        if not updated:
+            return False
+        
+        self.status = new_status
+        self.updated_at = now
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self._loaded_status = new_status
+        
+        status_changed.send(
+            sender=type(self),
+            order_ids=[self.pk],
+            old_status=old_status,
+            new_status=new_status,
+        )
+        return True
+    
+    @classmethod
+    def create_from_cart(cls, cart, user, address, shipping=None, note=''):
+        """
+        ایجاد سفارش از سبد خرید در یک تراکنش:
+        یک خواندن قفل‌شده از آیتم‌ها و محصولات، محاسبه یک‌باره مبالغ،
+        درج گروهی آیتم‌ها، رزرو موجودی و افزایش اتمیک شمارنده کد تخفیف.
+        در صورت کمبود موجودی InsufficientStock و هیچ تغییری ذخیره نمی‌شود.
+        """
+        from apps.cart.models import Coupon, CouponUsage
+        from .stock import get_quantities, reserve_stock
+        
+        with transaction.atomic():
+            items = list(
+                cart.items.select_related('product').select_for_update().order_by('pk')
+            )
+            if not items:
+                return None
+            
+            subtotal = sum(
+                (item.product.price * item.quantity for item in items), Decimal('0')
+            )
+            discount_amount = Decimal('0')
+            coupon = cart.coupon
+            if coupon:
+                is_valid, _ = coupon.is_valid(user, subtotal)
+                if is_valid:
+                    discount_amount = coupon.calculate_discount(subtotal)
+                else:
+                    coupon = None
+            shipping_cost = shipping.price if shipping else 0
+            
+            order = cls.objects.create(
+                user=user,
+                address_title=address.title,
+                address_province=address.province,
+                address_city=address.city,
+                address_full=address.address,
+                address_postal_code=address.postal_code,
+                receiver_name=address.receiver_name,
+                receiver_phone=address.receiver_phone,
+                subtotal=subtotal,
+                shipping_cost=shipping_cost,
+                discount_amount=discount_amount,
+                coupon_code=coupon.code if coupon else '',
+                total=subtotal - discount_amount + shipping_cost,
+                shipping_method=shipping.name if shipping else '',
+                note=note,
+                stock_status=cls.STOCK_RESERVED,
+            )
+            
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=item.product,
+                    quantity=item.quantity,
+                    price=item.product.price,
+                    product_name=item.product.name,
+                    product_sku=item.product.sku or '',
+                )
+                for item in items
+            ])
+            reserve_stock(get_quantities(items))
+            
+            # ثبت استفاده از کوپن
+            if coupon:
+                CouponUsage.objects.create(
+                    coupon=coupon,
+                    user=user,
+                    order=order,
+                    discount_amount=discount_amount
+                )
+                Coupon.objects.filter(pk=coupon.pk).update(used_count=F('used_count') + 1)
+        
+        return order
     
     @staticmethod
     def generate_order_number():
@@ -162,17 +352,27 @@ class Order(models.Model):
         return self.created_at + timedelta(hours=2)
     
     def cancel(self):
-        """لغو سفارش و برگرداندن موجودی"""
-        if not self.can_cancel:
-            return False
+        """
+        لغو سفارش و برگرداندن موجودی در یک تراکنش؛ وضعیت روی ردیف قفل‌شده
+        بررسی می‌شود تا callback پرداخت هم‌زمان سفارش پرداخت‌شده را لغو نکند.
+        """
+        from .stock import release_order_stock
         
-        # برگرداندن موجودی
-        for item in self.items.all():
-            item.product.stock_quantity += item.quantity
-            item.product.save()
-        
-        self.status = 'canceled'
-        self.save()
+        with transaction.atomic():
+            locked_status = type(self).objects.select_for_update().filter(
+                pk=self.pk
+            ).values_list('status', flat=True).first()
+            if locked_status is None:
+                return False
+            self.status = self._loaded_status = locked_status
+            if not self.can_cancel:
+                return False
+            
+            if not self.transition_status('canceled', from_statuses=('pending', 'paid')):
+                return False
+            
+            # برگرداندن موجودی فقط پس از لغو موفق
+            release_order_stock(self)
         return True
 
 
@@ -224,6 +424,50 @@ class OrderItem(models.Model):
         super().save(*args, **kwargs)
 
 
+
+class UserPurchasedProduct(models.Model):
+    """
+    محصولات خریداری‌شده هر کاربر (سفارش در وضعیت پرداخت‌شده یا بعد از آن)؛
+    با رویداد status_changed بروز می‌شود (orders/purchases.py) تا بررسی
+    خریدار بودن یک جستجوی ایندکس یکتا باشد.
+    """
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='purchased_products',
+        verbose_name='کاربر'
+    )
+    product = models.ForeignKey(
+        'catalog.Product',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='محصول'
+    )
+    first_order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='اولین سفارش'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ثبت')
+    
+    class Meta:
+        verbose_name = 'محصول خریداری‌شده'
+        verbose_name_plural = 'محصولات خریداری‌شده'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'product'],
+                name='orders_user_purchased_product_uniq',
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.user_id} - {self.product_id}'
+
+
 class PaymentTransaction(models.Model):
     """تراکنش پرداخت"""
     
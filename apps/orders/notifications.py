@@ -0,0 +1,162 @@
+"""
+صف پیامک‌های تغییر وضعیت سفارش
+
+سیگنال سفارش فقط یک اعلان (شناسه سفارش، وضعیت قبلی، وضعیت جدید) را پس از
+commit تراکنش در صف Celery قرار می‌دهد؛ ساخت متن و ارسال در worker انجام
+می‌شود. هر (سفارش، وضعیت) فقط یک بار ارسال می‌شود. داخل
+batch_status_notifications() اعلان‌ها جمع و به‌صورت گروهی ارسال می‌شوند.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# کلید یکتایی هر پیامک (سفارش، وضعیت)
+IDEMPOTENCY_KEY = 'orders:status_sms:{order_id}:{status}'
+IDEMPOTENCY_TIMEOUT = 60 * 60 * 24 * 7
+
+# تعداد اعلان در هر تسک گروهی
+BATCH_SIZE = 50
+
+_batch = threading.local()
+
+
+class SMSDeliveryError(Exception):
+    """خطای موقت ارسال (شبکه/Timeout) که باید دوباره تلاش شود"""
+
+
+def _enqueue(notifications):
+    from .tasks import send_order_status_sms, send_order_status_sms_batch
+
+    # در دسترس نبودن صف نباید درخواست (که تراکنشش commit شده) را خراب کند
+    try:
+        if len(notifications) == 1:
+            send_order_status_sms.delay(*notifications[0])
+            return
+        for start in range(0, len(notifications), BATCH_SIZE):
+            send_order_status_sms_batch.delay(notifications[start:start + BATCH_SIZE])
+    except Exception as e:
+        logger.error(f"خطا در قرار دادن پیامک وضعیت سفارش در صف: {e}")
+
+
+def queue_status_sms(order_id, old_status, new_status):
+    """قرار دادن پیامک تغییر وضعیت در صف پس از commit تراکنش جاری"""
+    notification = [order_id, old_status, new_status]
+    pending = getattr(_batch, 'notifications', None)
+    if pending is not None:
+        pending.append(notification)
+        return
+    transaction.on_commit(lambda: _enqueue([notification]))
+
+
+@contextmanager
+def batch_status_notifications():
+    """
+    جمع کردن پیامک‌های تغییر وضعیت داخل بلوک و ارسال گروهی در پایان
+    (برای تغییر وضعیت تعداد زیادی سفارش)
+    """
+    if getattr(_batch, 'notifications', None) is not None:
+        # بلوک تودرتو: اعلان‌ها به بلوک بیرونی اضافه می‌شوند
+        yield
+        return
+
+    _batch.notifications = []
+    try:
+        yield
+        notifications = _batch.notifications
+    finally:
+        _batch.notifications = None
+    if notifications:
+        transaction.on_commit(lambda: _enqueue(notifications))
+
+
+def _status_display(status):
+    from .models import Order
+
+    return dict(Order.STATUS_CHOICES).get(status, status)
+
+
+def build_status_sms(order):
+    """پارامترهای پیامک: (شماره، نام مشتری، نام محصولات)"""
+    product_names = list(order.items.values_list('product_name', flat=True))
+
+    product_name = '، '.join(product_names[:3])  # حداکثر 3 محصول نمایش داده شود
+    if len(product_names) > 3:
+        product_name += f' و {len(product_names) - 3} محصول دیگر'
+
+    if not product_name:
+        product_name = f'سفارش {order.order_number}'
+
+    customer_name = order.user.get_full_name() or order.user.phone
+    phone = order.receiver_phone or order.user.phone
+    return phone, customer_name, product_name
+
+
+def deliver_status_sms(order_id, old_status, new_status):
+    """
+    ارسال یک پیامک تغییر وضعیت.
+    خروجی: True اگر ارسال شد؛ در خطای موقت SMSDeliveryError.
+    """
+    key = IDEMPOTENCY_KEY.format(order_id=order_id, status=new_status)
+    if not cache.add(key, 'sending', IDEMPOTENCY_TIMEOUT):
+        logger.info(f"پیامک وضعیت {new_status} سفارش {order_id} قبلاً ارسال شده است")
+        return False
+
+    try:
+        return _deliver_status_sms(key, order_id, old_status, new_status)
+    except Exception:
+        # آزاد کردن کلید تا خطای غیرمنتظره پیامک را تا پایان TTL مسدود نکند
+        cache.delete(key)
+        raise
+
+
+def _deliver_status_sms(key, order_id, old_status, new_status):
+    from apps.core.sms import send_order_status_sms
+    from .models import Order
+
+    order = Order.objects.select_related('user').filter(pk=order_id).first()
+    if order is None:
+        return False
+
+    phone, customer_name, product_name = build_status_sms(order)
+    if not phone:
+        logger.warning(f"شماره تلفن برای سفارش {order.order_number} یافت نشد")
+        return False
+
+    old_status_display = _status_display(old_status)
+    new_status_display = _status_display(new_status)
+    logger.info(
+        f"تغییر وضعیت سفارش {order.order_number}: "
+        f"{old_status_display} -> {new_status_display}"
+    )
+
+    result = send_order_status_sms(
+        phone=phone,
+        customer_name=customer_name,
+        product_name=product_name,
+        old_status=old_status_display,
+        new_status=new_status_display
+    )
+
+    if result['success']:
+        cache.set(key, 'sent', IDEMPOTENCY_TIMEOUT)
+        logger.info(f"پیامک تغییر وضعیت به {phone} ارسال شد")
+        return True
+
+    if result.get('delivery_unknown'):
+        # ممکن است ارسال شده باشد؛ کلید نگه داشته می‌شود تا تکرار نشود
+        cache.set(key, 'unknown', IDEMPOTENCY_TIMEOUT)
+        logger.warning(f"وضعیت ارسال پیامک تغییر وضعیت نامعلوم است: {result['message']}")
+        return False
+
+    # آزاد کردن کلید تا تلاش بعدی انجام شود
+    cache.delete(key)
+    if result.get('retryable'):
+        raise SMSDeliveryError(result['message'])
+
+    logger.warning(f"خطا در ارسال پیامک تغییر وضعیت: {result['message']}")
+    return False
@@ -0,0 +1,98 @@
+"""
+ایندکس محصولات خریداری‌شده هر کاربر (UserPurchasedProduct)
+
+به جای join سفارش‌ها و آیتم‌ها برای هر بررسی «خریدار این محصول است؟»،
+یک ردیف (کاربر، محصول) هنگام ورود سفارش به وضعیت پرداخت‌شده ثبت و هنگام
+خروج از آن (لغو، مرجوعی) در صورت نبود سفارش معتبر دیگری حذف می‌شود.
+"""
+from django.db.models import Q
+
+# وضعیت‌هایی که در آن‌ها محصولات سفارش خریداری‌شده حساب می‌شوند
+PURCHASED_STATUSES = ('paid', 'processing', 'shipped', 'delivered')
+
+DELETE_BATCH_SIZE = 500
+
+
+def has_purchased(user_id, product_id) -> bool:
+    """آیا کاربر این محصول را خریده است؟ (یک جستجو روی ایندکس یکتا)"""
+    from .models import UserPurchasedProduct
+
+    if not user_id or not product_id:
+        return False
+    return UserPurchasedProduct.objects.filter(user_id=user_id, product_id=product_id).exists()
+
+
+def _purchases(items) -> dict:
+    """{(کاربر، محصول): اولین سفارش} برای آیتم‌های سفارش‌های پرداخت‌شده"""
+    pairs = {}
+    rows = items.filter(order__status__in=PURCHASED_STATUSES).values_list(
+        'order__user_id', 'product_id', 'order_id'
+    ).order_by('order_id').iterator(chunk_size=5000)
+    for user_id, product_id, order_id in rows:
+        pairs.setdefault((user_id, product_id), order_id)
+    return pairs
+
+
+def _apply(expected: dict, existing: set) -> tuple[int, int]:
+    """ثبت ردیف‌های جدید و حذف ردیف‌های نامعتبر. خروجی: (افزوده، حذف‌شده)"""
+    from .models import UserPurchasedProduct
+
+    UserPurchasedProduct.objects.bulk_create(
+        [
+            UserPurchasedProduct(user_id=user_id, product_id=product_id, first_order_id=order_id)
+            for (user_id, product_id), order_id in expected.items()
+            if (user_id, product_id) not in existing
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    added = len(expected.keys() - existing)
+
+    stale = sorted(existing - expected.keys())
+    for start in range(0, len(stale), DELETE_BATCH_SIZE):
+        condition = Q()
+        for user_id, product_id in stale[start:start + DELETE_BATCH_SIZE]:
+            condition |= Q(user_id=user_id, product_id=product_id)
+        UserPurchasedProduct.objects.filter(condition).delete()
+    return added, len(stale)
+
+
+def sync_order_purchases(order_ids) -> tuple[int, int]:
+    """
+    بروزرسانی ردیف‌های (کاربر، محصول) سفارش‌های داده‌شده پس از تغییر وضعیت.
+    فقط جفت‌های همین سفارش‌ها بررسی می‌شوند.
+    """
+    from .models import OrderItem, UserPurchasedProduct
+
+    candidates = set(
+        OrderItem.objects.filter(order_id__in=order_ids).values_list('order__user_id', 'product_id')
+    )
+    if not candidates:
+        return 0, 0
+    user_ids = {user_id for user_id, _ in candidates}
+    product_ids = {product_id for _, product_id in candidates}
+
+    expected = {
+        pair: order_id
+        for pair, order_id in _purchases(
+            OrderItem.objects.filter(order__user_id__in=user_ids, product_id__in=product_ids)
+        ).items()
+        if pair in candidates
+    }
+    existing = {
+        pair
+        for pair in UserPurchasedProduct.objects.filter(
+            user_id__in=user_ids, product_id__in=product_ids
+        ).values_list('user_id', 'product_id')
+        if pair in candidates
+    }
+    return _apply(expected, existing)
+
+
+def rebuild_purchased_products() -> tuple[int, int]:
+    """ساخت کامل ایندکس از روی همه سفارش‌ها. خروجی: (افزوده، حذف‌شده)"""
+    from .models import OrderItem, UserPurchasedProduct
+
+    expected = _purchases(OrderItem.objects.all())
+    existing = set(UserPurchasedProduct.objects.values_list('user_id', 'product_id'))
+    return _apply(expected, existing)
@@ -2,90 +2,93 @@
 سیگنال‌های مربوط به سفارشات
 """
 import logging
+from django.db import transaction
 from django.db.models.signals import pre_save, post_save
-from django.dispatch import receiver
+from django.dispatch import Signal, receiver
 
 logger = logging.getLogger(__name__)
 
 
+# رویداد تغییر وضعیت سفارش (از save یا transition_status)
+# آرگومان‌ها: order_ids, old_status, new_status
+status_changed = Signal()
+
+
 @receiver(pre_save, sender='orders.Order')
 def order_status_changing(sender, instance, **kwargs):
     """
     ذخیره وضعیت قبلی سفارش قبل از تغییر
+    وضعیت قبلی همان مقدار بارگذاری‌شده در from_db است و کوئری اضافه‌ای اجرا نمی‌شود
     """
-    if instance.pk:
-        try:
-            old_instance = sender.objects.get(pk=instance.pk)
-            instance._old_status = old_instance.status
-            instance._old_status_display = old_instance.get_status_display()
-        except sender.DoesNotExist:
-            instance._old_status = None
-            instance._old_status_display = None
-    else:
-        instance._old_status = None
-        instance._old_status_display = None
+    instance._old_status = instance.get_loaded_status()
 
 
 @receiver(post_save, sender='orders.Order')
 def order_status_changed(sender, instance, created, **kwargs):
     """
-    ارسال پیامک هنگام تغییر وضعیت سفارش
+    ارسال رویداد تغییر وضعیت پس از save
     """
-    # اگر سفارش جدید است، پیامکی ارسال نمی‌شود
+    # اگر سفارش جدید است، رویدادی ارسال نمی‌شود
     if created:
         return
     
     old_status = getattr(instance, '_old_status', None)
     
-    # اگر وضعیت تغییر نکرده، پیامکی ارسال نمی‌شود
+    # اگر وضعیت تغییر نکرده، رویدادی ارسال نمی‌شود
     if old_status is None or old_status == instance.status:
         return
     
-    old_status_display = getattr(instance, '_old_status_display', old_status)
-    new_status_display = instance.get_status_display()
-    
-    # دریافت نام محصولات سفارش
-    product_names = []
-    for item in instance.items.all():
-        if item.product:
-            product_names.append(item.product.name)
-    
-    product_name = '، '.join(product_names[:3])  # حداکثر 3 محصول نمایش داده شود
-    if len(product_names) > 3:
-        product_name += f' و {len(product_names) - 3} محصول دیگر'
-    
-    if not product_name:
-        product_name = f'سفارش {instance.order_number}'
+    status_changed.send(
+        sender=sender,
+        order_ids=[instance.pk],
+        old_status=old_status,
+        new_status=instance.status,
+    )
+
+
+@receiver(status_changed)
+def queue_status_change_sms(sender, order_ids, old_status, new_status, **kwargs):
+    """
+    ارسال پیامک هنگام تغییر وضعیت سفارش
+    پیامک پس از commit تراکنش در صف Celery قرار می‌گیرد و درخواست را معطل نمی‌کند
+    """
+    from .notifications import batch_status_notifications, queue_status_sms
     
-    # دریافت اطلاعات کاربر
-    customer_name = instance.user.get_full_name() or instance.user.phone
-    phone = instance.receiver_phone or instance.user.phone
+    with batch_status_notifications():
+        for order_id in order_ids:
+            queue_status_sms(order_id, old_status, new_status)
+
+
+@receiver(status_changed)
+def sync_purchased_products(sender, order_ids, old_status, new_status, **kwargs):
+    """
+    بروزرسانی محصولات خریداری‌شده کاربران هنگام ورود سفارش به وضعیت
+    پرداخت‌شده یا خروج از آن (پس از commit تراکنش)
+    """
+    from .purchases import PURCHASED_STATUSES, sync_order_purchases
     
-    if not phone:
-        logger.warning(f"شماره تلفن برای سفارش {instance.order_number} یافت نشد")
+    if (old_status in PURCHASED_STATUSES) == (new_status in PURCHASED_STATUSES):
         return
+    order_ids = list(order_ids)
+    transaction.on_commit(lambda: sync_order_purchases(order_ids))
+
+
+@receiver(status_changed)
+def release_reserved_stock(sender, order_ids, old_status, new_status, **kwargs):
+    """
+    آزاد کردن موجودی رزروشده سفارش‌هایی که لغو یا مرجوع می‌شوند؛ تغییر
+    وضعیت از پنل مدیریت (Order.save) هم موجودی را در رزرو نگه نمی‌دارد
+    """
+    from .models import Order
+    from .stock import release_orders_stock
     
-    logger.info(
-        f"تغییر وضعیت سفارش {instance.order_number}: "
-        f"{old_status_display} -> {new_status_display}"
-    )
-    
-    # ارسال پیامک
-    try:
-        from apps.core.sms import send_order_status_sms
-        
-        result = send_order_status_sms(
-            phone=phone,
-            customer_name=customer_name,
-            product_name=product_name,
-            old_status=old_status_display,
-            new_status=new_status_display
+    if new_status not in ('canceled', 'returned'):
+        return
+    with transaction.atomic():
+        reserved_ids = list(
+            Order.objects.select_for_update().filter(
+                pk__in=list(order_ids), stock_status=Order.STOCK_RESERVED
+            ).values_list('pk', flat=True)
         )
-        
-        if result['success']:
-            logger.info(f"پیامک تغییر وضعیت به {phone} ارسال شد")
-        else:
-            logger.warning(f"خطا در ارسال پیامک تغییر وضعیت: {result['message']}")
-            
-    except Exception as e:
-        logger.error(f"خطا در ارسال پیامک تغییر وضعیت: {e}")
+        if reserved_ids:
+            release_orders_stock(reserved_ids)
@@ -0,0 +1,191 @@
+"""
+رزرو موجودی سفارش‌ها
+
+موجودی هنگام ثبت سفارش رزرو (کسر) می‌شود، با پرداخت قطعی و با لغو یا
+انقضای سفارش آزاد می‌شود. کسر موجودی همه محصولات یک سفارش با یک UPDATE
+شرطی (stock_quantity >= تعداد) انجام می‌شود؛ پس پرداخت‌ها/سفارش‌های
+هم‌زمان نمی‌توانند بیش از موجودی بفروشند.
+"""
+import logging
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    """موجودی یک یا چند محصول کافی نیست"""
+
+    def __init__(self, product_names):
+        self.product_names = list(product_names)
+        super().__init__('، '.join(self.product_names))
+
+
+def get_quantities(items) -> dict:
+    """{شناسه محصول: تعداد} از آیتم‌های سبد یا سفارش"""
+    quantities = Counter()
+    for item in items:
+        quantities[item.product_id] += item.quantity
+    return dict(quantities)
+
+
+def order_quantities(order) -> dict:
+    quantities = Counter()
+    for product_id, quantity in order.items.values_list('product_id', 'quantity'):
+        quantities[product_id] += quantity
+    return dict(quantities)
+
+
+def _per_product(quantities: dict):
+    return Case(
+        *[When(pk=pk, then=Value(qty)) for pk, qty in quantities.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _sync_in_stock(product_ids):
+    """هماهنگ کردن is_in_stock با stock_quantity (مشابه Product.save)"""
+    from apps.catalog.models import Product
+
+    Product.objects.filter(pk__in=product_ids).update(
+        is_in_stock=Case(
+            When(stock_quantity__gt=0, then=Value(True)),
+            default=Value(False),
+        )
+    )
+
+
+def reserve_stock(quantities: dict):
+    """
+    کسر موجودی همه محصولات با یک UPDATE شرطی؛ یا همه کسر می‌شوند یا هیچ‌کدام.
+    در صورت کمبود InsufficientStock با نام محصولات کم‌موجود.
+    """
+    from apps.catalog.models import Product
+
+    if not quantities:
+        return
+
+    qty = _per_product(quantities)
+    with transaction.atomic():
+        try:
+            # savepoint: در صورت کمبود، کسر محصولات دارای موجودی هم برگردانده
+            # می‌شود تا نام کم‌موجودها روی مقادیر قبلی پیدا شود
+            with transaction.atomic():
+                updated = Product.objects.filter(
+                    pk__in=quantities,
+                    stock_quantity__gte=qty,
+                ).update(stock_quantity=F('stock_quantity') - qty)
+                if updated != len(quantities):
+                    raise InsufficientStock([])
+        except InsufficientStock:
+            short = list(Product.objects.filter(
+                pk__in=quantities,
+                stock_quantity__lt=qty,
+            ).values_list('name', flat=True))
+            raise InsufficientStock(short or ['محصول حذف شده'])
+
+        _sync_in_stock(quantities)
+
+
+def restore_stock(quantities: dict):
+    """برگرداندن موجودی با یک UPDATE"""
+    from apps.catalog.models import Product
+
+    if not quantities:
+        return
+
+    qty = _per_product(quantities)
+    Product.objects.filter(pk__in=quantities).update(
+        stock_quantity=F('stock_quantity') + qty
+    )
+    _sync_in_stock(quantities)
+
+
+def _lock_stock_status(order):
+    from .models import Order
+
+    return Order.objects.select_for_update().filter(
+        pk=order.pk
+    ).values_list('stock_status', flat=True).first()
+
+
+def _set_stock_status(order, stock_status):
+    from .models import Order
+
+    Order.objects.filter(pk=order.pk).update(stock_status=stock_status)
+    order.stock_status = stock_status
+
+
+def commit_order_stock(order):
+    """
+    قطعی کردن موجودی سفارش پرداخت‌شده و افزایش تعداد فروش.
+    سفارش‌های بدون رزرو (قدیمی یا منقضی‌شده) همین‌جا کسر می‌شوند.
+    خروجی: False اگر قبلاً قطعی شده یا موجودی کافی نبوده است.
+    """
+    from apps.catalog.models import Product
+    from .models import Order
+
+    with transaction.atomic():
+        stock_status = _lock_stock_status(order)
+        if stock_status is None or stock_status == Order.STOCK_COMMITTED:
+            return False
+
+        quantities = order_quantities(order)
+        if stock_status != Order.STOCK_RESERVED:
+            try:
+                reserve_stock(quantities)
+            except InsufficientStock as exc:
+                logger.error(
+                    f"Paid order {order.order_number} could not reserve stock for: {exc}"
+                )
+                return False
+
+        if quantities:
+            Product.objects.filter(pk__in=quantities).update(
+                sales_count=F('sales_count') + _per_product(quantities)
+            )
+        _set_stock_status(order, Order.STOCK_COMMITTED)
+    return True
+
+
+def release_order_stock(order):
+    """
+    آزاد کردن موجودی رزرو یا کسرشده سفارش (لغو/انقضا).
+    خروجی: False اگر موجودی‌ای برای آزاد کردن نبوده است.
+    """
+    from .models import Order
+
+    with transaction.atomic():
+        stock_status = _lock_stock_status(order)
+        if stock_status not in (Order.STOCK_RESERVED, Order.STOCK_COMMITTED):
+            return False
+        restore_stock(order_quantities(order))
+        _set_stock_status(order, Order.STOCK_RELEASED)
+    return True
+
+
+def release_orders_stock(order_ids) -> int:
+    """
+    آزاد کردن گروهی موجودی رزروشده چند سفارش: یک کوئری تجمیعی برای
+    تعداد هر محصول و یک UPDATE برای موجودی. خروجی: تعداد سفارش‌ها.
+    فراخوانی باید داخل تراکنشی باشد که سفارش‌ها را قفل کرده است.
+    """
+    from .models import Order, OrderItem
+
+    quantities = dict(
+        OrderItem.objects.filter(
+            order_id__in=order_ids,
+            order__stock_status=Order.STOCK_RESERVED,
+        )
+        .order_by()
+        .values('product_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+    restore_stock(quantities)
+    return Order.objects.filter(
+        pk__in=order_ids, stock_status=Order.STOCK_RESERVED
+    ).update(stock_status=Order.STOCK_RELEASED)
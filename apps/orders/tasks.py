@@ -6,34 +6,94 @@ from datetime import timedelta
 from celery import shared_task
 from django.utils import timezone
 
+from .notifications import SMSDeliveryError, deliver_status_sms
+
 logger = logging.getLogger(__name__)
 
+# تعداد سفارش منقضی در هر تراکنش
+EXPIRY_CHUNK_SIZE = 500
+
 
 @shared_task
 def cancel_expired_orders():
     """
-    لغو سفارش‌های پرداخت نشده بعد از ۲ ساعت
+    لغو سفارش‌های پرداخت نشده بعد از ۲ ساعت و آزاد کردن موجودی رزروشده
     این تسک هر ۱۵ دقیقه اجرا می‌شود
+    
+    پردازش به‌صورت دسته‌ای (EXPIRY_CHUNK_SIZE سفارش در هر تراکنش) و با تعداد
+    ثابتی کوئری برای هر دسته انجام می‌شود؛ پیامک‌ها گروهی در صف قرار می‌گیرند.
     """
+    from django.db import transaction
     from .models import Order
+    from .notifications import batch_status_notifications
+    from .stock import release_orders_stock
     
     # سفارش‌هایی که بیش از ۲ ساعت از ایجادشان گذشته و هنوز pending هستند
     expiry_time = timezone.now() - timedelta(hours=2)
     
-    expired_orders = Order.objects.filter(
-        status='pending',
-        created_at__lt=expiry_time
-    )
-    
     canceled_count = 0
-    for order in expired_orders:
-        order.status = 'canceled'
-        order.admin_note = 'لغو خودکار به دلیل عدم پرداخت در زمان مقرر'
-        order.save()
-        canceled_count += 1
-        logger.info(f"Order {order.order_number} automatically canceled due to payment timeout")
+    with batch_status_notifications():
+        while True:
+            with transaction.atomic():
+                # قفل دسته تا callback پرداخت هم‌زمان سفارش را تغییر ندهد
+                order_ids = list(
+                    Order.objects.select_for_update().filter(
+                        status='pending',
+                        created_at__lt=expiry_time
+                    ).order_by('created_at', 'pk').values_list('pk', flat=True)[:EXPIRY_CHUNK_SIZE]
+                )
+                if not order_ids:
+                    break
+                
+                release_orders_stock(order_ids)
+                updated = len(Order.objects.filter(pk__in=order_ids).transition_status(
+                    'canceled',
+                    from_status='pending',
+                    admin_note='لغو خودکار به دلیل عدم پرداخت در زمان مقرر',
+                ))
+            
+            canceled_count += updated
+            logger.info(f"Canceled {updated} expired orders (chunk of {len(order_ids)})")
+            if not updated:
+                break
     
     if canceled_count > 0:
         logger.info(f"Canceled {canceled_count} expired orders")
     
     return f"Canceled {canceled_count} expired orders"
+
+
+@shared_task(
+    autoretry_for=(SMSDeliveryError,),
+    retry_backoff=30,
+    retry_backoff_max=60 * 60,
+    retry_jitter=True,
+    max_retries=6,
+)
+def send_order_status_sms(order_id, old_status, new_status):
+    """
+    ارسال پیامک تغییر وضعیت سفارش
+    در خطای شبکه با فاصله افزایشی دوباره تلاش می‌شود
+    """
+    return deliver_status_sms(order_id, old_status, new_status)
+
+
+@shared_task
+def send_order_status_sms_batch(notifications):
+    """
+    ارسال گروهی پیامک‌های تغییر وضعیت [(سفارش، وضعیت قبلی، وضعیت جدید)]
+    موارد ناموفق موقت به تسک تکی (با تلاش مجدد) سپرده می‌شوند
+    """
+    sent = 0
+    for order_id, old_status, new_status in notifications:
+        try:
+            if deliver_status_sms(order_id, old_status, new_status):
+                sent += 1
+        except SMSDeliveryError:
+            send_order_status_sms.apply_async(
+                (order_id, old_status, new_status), countdown=30
+            )
+        except Exception as e:
+            logger.error(f"خطا در ارسال پیامک وضعیت سفارش {order_id}: {e}")
+    
+    return f"Sent {sent}/{len(notifications)} order status SMS"
@@ -11,9 +11,10 @@ from django.http import HttpResponseBadRequest
 from django.utils import timezone
 from django.db import transaction
 
-from .models import Order, OrderItem, PaymentTransaction, ShippingMethod
-from apps.cart.models import Cart, CouponUsage
+from .models import Order, PaymentTransaction, ShippingMethod
+from apps.cart.models import Cart
 from apps.accounts.models import Address
+from .stock import InsufficientStock, commit_order_stock
 from .zarinpal import ZarinPalService
 
 logger = logging.getLogger(__name__)
@@ -56,7 +57,7 @@ class CheckoutView(LoginRequiredMixin, View):
         return render(request, self.template_name, context)
     
     def post(self, request):
-        cart = Cart.objects.filter(user=request.user).first()
+        cart = Cart.objects.filter(user=request.user).select_related('coupon').first()
         
         if not cart or cart.items_count == 0:
             messages.warning(request, 'سبد خرید شما خالی است')
@@ -96,57 +97,28 @@ class CheckoutView(LoginRequiredMixin, View):
         # دریافت روش ارسال
         shipping_id = request.POST.get('shipping_id')
         shipping = None
-        shipping_cost = 0
-        shipping_method_name = ''
         
         if shipping_id:
             shipping = get_object_or_404(ShippingMethod, pk=shipping_id, is_active=True)
-            shipping_cost = shipping.price
-            shipping_method_name = shipping.name
         
         # یادداشت
         note = request.POST.get('note', '')
         
-        # ایجاد سفارش
-        with transaction.atomic():
-            order = Order.objects.create(
+        # ایجاد سفارش و رزرو موجودی
+        try:
+            order = Order.create_from_cart(
+                cart,
                 user=request.user,
-                address_title=address.title,
-                address_province=address.province,
-                address_city=address.city,
-                address_full=address.address,
-                address_postal_code=address.postal_code,
-                receiver_name=address.receiver_name,
-                receiver_phone=address.receiver_phone,
-                subtotal=cart.subtotal,
-                shipping_cost=shipping_cost,
-                discount_amount=cart.discount_amount,
-                coupon_code=cart.coupon.code if cart.coupon else '',
-                total=cart.total + shipping_cost,
-                shipping_method=shipping_method_name,
+                address=address,
+                shipping=shipping,
                 note=note,
             )
-            
-            # ایجاد آیتم‌های سفارش
-            for item in cart.items.select_related('product').all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    quantity=item.quantity,
-                    price=item.product.price,
-                    product_name=item.product.name,
-                )
-            
-            # ثبت استفاده از کوپن
-            if cart.coupon:
-                CouponUsage.objects.create(
-                    coupon=cart.coupon,
-                    user=request.user,
-                    order=order,
-                    discount_amount=cart.discount_amount
-                )
-                cart.coupon.used_count += 1
-                cart.coupon.save()
+        except InsufficientStock as exc:
+            messages.error(request, f'موجودی این محصولات کافی نیست: {exc}')
+            return redirect('cart:detail')
+        if order is None:
+            messages.warning(request, 'سبد خرید شما خالی است')
+            return redirect('cart:detail')
         
         # ذخیره شناسه سفارش در session
         request.session['pending_order_id'] = order.pk
@@ -249,26 +221,25 @@ class PaymentCallbackView(LoginRequiredMixin, View):
         
         if result['success']:
             with transaction.atomic():
+                # قفل سفارش تا callbackهای هم‌زمان آن را دوباره پردازش نکنند
+                order = Order.objects.select_for_update().get(pk=order.pk)
+                
                 # بروزرسانی تراکنش
                 payment.status = 'success'
                 payment.ref_id = result['ref_id']
                 payment.card_number = result.get('card_pan', '')
                 payment.save()
                 
-                # بروزرسانی سفارش
-                order.status = 'paid'
-                order.paid_at = timezone.now()
-                order.save()
-                
-                # کاهش موجودی
-                for item in order.items.select_related('product').all():
-                    product = item.product
-                    product.stock_quantity -= item.quantity
-                    product.sales_count += item.quantity
-                    product.save()
-                
-                # خالی کردن سبد خرید
-                Cart.objects.filter(user=request.user).delete()
+                # فقط از انتظار پرداخت (یا لغو به دلیل انقضا)؛ callback تکراری
+                # سفارش ارسال‌شده را به پرداخت‌شده برنمی‌گرداند
+                if order.transition_status(
+                    'paid', from_statuses=('pending', 'canceled'), paid_at=timezone.now()
+                ):
+                    # قطعی کردن موجودی رزروشده
+                    commit_order_stock(order)
+                    
+                    # خالی کردن سبد خرید
+                    Cart.objects.filter(user=request.user).delete()
             
             messages.success(request, 'پرداخت با موفقیت انجام شد')
             return redirect('orders:payment_success', pk=order.pk)
@@ -6,6 +6,8 @@ import requests
 from django.conf import settings
 from django.urls import reverse
 
+from apps.core.http_client import get_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -74,7 +76,7 @@ class ZarinPalService:
         logger.info(f"ZarinPal Payment Request - Order: {order.order_number}, Amount: {data['amount']}, Callback: {callback_url}")
         
         try:
-            response = requests.post(urls['request'], json=data, timeout=10)
+            response = get_client('zarinpal').post(urls['request'], json=data)
             logger.info(f"ZarinPal Response Status: {response.status_code}")
             result = response.json()
             logger.info(f"ZarinPal Response: {result}")
@@ -122,7 +124,7 @@ class ZarinPalService:
         logger.info(f"ZarinPal Verify Request - Authority: {authority}, Amount: {data['amount']}")
         
         try:
-            response = requests.post(urls['verify'], json=data, timeout=10)
+            response = get_client('zarinpal').post(urls['verify'], json=data)
             logger.info(f"ZarinPal Verify Response Status: {response.status_code}")
             result = response.json()
             logger.info(f"ZarinPal Verify Response: {result}")
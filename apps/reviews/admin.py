@@ -5,6 +5,7 @@ from django.contrib import admin
 from apps.core.admin_utils import jalali_date
 from config.admin import custom_admin_site
 from .models import Review
+from .ratings import set_reviews_status
 
 
 @admin.register(Review, site=custom_admin_site)
@@ -26,11 +27,11 @@ class ReviewAdmin(admin.ModelAdmin):
     created_at_jalali.admin_order_field = 'created_at'
     
     def approve_reviews(self, request, queryset):
-        queryset.update(status='approved')
-        self.message_user(request, f'{queryset.count()} نظر تایید شد')
+        updated = set_reviews_status(queryset, 'approved')
+        self.message_user(request, f'{updated} نظر تایید شد')
     approve_reviews.short_description = 'تایید نظرات انتخاب شده'
     
     def reject_reviews(self, request, queryset):
-        queryset.update(status='rejected')
-        self.message_user(request, f'{queryset.count()} نظر رد شد')
+        updated = set_reviews_status(queryset, 'rejected')
+        self.message_user(request, f'{updated} نظر رد شد')
     reject_reviews.short_description = 'رد نظرات انتخاب شده'
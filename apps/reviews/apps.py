@@ -5,3 +5,7 @@ class ReviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.reviews'
     verbose_name = 'نظرات'
+
+    def ready(self):
+        """رجیستر کردن سیگنال‌ها"""
+        import apps.reviews.signals  # noqa: F401
@@ -0,0 +1,17 @@
+"""
+محاسبه مجدد خلاصه امتیاز محصولات از نظرات تاییدشده
+
+استفاده:
+    python manage.py rebuild_product_ratings
+"""
+from django.core.management.base import BaseCommand
+
+from apps.reviews.ratings import rebuild_product_ratings
+
+
+class Command(BaseCommand):
+    help = 'محاسبه مجدد rating_avg، rating_count و توزیع امتیاز محصولات با یک کوئری گروهی'
+
+    def handle(self, *args, **options):
+        updated = rebuild_product_ratings()
+        self.stdout.write(self.style.SUCCESS(f'خلاصه امتیاز {updated} محصول بروزرسانی شد'))
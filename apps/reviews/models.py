@@ -68,14 +68,18 @@ class Review(models.Model):
     def __str__(self):
         return f'{self.user.get_full_name()} - {self.product.name}'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # وضعیت شمارش در خلاصه امتیاز محصول هنگام بارگذاری (محصول، امتیاز، وضعیت)
+        if all(name in instance.__dict__ for name in ('product_id', 'rating', 'status')):
+            instance._loaded_rating_state = (instance.product_id, instance.rating, instance.status)
+        return instance
+    
     def save(self, *args, **kwargs):
-        # بررسی خریدار بودن
+        # بررسی خریدار بودن (ایندکس محصولات خریداری‌شده کاربر)
         if not self.pk:
-            from apps.orders.models import Order
-            self.is_buyer = Order.objects.filter(
-                user=self.user,
-                items__product=self.product,
-                status__in=['paid', 'processing', 'shipped', 'delivered']
-            ).exists()
+            from apps.orders.purchases import has_purchased
+            self.is_buyer = has_purchased(self.user_id, self.product_id)
         
         super().save(*args, **kwargs)
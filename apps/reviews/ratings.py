@@ -0,0 +1,96 @@
+"""
+خلاصه امتیاز ذخیره‌شده محصولات (میانگین، تعداد و توزیع ۱ تا ۵)
+
+به جای Avg/Count روی نظرات برای هر محصول در لیست‌ها، فیلدهای
+Product.rating_1..rating_5 و rating_count با سیگنال‌های Review به‌صورت
+افزایشی (UPDATE با F) بروز می‌شوند و rating_avg از روی همین توزیع محاسبه
+می‌شود. فقط نظرات تاییدشده شمرده می‌شوند.
+"""
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Value
+from django.db.models.functions import Cast, Greatest, Round
+
+RATING_VALUES = (1, 2, 3, 4, 5)
+COUNTED_STATUS = 'approved'
+
+
+def _average_expression():
+    total = sum(F(f'rating_{value}') * value for value in RATING_VALUES)
+    return Round(
+        Cast(total, FloatField()) / Greatest(F('rating_count'), Value(1)),
+        2,
+    )
+
+
+def adjust_product_rating(product_id, rating, delta: int):
+    """افزودن delta به توزیع امتیاز یک محصول و محاسبه مجدد میانگین."""
+    from apps.catalog.models import Product
+
+    if not product_id or rating not in RATING_VALUES or not delta:
+        return
+    products = Product.objects.filter(pk=product_id)
+    with transaction.atomic():
+        # دو UPDATE جدا: MySQL در یک UPDATE مقدار تازه ستون‌ها را در عبارت‌های بعدی می‌بیند
+        products.update(**{
+            f'rating_{rating}': Greatest(F(f'rating_{rating}') + delta, Value(0)),
+            'rating_count': Greatest(F('rating_count') + delta, Value(0)),
+        })
+        products.update(rating_avg=_average_expression())
+
+
+def rebuild_product_ratings(product_ids=None) -> int:
+    """
+    محاسبه مجدد خلاصه امتیاز با یک کوئری گروهی روی نظرات تاییدشده؛ فقط
+    محصولات تغییرکرده ذخیره می‌شوند. خروجی: تعداد محصولات بروزشده.
+    """
+    from apps.catalog.models import Product
+    from .models import Review
+
+    reviews = Review.objects.filter(status=COUNTED_STATUS)
+    products = Product.objects.all()
+    if product_ids is not None:
+        reviews = reviews.filter(product_id__in=product_ids)
+        products = products.filter(pk__in=product_ids)
+
+    histograms = {}
+    rows = reviews.order_by().values('product_id', 'rating').annotate(n=Count('pk'))
+    for product_id, rating, n in rows.values_list('product_id', 'rating', 'n'):
+        if rating in RATING_VALUES:
+            histograms.setdefault(product_id, dict.fromkeys(RATING_VALUES, 0))[rating] = n
+
+    fields = [f'rating_{value}' for value in RATING_VALUES]
+    changed = []
+    empty = dict.fromkeys(RATING_VALUES, 0)
+    rows = products.values_list('pk', 'rating_count', *fields).iterator(chunk_size=2000)
+    for pk, count, *current in rows:
+        histogram = histograms.get(pk, empty)
+        expected = [histogram[value] for value in RATING_VALUES]
+        if expected == current and count == sum(expected):
+            continue
+        product = Product(pk=pk, rating_count=sum(histogram.values()))
+        for value in RATING_VALUES:
+            setattr(product, f'rating_{value}', histogram[value])
+        product.rating_avg = product.compute_rating_avg()
+        changed.append(product)
+
+    Product.objects.bulk_update(
+        changed, fields + ['rating_count', 'rating_avg'], batch_size=500
+    )
+    return len(changed)
+
+
+def set_reviews_status(queryset, status: str) -> int:
+    """
+    تغییر وضعیت گروهی نظرات (queryset.update سیگنال ندارد)؛ خلاصه امتیاز
+    محصولاتی که نظر تاییدشده‌شان تغییر کرده بازسازی می‌شود.
+    """
+    # نظرهایی که با این تغییر وارد شمارش می‌شوند یا از آن خارج می‌شوند
+    changing = queryset.exclude(status=status)
+    if status != COUNTED_STATUS:
+        changing = changing.filter(status=COUNTED_STATUS)
+    with transaction.atomic():
+        affected = set(changing.values_list('product_id', flat=True))
+        updated = queryset.update(status=status)
+        if affected:
+            rebuild_product_ratings(product_ids=affected)
+    return updated
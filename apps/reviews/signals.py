@@ -0,0 +1,44 @@
+"""
+سیگنال‌های اپ reviews
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .ratings import COUNTED_STATUS, adjust_product_rating, rebuild_product_ratings
+
+
+def _counted(state):
+    """(محصول، امتیاز) اگر نظر در خلاصه امتیاز شمرده می‌شود، وگرنه None"""
+    if state and state[2] == COUNTED_STATUS:
+        return state[0], state[1]
+    return None
+
+
+@receiver(post_save, sender='reviews.Review')
+def review_saved_update_product_rating(sender, instance, created, **kwargs):
+    """بروزرسانی خلاصه امتیاز محصول هنگام ورود/خروج نظر از وضعیت تاییدشده"""
+    new_state = (instance.product_id, instance.rating, instance.status)
+    old_state = None if created else getattr(instance, '_loaded_rating_state', False)
+    instance._loaded_rating_state = new_state
+
+    if old_state is False:
+        # وضعیت قبلی نامشخص است؛ فقط همین محصول از نو محاسبه می‌شود
+        rebuild_product_ratings(product_ids=[instance.product_id])
+        return
+
+    old_counted, new_counted = _counted(old_state), _counted(new_state)
+    if old_counted != new_counted:
+        if old_counted:
+            adjust_product_rating(*old_counted, -1)
+        if new_counted:
+            adjust_product_rating(*new_counted, 1)
+
+
+@receiver(post_delete, sender='reviews.Review')
+def review_deleted_update_product_rating(sender, instance, **kwargs):
+    """کسر نظر تاییدشده حذف‌شده از خلاصه امتیاز محصول"""
+    counted = _counted(getattr(
+        instance, '_loaded_rating_state', (instance.product_id, instance.rating, instance.status)
+    ))
+    if counted:
+        adjust_product_rating(*counted, -1)
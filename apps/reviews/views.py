@@ -6,10 +6,12 @@ from django.views import View
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.http import JsonResponse
+from django.conf import settings
 
 from .models import Review
 from .forms import ReviewForm
 from apps.catalog.models import Product
+from apps.orders.purchases import has_purchased
 
 
 class AddReviewView(LoginRequiredMixin, View):
@@ -31,6 +33,13 @@ class AddReviewView(LoginRequiredMixin, View):
             messages.error(request, message)
             return redirect(product.get_absolute_url())
         
+        if settings.REVIEWS_BUYERS_ONLY and not has_purchased(request.user.pk, product.pk):
+            message = 'فقط خریداران این محصول می‌توانند نظر ثبت کنند'
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return JsonResponse({'success': False, 'message': message})
+            messages.error(request, message)
+            return redirect(product.get_absolute_url())
+        
         form = ReviewForm(request.POST)
         
         if form.is_valid():
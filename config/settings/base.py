@@ -54,6 +54,7 @@ MIDDLEWARE = [
     'apps.core.middleware.UnicodeURLMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'apps.cart.middleware.CartMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'axes.middleware.AxesMiddleware',
@@ -187,6 +188,23 @@ try:
             'task': 'apps.orders.tasks.cancel_expired_orders',
             'schedule': crontab(minute='*/15'),
         },
+        'flush-product-view-counts': {
+            'task': 'apps.catalog.tasks.flush_product_view_counts',
+            'schedule': crontab(minute='*'),
+        },
+        'refresh-related-products': {
+            'task': 'apps.catalog.tasks.refresh_related_products',
+            'schedule': crontab(hour=3, minute=30),
+        },
+        'update-sitemaps': {
+            'task': 'apps.core.tasks.update_sitemaps',
+            'schedule': crontab(minute='*/30'),
+        },
+        'rebuild-sitemaps': {
+            'task': 'apps.core.tasks.update_sitemaps',
+            'schedule': crontab(hour=4, minute=15),
+            'kwargs': {'full': True},
+        },
     }
 except ImportError:
     CELERY_BEAT_SCHEDULE = {}
@@ -198,6 +216,12 @@ CACHES = {
     }
 }
 
+# Outbound HTTP clients (apps/core/http_client.py) - per-service overrides
+HTTP_CLIENTS = {
+    'msgway': {'read_timeout': 10},
+    'zarinpal': {'read_timeout': 10, 'failure_threshold': 10},
+}
+
 # ZarinPal Payment Gateway
 ZARINPAL_MERCHANT_ID = env('ZARINPAL_MERCHANT_ID', default='')
 ZARINPAL_SANDBOX = env('ZARINPAL_SANDBOX', default=True, cast=bool)
@@ -233,8 +257,19 @@ LLM_API_KEY = env('LLM_API_KEY', default='')  # alias
 
 # Pagination
 PRODUCTS_PER_PAGE = 12
+# صفحه‌بندی keyset لیست محصولات (apps/catalog/pagination.py) به جای page/OFFSET
+CATALOG_KEYSET_PAGINATION = env('CATALOG_KEYSET_PAGINATION', default=False, cast=bool)
 ORDERS_PER_PAGE = 10
+# ثبت نظر فقط برای خریداران محصول (apps/orders/purchases.py)
+REVIEWS_BUYERS_ONLY = env('REVIEWS_BUYERS_ONLY', default=False, cast=bool)
 
 # File upload settings
 MAX_UPLOAD_SIZE = 5 * 1024 * 1024  # 5MB
-ALLOWED_UPLOAD_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.pdf']
\ No newline at end of file
+ALLOWED_UPLOAD_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.pdf']
+# Product search index
+SEARCH_INDEX_PATH = BASE_DIR / 'data' / 'search_index.json'
+# تعداد نتایج اول جستجو که بر اساس رتبه مرتب می‌شوند (بقیه پس از آن‌ها)
+SEARCH_RANKED_RESULTS = 500
+# فایل‌های sitemap (apps/core/sitemap_files.py)؛ آدرس پایه پیش‌فرض: دامنه Site جاری
+SITEMAP_ROOT = env('SITEMAP_ROOT', default=str(BASE_DIR / 'data' / 'sitemaps'))
+SITEMAP_BASE_URL = env('SITEMAP_BASE_URL', default='')
@@ -5,21 +5,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.contrib.sitemaps.views import sitemap
 from .admin import custom_admin_site
-from apps.core.sitemaps import (
-    StaticViewSitemap, ProductSitemap, CategorySitemap, 
-    BrandSitemap
-)
-from apps.core.views_seo import robots_txt
-
-# Sitemaps
-sitemaps = {
-    'static': StaticViewSitemap,
-    'products': ProductSitemap,
-    'categories': CategorySitemap,
-    'brands': BrandSitemap,
-}
+from apps.core.views_seo import robots_txt, sitemap_index, sitemap_shard
 
 # Custom error handlers
 handler404 = 'apps.core.views.handler404'
@@ -27,7 +14,9 @@ handler404 = 'apps.core.views.handler404'
 urlpatterns = [
     path('admin/', custom_admin_site.urls),
     path('robots.txt', robots_txt, name='robots_txt'),
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    # فایل‌های sitemap از پیش تولیدشده (apps/core/sitemap_files.py)
+    path('sitemap.xml', sitemap_index, name='sitemap'),
+    path('sitemaps/<str:name>', sitemap_shard, name='sitemap_shard'),
     path('', include('apps.core.urls', namespace='core')),
     path('accounts/', include('apps.accounts.urls', namespace='accounts')),
     path('catalog/', include('apps.catalog.urls', namespace='catalog')),